@@ -0,0 +1,503 @@
+"""
+Benchmarks and checks for the monitor that run without any real service.
+
+    python bench.py llm [--posts 30] [--workers 3] [--tpm 60000] [--window 10] [--latency 1.0]
+        generate_and_insert against fake_llm.py with one worker vs a pool:
+        wall time, records/sec, 429s the fake had to send, and peak
+        concurrent calls. Each batch insert is a sleep of --insert-latency. Lower
+        --tpm to see the run bounded by the rate limit instead of latency.
+
+    python bench.py keywords [--repeat 1000] [--lengths 500,2000]
+        score_post (one trie-shaped regex per keyword list, matched in a
+        lookahead at each word start) against the per-keyword substring
+        scans it replaced, over the parity fixtures as written and padded
+        to longer bodies: us/post; then matching alone with the keyword
+        lists padded tenfold. At today's 72 keywords the regex is a little
+        slower per post; it pulls ahead as the lists grow.
+
+    python bench.py rss [--items 100,5000,50000] [--repeat 5]
+        Parsing synthetic search feeds (a third of the links off Reddit,
+        some bodies too short) incrementally in 64 KB chunks vs whole with
+        ET.fromstring + findall: ms/feed and peak memory. The whole-document
+        path is charged for holding the body, as r.content does. Also
+        checks both yield the same items.
+
+    python bench.py select [--candidates 1000,10000,100000] [--repeat 5]
+        The run's post selection, streaming per-persona heaps vs sorting
+        the whole candidate list and scanning it for extras: ms per run,
+        over random candidates with ties and with one persona short of
+        its quota. Also checks both pick the same posts in the same order.
+
+    python bench.py repair [--posts 30] [--truncate-rate 0.4]
+        generate_demo_record against fake_llm.py cutting off a share of
+        its completions: repairing the cut-off record and asking again
+        for only the missing fields vs regenerating the whole record on a
+        JSON error. Records, calls, tokens and seconds; latency is charged
+        per completion token.
+
+    python bench.py parity [--fixtures fixtures/score_post.jsonl]
+        score_post against the expected score and persona of each fixture,
+        and where the substring scan's answer differed (whole-word matching,
+        plurals, whitespace and apostrophe variants) what it was.
+
+Needs the monitor's Python dependencies but no credentials; placeholder
+values are filled in for any missing environment variables. Exits non-zero
+when a check fails.
+"""
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import time
+import tracemalloc
+import xml.etree.ElementTree as ET
+from typing import Callable, Iterator, List, Tuple
+
+for _name in ("GROQ_API_KEY", "SUPABASE_URL", "SUPABASE_SERVICE_ROLE_KEY", "RESEND_API_KEY"):
+    os.environ.setdefault(_name, "bench-placeholder")
+
+import monitor  # noqa: E402
+from fake_llm import FakeLLM  # noqa: E402
+from keywords import KeywordScanner  # noqa: E402
+from llm import LLMClient, RateLimiter  # noqa: E402
+from rss import iter_items  # noqa: E402
+from record_schema import FIELDS  # noqa: E402
+from selection import PersonaSelector  # noqa: E402
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_FIXTURES = os.path.join(HERE, "fixtures", "score_post.jsonl")
+
+
+def bench_posts(n: int) -> List[dict]:
+    return [
+        {
+            "reddit_id": f"bench{i}",
+            "title": f"My client won't pay the $1,200 invoice for the site I built ({i})",
+            "body": "I did the work, sent the invoice and the contract, and now the client ghosted me. "
+                    "I have screenshots of every message. What can I do? " * 3,
+            "author": "unknown",
+            "subreddit": "freelance",
+            "url": f"https://www.reddit.com/r/freelance/comments/bench{i}/post/",
+            "score": 8,
+            "persona": "professional",
+            "created_utc": time.time(),
+        }
+        for i in range(n)
+    ]
+
+
+class BenchWriter:
+    """DemoRecordWriter stand-in: each batch written costs `latency_s`."""
+
+    def __init__(self, batch_size: int, latency_s: float):
+        self.batch_size = batch_size
+        self.latency_s = latency_s
+        self._pending = []
+
+    def add(self, key, subject, record):
+        self._pending.append((key, record["id"]))
+        return self.flush() if len(self._pending) >= self.batch_size else []
+
+    def flush(self):
+        batch, self._pending = self._pending, []
+        if batch:
+            time.sleep(self.latency_s)
+        return batch
+
+
+def run_llm_mode(args: argparse.Namespace, workers: int) -> dict:
+    fake = FakeLLM(args.tpm, args.window, args.latency)
+    base_url = fake.start()
+    # Start from the configured per-minute defaults, as a real run does;
+    # the fake's headers take over after the first response.
+    llm = LLMClient("bench", monitor.LLM_MODEL, RateLimiter(args.rpm, args.assume_tpm), base_url=base_url)
+
+    posts = bench_posts(args.posts)
+    started = time.perf_counter()
+    matches = monitor.generate_and_insert(posts, llm, BenchWriter(args.write_batch, args.insert_latency), workers=workers)
+    elapsed = time.perf_counter() - started
+    fake.stop()
+    return {
+        "workers": workers,
+        "records": len(matches),
+        "seconds": elapsed,
+        "rejected": fake.rejected,
+        "peak_inflight": fake.peak_inflight,
+        "pauses": llm.limiter.throttled,
+        "failures": llm.failures,
+        "in_order": [m["reddit_url"] for m in matches] == [p["url"] for p in posts[:len(matches)]],
+    }
+
+
+def cmd_llm(args: argparse.Namespace) -> int:
+    print(
+        f"{args.posts} posts, fake LLM: {args.tpm} tokens per {args.window:g}s, "
+        f"{args.latency:g}s per completion, {args.insert_latency:g}s per insert of {args.write_batch}"
+    )
+    print(f"{'workers':>8} {'records':>8} {'seconds':>8} {'rec/s':>7} {'429s':>5} {'pauses':>7} {'peak':>5}")
+    ok = True
+    for workers in sorted({1, args.workers}):
+        r = run_llm_mode(args, workers)
+        print(
+            f"{r['workers']:>8} {r['records']:>8} {r['seconds']:>8.2f} {r['records'] / r['seconds']:>7.2f} "
+            f"{r['rejected']:>5} {r['pauses']:>7} {r['peak_inflight']:>5}"
+        )
+        if r["records"] != args.posts or r["failures"]:
+            print(f"  FAIL: {args.posts - r['records']} posts not generated ({r['failures']} failed calls)")
+            ok = False
+        if not r["in_order"]:
+            print("  FAIL: matches not returned in post order")
+            ok = False
+        if r["peak_inflight"] > workers:
+            print(f"  FAIL: {r['peak_inflight']} concurrent calls with {workers} workers")
+            ok = False
+    return 0 if ok else 1
+
+
+def substring_score_post(title: str, body: str) -> Tuple[int, str]:
+    """score_post as it was before the compiled scanner: one substring scan per keyword."""
+    text = (title + " " + body).lower()
+    score = 0
+    persona = "consumer"
+    for kw in monitor.PROFESSION_KEYWORDS:
+        if kw in text:
+            score += 3
+            break
+    for ind in monitor.PROFESSIONAL_INDICATORS:
+        if ind in text:
+            persona = "professional"
+            break
+    if re.search(r'\$[\d,]+|\d+\s*dollars?|\d+k\b', text):
+        score += 2
+    for kw in monitor.EVIDENCE_KEYWORDS:
+        if kw in text:
+            score += 2
+            break
+    matches = sum(1 for kw in monitor.URGENCY_KEYWORDS if kw in text)
+    score += min(matches * 1, 2)
+    for kw in monitor.POWERLESS_KEYWORDS:
+        if kw in text:
+            score += 1
+            break
+    return min(score, 10), persona
+
+
+def load_fixtures(path: str) -> List[dict]:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def cmd_keywords(args: argparse.Namespace) -> int:
+    fixtures = load_fixtures(args.fixtures)
+    print(f"{len(fixtures)} fixture posts x {args.repeat}, {len(monitor.KEYWORD_SCANNER.keywords())} keywords")
+    print(f"{'body chars':>10} {'substring us':>13} {'compiled us':>12} {'speedup':>8}")
+    for length in [0] + [int(n) for n in args.lengths.split(",") if n]:
+        # 0 = the fixtures as written; otherwise each body repeated up to `length` chars
+        posts = [
+            (c["title"], c["body"] if not length else (c["body"] + " ") * (length // (len(c["body"]) + 1) + 1))
+            for c in fixtures
+        ]
+        posts = [(title, body[:length] if length else body) for title, body in posts]
+        n = len(posts) * args.repeat
+        per_post = {}
+        for name, fn in (("substring", substring_score_post), ("compiled", monitor.score_post)):
+            started = time.perf_counter()
+            for _ in range(args.repeat):
+                for title, body in posts:
+                    fn(title, body)
+            per_post[name] = (time.perf_counter() - started) / n * 1e6
+        label = str(length) if length else "as written"
+        print(
+            f"{label:>10} {per_post['substring']:>13.1f} {per_post['compiled']:>12.1f} "
+            f"{per_post['substring'] / per_post['compiled']:>7.2f}x"
+        )
+
+    # Matching alone, as the keyword lists grow (padded with words that never occur)
+    texts = [(c["title"] + " " + c["body"]).lower() for c in fixtures]
+    base = monitor.KEYWORD_SCANNER.keywords()
+    print(f"\n{'keywords':>10} {'substring us':>13} {'compiled us':>12} {'speedup':>8}")
+    for scale in (1, 10):
+        kws = base + [f"zxq{i}" for i in range(len(base) * (scale - 1))]
+        scanner = KeywordScanner({"all": kws})
+        per_text = {}
+        for name, fn in (
+            ("substring", lambda text: [kw for kw in kws if kw in text]),
+            ("compiled", scanner.scan),
+        ):
+            started = time.perf_counter()
+            for _ in range(args.repeat):
+                for text in texts:
+                    fn(text)
+            per_text[name] = (time.perf_counter() - started) / (len(texts) * args.repeat) * 1e6
+        print(
+            f"{len(kws):>10} {per_text['substring']:>13.1f} {per_text['compiled']:>12.1f} "
+            f"{per_text['substring'] / per_text['compiled']:>7.2f}x"
+        )
+    return 0
+
+
+def bench_feed_chunks(n_items: int, chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+    """A Google News style search feed of `n_items`, generated chunk by chunk."""
+    body = (
+        "I hired a contractor to redo the bathroom, paid half up front and he never came back. "
+        "I have the invoice, texts and the bank transfer. "
+    )
+    buf = ['<?xml version="1.0" encoding="UTF-8"?><rss version="2.0"><channel><title>search</title>']
+    size = len(buf[0])
+    for i in range(n_items):
+        if i % 3 == 2:
+            link = f"https://news.example.com/story/{i}"
+        else:
+            link = f"https://www.reddit.com/r/legaladvice/comments/b{i}/post_{i}/"
+        desc = "&lt;a href=&quot;x&quot;&gt;r/legaladvice&lt;/a&gt; " + (body if i % 5 else "short")
+        title = "Contractor took my money" if i % 5 else "Short"
+        item = (
+            f"<item><title>{title} ({i})</title><link>{link}</link><guid>{link}</guid>"
+            f"<pubDate>Mon, 06 Oct 2025 12:00:00 GMT</pubDate><description>{desc}</description></item>"
+        )
+        buf.append(item)
+        size += len(item)
+        if size >= chunk_size:
+            data = "".join(buf).encode("utf-8")
+            yield data
+            buf, size = [], 0
+    buf.append("</channel></rss>")
+    yield "".join(buf).encode("utf-8")
+
+
+def tree_parse_feed(content: bytes) -> List[dict]:
+    """The feed parsing fetch_reddit_posts did before streaming: whole document, then filter."""
+    out = []
+    root = ET.fromstring(content)
+    for item in root.findall(".//item"):
+        title_el = item.find("title")
+        link_el = item.find("link")
+        desc_el = item.find("description")
+        if title_el is None or link_el is None:
+            continue
+        title = title_el.text or ""
+        link = link_el.text or ""
+        desc = desc_el.text or "" if desc_el is not None else ""
+        if "reddit.com" not in link:
+            continue
+        clean_desc = re.sub(r'<[^>]+>', '', desc).strip()
+        body = clean_desc or title
+        if len(body) < 50:
+            continue
+        out.append({"title": title, "link": link, "body": body})
+    return out
+
+
+def measure(fn: Callable[[], List[dict]], repeat: int) -> Tuple[List[dict], float, int]:
+    """fn's items, ms per call, and peak traced memory of one call (bytes)."""
+    started = time.perf_counter()
+    for _ in range(repeat):
+        items = fn()
+    ms = (time.perf_counter() - started) / repeat * 1000
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return items, ms, peak
+
+
+def cmd_rss(args: argparse.Namespace) -> int:
+    ok = True
+    print(f"{'items':>7} {'feed KB':>8} {'kept':>6} {'tree ms':>8} {'stream ms':>10} {'tree peak KB':>13} {'stream peak KB':>15}")
+    for n in [int(x) for x in args.items.split(",") if x]:
+        size = sum(len(c) for c in bench_feed_chunks(n))
+        tree_items, tree_ms, tree_peak = measure(lambda: tree_parse_feed(b"".join(bench_feed_chunks(n))), args.repeat)
+        stream_items, stream_ms, stream_peak = measure(
+            lambda: list(iter_items(bench_feed_chunks(n), max_bytes=size + 1)), args.repeat
+        )
+        print(
+            f"{n:>7} {size / 1024:>8.0f} {len(stream_items):>6} {tree_ms:>8.1f} {stream_ms:>10.1f} "
+            f"{tree_peak / 1024:>13.0f} {stream_peak / 1024:>15.0f}"
+        )
+        if stream_items != tree_items:
+            print(f"  FAIL: streaming parser kept {len(stream_items)} items, whole-document parse {len(tree_items)}")
+            ok = False
+    return 0 if ok else 1
+
+
+def sorted_select(candidates: List[dict]) -> List[dict]:
+    """fetch_reddit_posts' selection before PersonaSelector: full sort, persona filters, extras scan."""
+    candidates.sort(key=lambda x: x["score"], reverse=True)
+    professionals = [c for c in candidates if c["persona"] == "professional"][:5]
+    consumers = [c for c in candidates if c["persona"] == "consumer"][:5]
+    result = professionals + consumers
+    if len(result) < 10:
+        extras = [c for c in candidates if c not in result]
+        result += extras[:10 - len(result)]
+    return result[:10]
+
+
+def heap_select(candidates: List[dict]) -> List[dict]:
+    selector = PersonaSelector({"professional": 5, "consumer": 5}, 10)
+    for c in candidates:
+        selector.add(c)
+    return selector.selected()
+
+
+def bench_candidates(n: int, consumer_share: float, rng: random.Random) -> List[dict]:
+    return [
+        {
+            "reddit_id": f"c{i}",
+            "url": f"https://www.reddit.com/r/x/comments/c{i}/",
+            "title": f"candidate {i}",
+            "score": rng.randint(4, 10),
+            "persona": "consumer" if rng.random() < consumer_share else "professional",
+        }
+        for i in range(n)
+    ]
+
+
+def cmd_select(args: argparse.Namespace) -> int:
+    rng = random.Random(7)
+    ok = True
+    print(f"{'candidates':>10} {'consumers':>10} {'sorted ms':>10} {'heap ms':>8} {'speedup':>8}")
+    for n in [int(x) for x in args.candidates.split(",") if x]:
+        # Half consumers; then only three, so extras fill the rest
+        for share in (0.5, 3 / n):
+            candidates = bench_candidates(n, share, rng)
+            timings = {}
+            for name, fn in (("sorted", sorted_select), ("heap", heap_select)):
+                started = time.perf_counter()
+                for _ in range(args.repeat):
+                    picked = fn(list(candidates))
+                timings[name] = (time.perf_counter() - started) / args.repeat * 1000
+                if name == "sorted":
+                    expected = [c["reddit_id"] for c in picked]
+                elif [c["reddit_id"] for c in picked] != expected:
+                    print(f"  FAIL: heap selection differs at {n} candidates")
+                    ok = False
+            consumers = sum(c["persona"] == "consumer" for c in candidates)
+            print(
+                f"{n:>10} {consumers:>10} {timings['sorted']:>10.2f} {timings['heap']:>8.2f} "
+                f"{timings['sorted'] / timings['heap']:>7.2f}x"
+            )
+    return 0 if ok else 1
+
+
+def regenerate_demo_record(post: dict, llm: LLMClient) -> dict:
+    """generate_demo_record before repair: any JSON error regenerates the whole record, up to 3 times."""
+    prompt = None
+
+    class Capture:
+        def complete(self, p, **kwargs):
+            nonlocal prompt
+            prompt = p
+
+        def forget(self, *args, **kwargs):
+            pass
+
+    monitor.generate_demo_record(post, Capture())
+    for _ in range(3):
+        content = llm.complete(prompt, max_tokens=1500, temperature=0.7)
+        if content is None:
+            return None
+        content = re.sub(r'^```json\s*', '', content)
+        content = re.sub(r'\s*```$', '', content)
+        try:
+            return json.loads(content)
+        except json.JSONDecodeError:
+            continue
+    return None
+
+
+def cmd_repair(args: argparse.Namespace) -> int:
+    posts = bench_posts(args.posts)
+    print(f"{args.posts} posts, {args.truncate_rate:.0%} of completions cut off halfway")
+    print(f"{'strategy':>10} {'records':>8} {'complete':>9} {'calls':>6} {'tokens':>7} {'seconds':>8}")
+    ok = True
+    for name, generate in (("regenerate", regenerate_demo_record), ("repair", monitor.generate_demo_record)):
+        fake = FakeLLM(10**7, 60, args.latency, per_token_s=args.per_token, truncate_rate=args.truncate_rate, seed=1)
+        llm = LLMClient("bench", monitor.LLM_MODEL, RateLimiter(10**5, 10**7), base_url=fake.start())
+        started = time.perf_counter()
+        records = [generate(post, llm) for post in posts]
+        elapsed = time.perf_counter() - started
+        fake.stop()
+        done = [r for r in records if r]
+        complete = sum(all(f in r for f in FIELDS) for r in done)
+        print(f"{name:>10} {len(done):>8} {complete:>9} {fake.served:>6} {llm.tokens_used:>7} {elapsed:>8.2f}")
+        if name == "repair" and complete != len(done):
+            print("  FAIL: a repaired record is missing fields")
+            ok = False
+    return 0 if ok else 1
+
+
+def cmd_parity(args: argparse.Namespace) -> int:
+    failures = 0
+    changed = 0
+    for case in load_fixtures(args.fixtures):
+        got = monitor.score_post(case["title"], case["body"])
+        expected = (case["score"], case["persona"])
+        if got != expected:
+            failures += 1
+            print(f"FAIL {case['name']}: got {got}, expected {expected}")
+        before = substring_score_post(case["title"], case["body"])
+        if before != (case["substring_score"], case["substring_persona"]):
+            failures += 1
+            print(f"FAIL {case['name']}: substring reference gave {before}, fixture says "
+                  f"{(case['substring_score'], case['substring_persona'])}")
+        elif before != expected:
+            changed += 1
+            print(f"  changed {case['name']}: {before} -> {expected}")
+    print(f"{failures} failures; {changed} fixtures score differently than the substring scan")
+    return 1 if failures else 0
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("llm", help="generation pipeline against a local fake LLM: throughput, 429s, concurrency")
+    p.add_argument("--posts", type=int, default=30)
+    p.add_argument("--workers", type=int, default=monitor.LLM_WORKERS)
+    p.add_argument("--tpm", type=int, default=60000, help="fake LLM tokens per window")
+    p.add_argument("--window", type=float, default=10.0, help="seconds for the fake's bucket to refill")
+    p.add_argument("--latency", type=float, default=1.0, help="seconds per fake completion")
+    p.add_argument("--rpm", type=float, default=600, help="the limiter's requests per minute")
+    p.add_argument(
+        "--assume-tpm", type=float, default=monitor.LLM_TPM,
+        help="the limiter's starting tokens per minute (set it above the fake's to provoke 429s)",
+    )
+    p.add_argument("--insert-latency", type=float, default=0.1, help="seconds per fake DB batch insert")
+    p.add_argument("--write-batch", type=int, default=monitor.DEMO_WRITE_BATCH, help="records per DB batch")
+    p.set_defaults(func=cmd_llm)
+
+    p = sub.add_parser("keywords", help="compiled keyword scanner vs per-keyword substring scans: us/post")
+    p.add_argument("--fixtures", default=DEFAULT_FIXTURES)
+    p.add_argument("--repeat", type=int, default=1000)
+    p.add_argument("--lengths", default="500,2000", help="also time bodies padded to these lengths (chars)")
+    p.set_defaults(func=cmd_keywords)
+
+    p = sub.add_parser("rss", help="streaming feed parser vs whole-document ElementTree: ms/feed, peak memory")
+    p.add_argument("--items", default="100,5000,50000", help="feed sizes to time (items)")
+    p.add_argument("--repeat", type=int, default=5)
+    p.set_defaults(func=cmd_rss)
+
+    p = sub.add_parser("select", help="streaming per-persona top-K vs full sort + extras scan: ms per run")
+    p.add_argument("--candidates", default="1000,10000,100000", help="candidate counts to time")
+    p.add_argument("--repeat", type=int, default=5)
+    p.set_defaults(func=cmd_select)
+
+    p = sub.add_parser("repair", help="record repair + follow-up vs full regeneration: calls, tokens, seconds")
+    p.add_argument("--posts", type=int, default=30)
+    p.add_argument("--truncate-rate", type=float, default=0.4, help="share of fake completions cut off halfway")
+    p.add_argument("--latency", type=float, default=0.05, help="seconds per fake completion")
+    p.add_argument("--per-token", type=float, default=0.002, help="seconds per fake completion token")
+    p.set_defaults(func=cmd_repair)
+
+    p = sub.add_parser("parity", help="score_post against the expected outputs in the fixtures")
+    p.add_argument("--fixtures", default=DEFAULT_FIXTURES)
+    p.set_defaults(func=cmd_parity)
+
+    args = parser.parse_args(argv)
+    return args.func(args) or 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,210 @@
+"""
+Local stand-in for Groq's chat completions endpoint, for exercising the
+generation pipeline (bench.py llm) without an API key or spending tokens.
+
+It enforces a token bucket the way Groq does: each request is charged its
+prompt plus max_tokens up front (unused completion tokens are refunded),
+answers x-ratelimit-* headers on every response, and returns 429 with
+Retry-After when the bucket is short. Completions are a fixed record JSON
+after `latency_s` (plus `per_token_s` per completion token). Only the record
+fields the prompt names are answered, so a follow-up asking for a few fields
+gets just those. A `truncate_rate` share of completions are cut off halfway
+as if they had hit max_tokens.
+
+    python fake_llm.py [--port 8765] [--tpm 6000] [--window 60] [--latency 1.0]
+    GROQ_BASE_URL=http://127.0.0.1:8765 python monitor.py
+"""
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+
+FAKE_RECORD = {
+    "subject_name": "Jordan Blake Studio",
+    "subject_profession": "Freelance Web Designer",
+    "subject_location": "Austin, TX",
+    "relationship": "Client",
+    "category": "Freelancer",
+    "description": "I hired Jordan Blake Studio to build a storefront in March and paid a $1,200 deposit. "
+                   "The site was never delivered and messages went unanswered for six weeks. "
+                   "I have the signed contract, the invoice and the payment receipt.",
+    "rating": 2,
+    "contributor_display_name": "Maria S.",
+    "debate_subject_opening": "The project scope changed twice and the final assets were never provided. "
+                              "We paused work until they arrived, as the contract allows.",
+    "debate_subject_response": "We offered a partial refund for the unfinished milestones. That offer still stands.",
+    "voter_1_alias": "fairplay_22",
+    "voter_1_choice": "side_with_contributor",
+    "voter_1_explanation": "A paid deposit with no delivery and no communication is on the designer.",
+    "voter_2_alias": "quietobserver",
+    "voter_2_choice": "side_with_subject",
+    "voter_2_explanation": "Scope changes are real, and the refund offer seems reasonable.",
+    "voter_3_alias": "mkt_owner",
+    "voter_3_choice": "side_with_contributor",
+    "voter_3_explanation": "Six weeks of silence is not how a pause should be handled.",
+    "citizen_1_alias": "local_dev",
+    "citizen_1_statement": "Milestone payments would have protected both sides here.",
+    "citizen_2_alias": "smallbiz_atx",
+    "citizen_2_statement": "Always get the scope in writing before paying anything.",
+}
+
+
+class FakeLLM:
+    def __init__(self, tokens_per_window: int = 6000, window_s: float = 60.0, latency_s: float = 1.0,
+                 requests_per_day: int = 14400, per_token_s: float = 0.0, truncate_rate: float = 0.0,
+                 seed: int = 0):
+        self.capacity = float(tokens_per_window)
+        self.per_second = tokens_per_window / window_s
+        self.level = self.capacity
+        self.updated = time.monotonic()
+        self.latency_s = latency_s
+        self.per_token_s = per_token_s
+        self.truncate_rate = truncate_rate
+        self.random = random.Random(seed)
+        self.requests_per_day = requests_per_day
+        self.requests_left = requests_per_day
+        self.record = dict(FAKE_RECORD)
+
+        self.lock = threading.Lock()
+        self.served = 0
+        self.rejected = 0
+        self.inflight = 0
+        self.peak_inflight = 0
+        self.server: Optional[ThreadingHTTPServer] = None
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.per_second)
+        self.updated = now
+
+    def _headers(self) -> Dict[str, str]:
+        self._refill()
+        reset_tokens = (self.capacity - self.level) / self.per_second
+        return {
+            "x-ratelimit-limit-requests": str(self.requests_per_day),
+            "x-ratelimit-remaining-requests": str(self.requests_left),
+            "x-ratelimit-reset-requests": "2m59.56s",
+            "x-ratelimit-limit-tokens": str(int(self.capacity)),
+            "x-ratelimit-remaining-tokens": str(int(self.level)),
+            "x-ratelimit-reset-tokens": f"{reset_tokens:.2f}s",
+        }
+
+    def admit(self, charge: int) -> Optional[float]:
+        """Charge the bucket; None if admitted, else the seconds until it could be."""
+        with self.lock:
+            self._refill()
+            if self.level < charge:
+                self.rejected += 1
+                return (charge - self.level) / self.per_second
+            self.level -= charge
+            self.requests_left -= 1
+            self.inflight += 1
+            self.peak_inflight = max(self.peak_inflight, self.inflight)
+            return None
+
+    def completion(self, prompt: str, max_tokens: int) -> Tuple[str, str]:
+        """(content, finish_reason) for a prompt: the record fields it names, maybe cut off."""
+        # The JSON template follows "...fields:" in both the full and the follow-up prompt
+        template = prompt[prompt.rfind("fields:"):]
+        fields = [k for k in self.record if f'"{k}":' in template] or list(self.record)
+        content = json.dumps({k: self.record[k] for k in fields}, indent=2)
+        with self.lock:
+            truncate = self.random.random() < self.truncate_rate
+        if truncate:
+            return content[:len(content) // 2], "length"
+        if len(content) // 4 > max_tokens:
+            return content[:max_tokens * 4], "length"
+        return content, "stop"
+
+    def finish(self, refund: int) -> Dict[str, str]:
+        with self.lock:
+            self.inflight -= 1
+            self.served += 1
+            self.level = min(self.capacity, self.level + refund)
+            return self._headers()
+
+    def start(self, port: int = 0) -> str:
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                prompt = "".join(m.get("content", "") for m in body.get("messages", []))
+                prompt_tokens = len(prompt) // 4
+                max_tokens = int(body.get("max_tokens") or 1024)
+                retry_in = fake.admit(prompt_tokens + max_tokens)
+                if retry_in is not None:
+                    with fake.lock:
+                        headers = fake._headers()
+                    headers["retry-after"] = f"{retry_in:.2f}"
+                    self._send(429, {"error": {"message": "Rate limit reached", "type": "tokens"}}, headers)
+                    return
+                content, finish_reason = fake.completion(prompt, max_tokens)
+                completion_tokens = min(max_tokens, len(content) // 4)
+                time.sleep(fake.latency_s + completion_tokens * fake.per_token_s)
+                headers = fake.finish(max_tokens - completion_tokens)
+                self._send(200, {
+                    "id": "chatcmpl-fake",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": body.get("model", "fake"),
+                    "choices": [{
+                        "index": 0,
+                        "message": {"role": "assistant", "content": content},
+                        "finish_reason": finish_reason,
+                    }],
+                    "usage": {
+                        "prompt_tokens": prompt_tokens,
+                        "completion_tokens": completion_tokens,
+                        "total_tokens": prompt_tokens + completion_tokens,
+                    },
+                }, headers)
+
+            def _send(self, status: int, payload: dict, headers: Dict[str, str]) -> None:
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for k, v in headers.items():
+                    self.send_header(k, v)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def stop(self) -> None:
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+
+
+def main(argv) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--tpm", type=int, default=6000, help="tokens per window")
+    parser.add_argument("--window", type=float, default=60.0, help="seconds for the bucket to refill completely")
+    parser.add_argument("--latency", type=float, default=1.0)
+    parser.add_argument("--truncate-rate", type=float, default=0.0, help="share of completions cut off halfway")
+    args = parser.parse_args(argv)
+    fake = FakeLLM(args.tpm, args.window, args.latency, truncate_rate=args.truncate_rate)
+    print(f"Fake LLM on {fake.start(args.port)}", flush=True)
+    try:
+        while True:
+            time.sleep(60)
+    except KeyboardInterrupt:
+        fake.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
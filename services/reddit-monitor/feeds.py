@@ -0,0 +1,262 @@
+"""
+Concurrent RSS fetching for the monitor.
+
+All feeds go through one pooled requests.Session. A per-host rate limiter
+spaces requests to the same host instead of fixed sleeps after each one, so
+the fetch phase takes about (feeds per host × interval) rather than the sum
+of the sleeps. Feeds are fetched with conditional GET: the ETag /
+Last-Modified of the last 200 are sent back, and a 304 is answered from the
+body cached on disk. Bodies are streamed: FeedFetcher.open hands back chunks
+as they arrive and writes them to the cache alongside.
+"""
+import email.utils
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import BinaryIO, Dict, Iterator, Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+log = logging.getLogger("dnounce-monitor")
+
+CHUNK_SIZE = 64 * 1024
+
+USER_AGENT = (
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+)
+
+
+class HostRateLimiter:
+    """At most one request per `min_interval_s` to each host, across threads."""
+
+    def __init__(self, min_interval_s: float):
+        self.min_interval_s = min_interval_s
+        self._next: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def wait(self, host: str) -> float:
+        """Block until this caller's slot for `host`; returns the seconds waited."""
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next.get(host, 0.0))
+            self._next[host] = slot + self.min_interval_s
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
+        return max(delay, 0.0)
+
+    def defer(self, host: str, seconds: float) -> None:
+        """Push the host's next slot back, e.g. for a 429's Retry-After."""
+        with self._lock:
+            self._next[host] = max(self._next.get(host, 0.0), time.monotonic() + seconds)
+
+
+def retry_after_seconds(value: Optional[str], default: float) -> float:
+    if not value:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return default
+    return max(0.0, when.timestamp() - time.time())
+
+
+class FeedCache:
+    """
+    Validators and last body of each feed URL, so unchanged feeds come back
+    as a 304 with no body. One directory: index.json plus a file per body.
+    """
+
+    def __init__(self, directory: Optional[str]):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._index: Dict[str, Dict[str, str]] = {}
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            try:
+                with open(self._index_path(), encoding="utf-8") as f:
+                    self._index = json.load(f)
+            except (OSError, ValueError):
+                self._index = {}
+
+    def _index_path(self) -> str:
+        return os.path.join(self.directory, "index.json")
+
+    def _body_path(self, url: str) -> str:
+        return os.path.join(self.directory, hashlib.sha256(url.encode("utf-8")).hexdigest()[:32] + ".xml")
+
+    def validators(self, url: str) -> Dict[str, str]:
+        """Conditional request headers for `url` (empty if nothing is cached)."""
+        with self._lock:
+            entry = self._index.get(url)
+        if not entry or not os.path.exists(self._body_path(url)):
+            return {}
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def forget(self, url: str) -> None:
+        with self._lock:
+            self._index.pop(url, None)
+
+    def chunks(self, url: str) -> Optional[Iterator[bytes]]:
+        """The cached body of `url` in CHUNK_SIZE pieces, or None if there is none."""
+        try:
+            f = open(self._body_path(url), "rb")
+        except OSError:
+            return None
+
+        def read() -> Iterator[bytes]:
+            with f:
+                while chunk := f.read(CHUNK_SIZE):
+                    yield chunk
+
+        return read()
+
+    def begin(self, url: str, response: requests.Response) -> Optional[BinaryIO]:
+        """A temp file to copy `response`'s body into, if it can be revalidated later."""
+        if not self.directory:
+            return None
+        if not response.headers.get("ETag") and not response.headers.get("Last-Modified"):
+            return None
+        return open(self._body_path(url) + ".tmp", "wb")
+
+    def end(self, url: str, response: requests.Response, f: BinaryIO, complete: bool) -> None:
+        """Keep a fully copied body as the cached one; drop a partial copy."""
+        f.close()
+        if not complete:
+            os.remove(f.name)
+            return
+        os.replace(f.name, self._body_path(url))
+        with self._lock:
+            self._index[url] = {
+                "etag": response.headers.get("ETag") or "",
+                "last_modified": response.headers.get("Last-Modified") or "",
+            }
+
+    def save(self) -> None:
+        if not self.directory:
+            return
+        with self._lock:
+            data = json.dumps(self._index, indent=1, sort_keys=True)
+        tmp = self._index_path() + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(data)
+        os.replace(tmp, self._index_path())
+
+
+def make_session(pool_size: int) -> requests.Session:
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({
+        "User-Agent": USER_AGENT,
+        "Accept": "application/rss+xml, application/xml, text/xml, */*",
+    })
+    return session
+
+
+class FeedFetcher:
+    def __init__(
+        self,
+        workers: int = 4,
+        min_interval_s: float = 1.0,
+        cache_dir: Optional[str] = None,
+        timeout_s: float = 15.0,
+        max_retries: int = 2,
+    ):
+        self.workers = max(1, workers)
+        self.timeout_s = timeout_s
+        self.max_retries = max_retries
+        self.limiter = HostRateLimiter(min_interval_s)
+        self.cache = FeedCache(cache_dir)
+        self.session = make_session(self.workers)
+        self.stats = {"fetched": 0, "not_modified": 0, "failed": 0, "rate_limited": 0, "wait_s": 0.0}
+        self._stats_lock = threading.Lock()
+
+    def _count(self, key: str, amount: float = 1) -> None:
+        with self._stats_lock:
+            self.stats[key] += amount
+
+    def open(self, url: str) -> Optional[Iterator[bytes]]:
+        """
+        The body of one feed as chunks (the cached body on a 304), or None if
+        it could not be fetched. A 200 is read as the caller consumes it; a
+        read error ends the chunks early.
+        """
+        host = urlsplit(url).netloc
+        for attempt in range(self.max_retries + 1):
+            self._count("wait_s", self.limiter.wait(host))
+            try:
+                r = self.session.get(url, headers=self.cache.validators(url), timeout=self.timeout_s, stream=True)
+            except requests.RequestException as e:
+                log.warning(f"Fetch error for {host}: {e}")
+                self._count("failed")
+                return None
+
+            if r.status_code == 304:
+                r.close()
+                chunks = self.cache.chunks(url)
+                if chunks is not None:
+                    self._count("not_modified")
+                    return chunks
+                # Cached body went missing: ask again without validators.
+                self.cache.forget(url)
+                continue
+            if r.status_code in (429, 503) and attempt < self.max_retries:
+                r.close()
+                wait = retry_after_seconds(r.headers.get("Retry-After"), 10.0 * (attempt + 1))
+                log.info(f"{host} returned {r.status_code}; backing off {wait:.0f}s")
+                self._count("rate_limited")
+                self.limiter.defer(host, wait)
+                continue
+            if r.status_code != 200:
+                r.close()
+                log.warning(f"Search returned {r.status_code}. Skipping.")
+                self._count("failed")
+                return None
+
+            self._count("fetched")
+            return self._stream(url, r)
+        self._count("failed")
+        return None
+
+    def _stream(self, url: str, r: requests.Response) -> Iterator[bytes]:
+        sink = self.cache.begin(url, r)
+        complete = False
+        try:
+            for chunk in r.iter_content(CHUNK_SIZE):
+                if sink is not None:
+                    sink.write(chunk)
+                yield chunk
+            complete = True
+        except requests.RequestException as e:
+            log.warning(f"Read error for {urlsplit(url).netloc}: {e}")
+            self._count("failed")
+        finally:
+            # Also reached when the caller stops reading early
+            r.close()
+            if sink is not None:
+                self.cache.end(url, r, sink, complete)
+
+    def fetch(self, url: str) -> Optional[bytes]:
+        """Body of one feed, read whole."""
+        chunks = self.open(url)
+        return None if chunks is None else b"".join(chunks)
+
+    def close(self) -> None:
+        self.session.close()
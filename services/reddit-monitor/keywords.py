@@ -0,0 +1,111 @@
+"""
+Single-pass, whole-word keyword matching for score_post.
+
+Every keyword list is compiled at import into one regex whose alternation
+is a character trie of all the keywords, so at each word start the engine
+follows one branch instead of trying every keyword in turn. The match sits
+in a lookahead, so overlapping keywords are all found: "client won't pay"
+counts for the persona indicators and, through its "won't pay", for
+urgency. At a given start the longest keyword wins, and the shorter
+keywords that are a whole-word prefix of it are credited along with it.
+
+Matching is on whole words, so "server" no longer matches "observer", nor
+"contract" "contractor". A trailing "s"/"es" still counts (plurals), any
+whitespace between the words of a phrase matches, and a typographic
+apostrophe matches "'". Callers pass lowercased text.
+
+`python bench.py keywords` times this against the per-keyword substring
+scans it replaced; `python bench.py parity` checks the fixtures.
+"""
+import re
+from typing import Dict, Iterable, List, Mapping, Set, Tuple
+
+WHITESPACE_RE = re.compile(r"\s+")
+
+# Dollar amounts: "$1,200", "300 dollars", "5k"
+DOLLAR_SIGN_RE = re.compile(r"\$[\d,]")
+DOLLARS_RE = re.compile(r"\b\d+\s*dollars?\b")
+THOUSANDS_HINT_RE = re.compile(r"\dk\b")
+THOUSANDS_RE = re.compile(r"\b\d+k\b")
+
+_END = ""
+
+
+def has_money(text: str) -> bool:
+    """A dollar amount anywhere in `text` (lowercased)."""
+    if "$" in text and DOLLAR_SIGN_RE.search(text):
+        return True
+    if "dollar" in text and DOLLARS_RE.search(text):
+        return True
+    return bool(THOUSANDS_HINT_RE.search(text) and THOUSANDS_RE.search(text))
+
+
+def _char_pattern(ch: str) -> str:
+    if ch == " ":
+        return r"\s+"
+    if ch == "'":
+        return "['’]"
+    return re.escape(ch)
+
+
+def trie_pattern(keywords: Iterable[str]) -> str:
+    """A regex matching any of `keywords`, factored into a character trie."""
+    trie: Dict[str, dict] = {}
+    for kw in keywords:
+        node = trie
+        for ch in kw:
+            node = node.setdefault(ch, {})
+        node[_END] = {}
+
+    def build(node: Dict[str, dict]) -> str:
+        branches = [_char_pattern(ch) + build(child) for ch, child in sorted(node.items()) if ch != _END]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if _END in node:
+            # A keyword ends here; a longer one may continue (greedy, so longest first)
+            body = f"(?:{body})?"
+        return body
+
+    return build(trie)
+
+
+def _normalize(matched: str) -> str:
+    return WHITESPACE_RE.sub(" ", matched).replace("’", "'")
+
+
+class KeywordScanner:
+    """Finds which keywords of each category occur in a (lowercased) text, as whole words."""
+
+    def __init__(self, categories: Mapping[str, Iterable[str]]):
+        self.categories = {
+            name: tuple(dict.fromkeys(_normalize(k.lower().strip()) for k in kws))
+            for name, kws in categories.items()
+        }
+        self._category_of: Dict[str, str] = {}
+        for name, kws in self.categories.items():
+            for kw in kws:
+                if self._category_of.setdefault(kw, name) != name:
+                    raise ValueError(f"keyword {kw!r} is in both {self._category_of[kw]} and {name}")
+
+        # (keyword, category) pairs credited for each keyword the regex reports.
+        # The lookahead reports only the longest keyword at a start position,
+        # so a keyword also credits the shorter ones that are a prefix of it.
+        self._hits: Dict[str, Tuple[Tuple[str, str], ...]] = {
+            kw: tuple((k, self._category_of[k]) for k in self._category_of if k == kw or kw.startswith(k + " "))
+            for kw in self._category_of
+        }
+        self.pattern = re.compile(r"\b(?=(" + trie_pattern(self._category_of) + r")(?:e?s)?\b)")
+
+    def scan(self, text: str) -> Dict[str, Set[str]]:
+        """{category: keywords found}, with an entry (possibly empty) for every category."""
+        found: Dict[str, Set[str]] = {name: set() for name in self.categories}
+        hits = self._hits
+        for matched in set(self.pattern.findall(text)):
+            credited = hits.get(matched) or hits[_normalize(matched)]
+            for kw, category in credited:
+                found[category].add(kw)
+        return found
+
+    def keywords(self) -> List[str]:
+        return list(self._category_of)
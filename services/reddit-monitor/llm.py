@@ -0,0 +1,332 @@
+"""
+One shared Groq client behind a rate limiter fed from the API's own headers.
+
+Groq reports its limits on every response (x-ratelimit-{limit,remaining,
+reset}-{requests,tokens}) and a Retry-After on 429. RateLimiter keeps a
+token bucket for requests and one for tokens, re-synced from those headers
+after each call, and callers block in acquire() until both have room. A 429
+pauses every caller until Retry-After, instead of each one sleeping its own
+blind exponential backoff.
+
+With a ResponseCache, a prompt already answered (same model, temperature
+and max_tokens) within the cache's TTL is served from disk without a call,
+e.g. when a run is repeated after a failure.
+"""
+import hashlib
+import json
+import logging
+import random
+import re
+import sqlite3
+import threading
+import time
+from typing import Mapping, Optional
+
+log = logging.getLogger("dnounce-monitor")
+
+DURATION_PART_RE = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+DURATION_UNITS = {"h": 3600.0, "m": 60.0, "s": 1.0, "ms": 0.001}
+
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    """'2m59.56s' / '7.66s' / '120ms' / '30' -> seconds; None if unparseable."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = DURATION_PART_RE.findall(value)
+    if not parts:
+        return None
+    return sum(float(n) * DURATION_UNITS[unit] for n, unit in parts)
+
+
+def estimate_tokens(prompt: str, max_tokens: int) -> int:
+    # ~4 characters per token for English prompts, plus the completion budget
+    return len(prompt) // 4 + max_tokens
+
+
+class TokenBucket:
+    def __init__(self, capacity: float, per_second: float):
+        self.capacity = float(capacity)
+        self.per_second = float(per_second)
+        self.level = float(capacity)
+        self.updated = time.monotonic()
+
+    def refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.per_second)
+        self.updated = now
+
+    def wait_for(self, amount: float) -> float:
+        """Seconds until `amount` is available (0 if it is now). Call after refill()."""
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        if self.per_second <= 0:
+            return 1.0
+        return (amount - self.level) / self.per_second
+
+    def sync(
+        self, limit: Optional[float], remaining: Optional[float], reset_s: Optional[float], reserved: float,
+        now: float, cap_only: bool = False,
+    ) -> None:
+        """
+        Adopt the server's view: `remaining` left (less what we have in flight,
+        which it hasn't counted yet), full again after `reset_s`. With
+        cap_only the limit is over a different window than ours, so it can
+        only lower the level.
+        """
+        if remaining is None:
+            return
+        self.refill(now)
+        available = float(remaining) - reserved
+        if cap_only:
+            self.level = min(self.level, available)
+            return
+        if limit:
+            self.capacity = float(limit)
+        self.level = min(self.capacity, available)
+        if reset_s and reset_s > 0 and remaining < self.capacity:
+            self.per_second = (self.capacity - float(remaining)) / reset_s
+
+
+def _number(headers: Mapping[str, str], name: str) -> Optional[float]:
+    try:
+        return float(headers[name])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+class RateLimiter:
+    """Request and token buckets shared by every thread calling the LLM."""
+
+    def __init__(self, requests_per_minute: float, tokens_per_minute: float):
+        self.requests = TokenBucket(requests_per_minute, requests_per_minute / 60.0)
+        self.tokens = TokenBucket(tokens_per_minute, tokens_per_minute / 60.0)
+        self._paused_until = 0.0
+        self._inflight_requests = 0
+        self._inflight_tokens = 0
+        self._cond = threading.Condition()
+        self.waited_s = 0.0
+        self.throttled = 0
+
+    def acquire(self, tokens: int) -> float:
+        """Block until one request carrying about `tokens` tokens may be sent; returns seconds waited."""
+        started = time.monotonic()
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                self.requests.refill(now)
+                self.tokens.refill(now)
+                delay = max(
+                    self._paused_until - now,
+                    self.requests.wait_for(1),
+                    self.tokens.wait_for(tokens),
+                )
+                if delay <= 0:
+                    self.requests.level -= 1
+                    self.tokens.level -= min(tokens, self.tokens.capacity)
+                    self._inflight_requests += 1
+                    self._inflight_tokens += tokens
+                    break
+                self._cond.wait(delay)
+            waited = time.monotonic() - started
+            self.waited_s += waited
+        return waited
+
+    def release(self, tokens: int, headers: Optional[Mapping[str, str]], used: Optional[int] = None) -> None:
+        """
+        A call that acquire()d `tokens` has finished. Re-sync both buckets from
+        its x-ratelimit-* headers, or, without headers, give back the part of
+        the estimate it did not use.
+        """
+        now = time.monotonic()
+        with self._cond:
+            self._inflight_requests -= 1
+            self._inflight_tokens -= tokens
+            if headers is not None and (
+                headers.get("x-ratelimit-remaining-requests") is not None
+                or headers.get("x-ratelimit-remaining-tokens") is not None
+            ):
+                self.requests.sync(
+                    _number(headers, "x-ratelimit-limit-requests"),
+                    _number(headers, "x-ratelimit-remaining-requests"),
+                    parse_duration(headers.get("x-ratelimit-reset-requests")),
+                    self._inflight_requests,
+                    now,
+                    # Groq's request limit is per day; ours is per minute
+                    cap_only=True,
+                )
+                self.tokens.sync(
+                    _number(headers, "x-ratelimit-limit-tokens"),
+                    _number(headers, "x-ratelimit-remaining-tokens"),
+                    parse_duration(headers.get("x-ratelimit-reset-tokens")),
+                    self._inflight_tokens,
+                    now,
+                )
+            elif used is not None:
+                self.tokens.level = min(self.tokens.capacity, self.tokens.level + tokens - used)
+            self._cond.notify_all()
+
+    def pause(self, seconds: float) -> None:
+        """Hold every caller for `seconds` (a 429's Retry-After)."""
+        with self._cond:
+            self.throttled += 1
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._cond.notify_all()
+
+
+class ResponseCache:
+    """Completions on disk keyed by (model, prompt hash, temperature, max_tokens), expiring after `ttl_days`."""
+
+    def __init__(self, path: str, ttl_days: float = 7.0):
+        self.path = path
+        self.ttl_s = ttl_days * 86400.0
+        self._db = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS completions ("
+            "key TEXT PRIMARY KEY, "
+            "model TEXT NOT NULL, "
+            "content TEXT NOT NULL, "
+            "created_at REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS completions_created_at ON completions (created_at)")
+        self.evicted = self.evict()
+
+    @staticmethod
+    def key(model: str, prompt: str, temperature: float, max_tokens: int) -> str:
+        prompt_hash = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        material = json.dumps([model, prompt_hash, float(temperature), int(max_tokens)])
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def evict(self) -> int:
+        with self._lock:
+            cur = self._db.execute("DELETE FROM completions WHERE created_at < ?", (time.time() - self.ttl_s,))
+            return cur.rowcount
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT content FROM completions WHERE key = ? AND created_at >= ?",
+                (key, time.time() - self.ttl_s),
+            ).fetchone()
+        return row[0] if row is not None else None
+
+    def put(self, key: str, model: str, content: str) -> None:
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO completions (key, model, content, created_at) VALUES (?, ?, ?, ?)",
+                (key, model, content, time.time()),
+            )
+
+    def forget(self, key: str) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM completions WHERE key = ?", (key,))
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM completions").fetchone()[0]
+
+    def close(self) -> None:
+        self._db.close()
+
+
+class LLMClient:
+    """
+    Chat completions through one Groq client (one connection pool) and a
+    shared RateLimiter. The SDK's own retries are off; 429s and transient
+    errors are retried here so every thread sees the same pause.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        model: str,
+        limiter: RateLimiter,
+        base_url: Optional[str] = None,
+        max_attempts: int = 4,
+        timeout_s: float = 60.0,
+        cache: Optional[ResponseCache] = None,
+    ):
+        from groq import Groq
+
+        self.model = model
+        self.limiter = limiter
+        self.max_attempts = max_attempts
+        self.cache = cache
+        self.client = Groq(api_key=api_key, base_url=base_url, max_retries=0, timeout=timeout_s)
+        self.calls = 0
+        self.failures = 0
+        self.tokens_used = 0
+        self.cache_hits = 0
+        self._lock = threading.Lock()
+
+    def complete(self, prompt: str, max_tokens: int = 1500, temperature: float = 0.7) -> Optional[str]:
+        """Completion text (from the cache if it has one), or None once max_attempts calls have failed."""
+        import groq
+
+        key = None
+        if self.cache is not None:
+            key = ResponseCache.key(self.model, prompt, temperature, max_tokens)
+            cached = self.cache.get(key)
+            if cached is not None:
+                with self._lock:
+                    self.cache_hits += 1
+                return cached
+
+        estimated = estimate_tokens(prompt, max_tokens)
+        for attempt in range(self.max_attempts):
+            self.limiter.acquire(estimated)
+            try:
+                raw = self.client.chat.completions.with_raw_response.create(
+                    model=self.model,
+                    messages=[{"role": "user", "content": prompt}],
+                    max_tokens=max_tokens,
+                    temperature=temperature,
+                )
+            except groq.RateLimitError as e:
+                self.limiter.release(estimated, e.response.headers)
+                wait = parse_duration(e.response.headers.get("retry-after"))
+                if wait is None:
+                    wait = parse_duration(e.response.headers.get("x-ratelimit-reset-tokens")) or 10.0
+                log.info(f"Rate limited by Groq; pausing all calls for {wait:.1f}s")
+                self.limiter.pause(wait)
+                continue
+            except (groq.APIConnectionError, groq.InternalServerError) as e:
+                self.limiter.release(estimated, None)
+                # Full jitter so parallel workers don't retry in lockstep
+                wait = random.uniform(0, min(30.0, 2.0 * 2 ** attempt))
+                log.warning(f"Groq error on attempt {attempt + 1}: {e}; retrying in {wait:.1f}s")
+                time.sleep(wait)
+                continue
+            except groq.APIStatusError as e:
+                self.limiter.release(estimated, e.response.headers)
+                log.warning(f"Groq error on attempt {attempt + 1}: {e}")
+                break
+            except Exception:
+                self.limiter.release(estimated, None)
+                raise
+
+            completion = raw.parse()
+            used = completion.usage.total_tokens if completion.usage else None
+            self.limiter.release(estimated, raw.headers, used)
+            with self._lock:
+                self.calls += 1
+                self.tokens_used += used or 0
+            content = (completion.choices[0].message.content or "").strip()
+            if key is not None:
+                self.cache.put(key, self.model, content)
+            return content
+
+        with self._lock:
+            self.failures += 1
+        return None
+
+    def forget(self, prompt: str, max_tokens: int = 1500, temperature: float = 0.7) -> None:
+        """Drop a cached completion the caller couldn't use, so asking again makes a new call."""
+        if self.cache is not None:
+            self.cache.forget(ResponseCache.key(self.model, prompt, temperature, max_tokens))
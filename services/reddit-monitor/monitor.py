@@ -9,11 +9,22 @@ import sys
 import logging
 import time
 import uuid
-import json
 import re
 from datetime import datetime, timedelta, timezone
+from urllib.parse import quote
 from dotenv import load_dotenv
 
+from feeds import FeedFetcher
+from keywords import KeywordScanner, has_money
+from llm import LLMClient, RateLimiter, ResponseCache
+from neardup import NearDuplicates, simhash
+from record_schema import FIELDS, fields_block, followup_max_tokens, followup_prompt, parse_record
+from pipeline import Pipeline, RunCheckpoint, in_order
+from rss import iter_items
+from seen import SeenIndex, content_hash
+from selection import PersonaSelector, parse_quotas
+from writer import DemoRecordWriter
+
 load_dotenv()
 
 # ── Logging ──────────────────────────────────────────────────────────────────
@@ -33,6 +44,40 @@ ALERT_EMAIL          = os.environ.get("ALERT_EMAIL", "vasquezkenny97@outlook.com
 FROM_EMAIL           = os.environ.get("FROM_EMAIL", "notifications@dnounce.com")
 DNOUNCE_BASE_URL     = "https://dnounce.com"
 
+# Feed fetching: concurrent, spaced per host instead of sleeping after every query
+FETCH_WORKERS        = int(os.environ.get("FETCH_WORKERS", "4"))
+FETCH_MIN_INTERVAL_S = float(os.environ.get("FETCH_MIN_INTERVAL_S", "1.0"))
+FEED_CACHE_DIR       = os.environ.get("FEED_CACHE_DIR", ".feed-cache") or None
+FEED_MAX_BYTES       = int(os.environ.get("FEED_MAX_BYTES", str(4 * 1024 * 1024)))
+
+# Generation: one Groq client, a bounded pool, limits re-synced from Groq's headers
+GROQ_BASE_URL        = os.environ.get("GROQ_BASE_URL") or None
+LLM_MODEL            = os.environ.get("LLM_MODEL", "llama-3.1-70b-versatile")
+LLM_WORKERS          = int(os.environ.get("LLM_WORKERS", "3"))
+LLM_RPM              = float(os.environ.get("LLM_RPM", "30"))
+LLM_TPM              = float(os.environ.get("LLM_TPM", "6000"))
+
+# Completions are cached on disk for re-runs (empty path disables)
+LLM_CACHE_DB         = os.environ.get("LLM_CACHE_DB", "llm_cache.sqlite3")
+LLM_CACHE_TTL_DAYS   = float(os.environ.get("LLM_CACHE_TTL_DAYS", "7"))
+
+# Demo subjects/records are inserted this many per PostgREST request
+DEMO_WRITE_BATCH     = int(os.environ.get("DEMO_WRITE_BATCH", "10"))
+
+# Posts picked per run: up to each persona's quota, then the best of the rest
+POST_LIMIT           = int(os.environ.get("POST_LIMIT", "10"))
+POST_QUOTAS          = parse_quotas(os.environ.get("POST_QUOTAS", "professional=5,consumer=5"))
+
+# Posts already turned into demo records in earlier runs (empty path disables)
+SEEN_DB              = os.environ.get("SEEN_DB", "seen_posts.sqlite3")
+SEEN_TTL_DAYS        = float(os.environ.get("SEEN_TTL_DAYS", "30"))
+
+# Run stages stream through queues of this many items; progress is checkpointed
+# so a crashed run resumes on the next start within the max age (empty path disables)
+PIPELINE_BUFFER      = int(os.environ.get("PIPELINE_BUFFER", "8"))
+RUN_CHECKPOINT       = os.environ.get("RUN_CHECKPOINT", "monitor.checkpoint.json") or None
+RUN_CHECKPOINT_MAX_AGE_H = float(os.environ.get("RUN_CHECKPOINT_MAX_AGE_H", "12"))
+
 # ── Subreddits ────────────────────────────────────────────────────────────────
 SUBREDDITS = [
     "freelance", "Upwork", "smallbusiness", "realtors",
@@ -70,181 +115,223 @@ POWERLESS_KEYWORDS = [
 ]
 
 
+PROFESSIONAL_INDICATORS = [
+    "my client", "client won't pay", "customer", "my work",
+    "my services", "i did the work", "bad client", "hired me"
+]
+
+# One compiled pass over the post finds every category's hits (see keywords.py)
+KEYWORD_SCANNER = KeywordScanner(
+    {
+        "profession": PROFESSION_KEYWORDS,
+        "persona": PROFESSIONAL_INDICATORS,
+        "evidence": EVIDENCE_KEYWORDS,
+        "urgency": URGENCY_KEYWORDS,
+        "powerless": POWERLESS_KEYWORDS,
+    },
+)
+
+
 def score_post(title: str, body: str) -> tuple[int, str]:
     """Score a Reddit post 0-10 for DNounce fit. Returns (score, persona)."""
     text = (title + " " + body).lower()
+    hits = KEYWORD_SCANNER.scan(text)
     score = 0
-    persona = "consumer"  # default
 
     # Profession mentioned → +3
-    for kw in PROFESSION_KEYWORDS:
-        if kw in text:
-            score += 3
-            break
+    if hits["profession"]:
+        score += 3
 
     # Determine persona
-    professional_indicators = [
-        "my client", "client won't pay", "customer", "my work",
-        "my services", "i did the work", "bad client", "hired me"
-    ]
-    for ind in professional_indicators:
-        if ind in text:
-            persona = "professional"
-            break
+    persona = "professional" if hits["persona"] else "consumer"
 
     # Dollar amount mentioned → +2
-    if re.search(r'\$[\d,]+|\d+\s*dollars?|\d+k\b', text):
+    if has_money(text):
         score += 2
 
     # Evidence mentioned → +2
-    for kw in EVIDENCE_KEYWORDS:
-        if kw in text:
-            score += 2
-            break
+    if hits["evidence"]:
+        score += 2
 
     # Urgency keywords → +2
-    matches = sum(1 for kw in URGENCY_KEYWORDS if kw in text)
-    score += min(matches * 1, 2)
+    score += min(len(hits["urgency"]), 2)
 
     # Powerless/wants help → +1
-    for kw in POWERLESS_KEYWORDS:
-        if kw in text:
-            score += 1
-            break
+    if hits["powerless"]:
+        score += 1
 
     # Cap at 10
     return min(score, 10), persona
 
 
-def fetch_reddit_posts() -> list[dict]:
-    """
-    Fetch recent Reddit posts using Google search RSS feeds.
-    No Reddit API credentials required.
-    """
-    import requests
-    from urllib.parse import quote
+SEARCH_QUERIES = [
+    # Consumer persona — bad experience with professional
+    'site:reddit.com "barber" "won\'t pay" OR "scammed" OR "bad experience"',
+    'site:reddit.com "nail tech" OR "nail salon" "scammed" OR "ripped off" OR "refused refund"',
+    'site:reddit.com "realtor" OR "real estate agent" "scammed" OR "won\'t pay" OR "fraud"',
+    'site:reddit.com "contractor" OR "plumber" OR "electrician" "scammed" OR "took my money" OR "never finished"',
+    'site:reddit.com "freelancer" OR "designer" OR "developer" "won\'t pay" OR "ghosted" OR "scammed"',
+    # Professional persona — bad client
+    'site:reddit.com "my client" "won\'t pay" OR "ghosted me" OR "chargeback" OR "stiffed"',
+    'site:reddit.com "freelancer" "client won\'t pay" OR "client ghosted" OR "bad client"',
+    'site:reddit.com "as a barber" OR "as a nail tech" OR "as a realtor" "bad client" OR "refused to pay"',
+]
 
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-        "Accept": "application/rss+xml, application/xml, text/xml, */*",
-    }
 
-    # Search queries targeting both personas
-    search_queries = [
-        # Consumer persona — bad experience with professional
-        'site:reddit.com "barber" "won\'t pay" OR "scammed" OR "bad experience"',
-        'site:reddit.com "nail tech" OR "nail salon" "scammed" OR "ripped off" OR "refused refund"',
-        'site:reddit.com "realtor" OR "real estate agent" "scammed" OR "won\'t pay" OR "fraud"',
-        'site:reddit.com "contractor" OR "plumber" OR "electrician" "scammed" OR "took my money" OR "never finished"',
-        'site:reddit.com "freelancer" OR "designer" OR "developer" "won\'t pay" OR "ghosted" OR "scammed"',
-        # Professional persona — bad client
-        'site:reddit.com "my client" "won\'t pay" OR "ghosted me" OR "chargeback" OR "stiffed"',
-        'site:reddit.com "freelancer" "client won\'t pay" OR "client ghosted" OR "bad client"',
-        'site:reddit.com "as a barber" OR "as a nail tech" OR "as a realtor" "bad client" OR "refused to pay"',
-    ]
+def read_feed(fetcher: FeedFetcher, query: str, url: str) -> list[dict]:
+    """Reddit items of one search feed with a usable body, parsed as the feed downloads."""
+    chunks = fetcher.open(url)
+    if chunks is None:
+        return []
+    log.info(f"Parsing: {query[:60]}...")
+    return list(iter_items(chunks, label=query[:60], max_bytes=FEED_MAX_BYTES))
+
+
+class PostDeduper:
+    """Drops posts already seen in this run (same link, same or nearly the same text) or handled in an earlier one."""
+
+    def __init__(self, seen: SeenIndex | None):
+        self.seen = seen
+        self.urls = set()
+        self.hashes = set()
+        self.near = NearDuplicates()
+        self.near_duplicates = 0
+        self.already_handled = 0
+
+    def __call__(self, item: dict):
+        link = item["link"]
+        if link in self.urls:
+            return
+        self.urls.add(link)
+
+        # Skip posts handled in an earlier run (or syndicated copies of them)
+        reddit_id = link.split("/")[-2] if "/" in link else link[-8:]
+        digest = content_hash(item["title"], item["body"][:2000])
+        if digest in self.hashes:
+            return
+        self.hashes.add(digest)
+        # Lightly edited copies (cross-posts, small rewrites) of a post already kept
+        fingerprint = simhash(f"{item['title']} {item['body'][:2000]}")
+        if self.near.find(fingerprint) is not None:
+            self.near_duplicates += 1
+            return
+        self.near.add(fingerprint, reddit_id)
+        if self.seen is not None and self.seen.known(reddit_id, link, digest, fingerprint):
+            self.already_handled += 1
+            return
+        yield dict(item, reddit_id=reddit_id, content_hash=digest, simhash=fingerprint)
+
+
+def score_candidate(item: dict):
+    """The candidate post for a deduplicated item, if it scores high enough."""
+    title, body, link = item["title"], item["body"], item["link"]
+    score, persona = score_post(title, body)
+    if score < 4:
+        return
 
-    candidates = []
-    seen_urls = set()
+    # Extract subreddit from URL
+    sub_match = re.search(r'reddit\.com/r/(\w+)', link)
+    subreddit = sub_match.group(1) if sub_match else "reddit"
+
+    # Extract author if present
+    author_match = re.search(r'/u/(\w+)', body + title)
+    author = author_match.group(1) if author_match else "unknown"
+
+    yield {
+        "reddit_id": item["reddit_id"],
+        "title": title,
+        "body": body[:2000],
+        "author": author,
+        "subreddit": subreddit,
+        "url": link,
+        "score": score,
+        "persona": persona,
+        "created_utc": time.time(),
+        "content_hash": item["content_hash"],
+        "simhash": item["simhash"],
+    }
 
-    for query in search_queries:
-        try:
-            # Use Google's RSS search feed
-            encoded = quote(query)
-            url = f"https://news.google.com/rss/search?q={encoded}&hl=en-US&gl=US&ceid=US:en"
-
-            log.info(f"Searching: {query[:60]}...")
-            r = requests.get(url, headers=headers, timeout=15)
-
-            if r.status_code != 200:
-                log.warning(f"Search returned {r.status_code}. Skipping.")
-                time.sleep(3)
-                continue
-
-            # Parse RSS XML
-            import xml.etree.ElementTree as ET
-            root = ET.fromstring(r.content)
-            items = root.findall(".//item")
-
-            for item in items:
-                title_el = item.find("title")
-                link_el = item.find("link")
-                desc_el = item.find("description")
-
-                if title_el is None or link_el is None:
-                    continue
-
-                title = title_el.text or ""
-                link = link_el.text or ""
-                desc = desc_el.text or "" if desc_el is not None else ""
-
-                # Only keep Reddit links
-                if "reddit.com" not in link:
-                    continue
-
-                # Skip duplicates
-                if link in seen_urls:
-                    continue
-                seen_urls.add(link)
-
-                # Clean description (strip HTML tags)
-                import re as re_module
-                clean_desc = re_module.sub(r'<[^>]+>', '', desc).strip()
-
-                body = clean_desc or title
-                if len(body) < 50:
-                    continue
-
-                score, persona = score_post(title, body)
-
-                if score >= 4:
-                    # Extract subreddit from URL
-                    sub_match = re_module.search(r'reddit\.com/r/(\w+)', link)
-                    subreddit = sub_match.group(1) if sub_match else "reddit"
-
-                    # Extract author if present
-                    author_match = re_module.search(r'/u/(\w+)', body + title)
-                    author = author_match.group(1) if author_match else "unknown"
-
-                    candidates.append({
-                        "reddit_id": link.split("/")[-2] if "/" in link else link[-8:],
-                        "title": title,
-                        "body": body[:2000],
-                        "author": author,
-                        "subreddit": subreddit,
-                        "url": link,
-                        "score": score,
-                        "persona": persona,
-                        "created_utc": time.time(),
-                    })
-
-            time.sleep(3)  # Be respectful between searches
 
+def fetch_reddit_posts(seen: SeenIndex | None = None) -> list[dict]:
+    """
+    Fetch recent Reddit posts using Google search RSS feeds.
+    No Reddit API credentials required. Feeds stream through
+    fetch → dedupe → score; each feed is parsed as it downloads, while the
+    others download too. Posts already in `seen` are dropped before scoring.
+    """
+    # Use Google's RSS search feed
+    urls = [
+        f"https://news.google.com/rss/search?q={quote(query)}&hl=en-US&gl=US&ceid=US:en"
+        for query in SEARCH_QUERIES
+    ]
+    fetcher = FeedFetcher(
+        workers=FETCH_WORKERS,
+        min_interval_s=FETCH_MIN_INTERVAL_S,
+        cache_dir=FEED_CACHE_DIR,
+    )
+    dedupe = PostDeduper(seen)
+
+    def fetch_feed(job):
+        index, url = job
+        query = SEARCH_QUERIES[index]
+        try:
+            items = read_feed(fetcher, query, url)
         except Exception as e:
-            log.warning(f"Search error: {e}")
-            continue
-
-    # Sort by score descending
-    candidates.sort(key=lambda x: x["score"], reverse=True)
-
-    # Return top 10 (5 professional + 5 consumer if possible)
-    professionals = [c for c in candidates if c["persona"] == "professional"][:5]
-    consumers = [c for c in candidates if c["persona"] == "consumer"][:5]
-
-    result = professionals + consumers
-    if len(result) < 10:
-        extras = [c for c in candidates if c not in result]
-        result += extras[:10 - len(result)]
-
-    log.info(f"Found {len(result)} qualifying posts")
-    return result[:10]
-
-
-def generate_demo_record(post: dict) -> dict:
-    """Use Groq to generate a realistic DNounce record from a Reddit post."""
-    from groq import Groq
-
-    client = Groq(api_key=GROQ_API_KEY)
-
+            # Still emit the feed (empty): the in-order dedupe stage waits for every index
+            log.warning(f"Search error: {e} ({query[:60]})")
+            items = []
+        return [(index, items)]
+
+    def dedupe_feed(items):
+        for item in items:
+            yield from dedupe(item)
+
+    pipeline = (
+        Pipeline("fetch", buffer=PIPELINE_BUFFER)
+        .stage("fetch", fetch_feed, workers=FETCH_WORKERS)
+        # Dedupe in query order so it keeps the same post as a sequential run would
+        .stage("dedupe", in_order(dedupe_feed))
+        .stage("score", score_candidate)
+    )
+    selector = PersonaSelector(POST_QUOTAS, POST_LIMIT)
+    try:
+        for candidate in pipeline.run(enumerate(urls)):
+            selector.add(candidate)
+    finally:
+        fetcher.cache.save()
+        fetcher.close()
+    log.info(
+        f"Fetched {len(urls)} feeds ({fetcher.stats['fetched']} new, {fetcher.stats['not_modified']} not modified, "
+        f"{fetcher.stats['failed']} failed, {fetcher.stats['rate_limited']} rate limited)"
+    )
+    pipeline.log_stats()
+
+    result = selector.selected()
+    if dedupe.near_duplicates:
+        log.info(f"Dropped {dedupe.near_duplicates} near-duplicates of other posts in this run")
+    if dedupe.already_handled:
+        log.info(f"Dropped {dedupe.already_handled} posts handled in earlier runs")
+    log.info(f"Found {len(result)} qualifying posts out of {selector.seen} candidates")
+    return result
+
+
+def make_llm_client() -> LLMClient:
+    """The run's one Groq client; every generation shares its connections and rate limiter."""
+    return LLMClient(
+        api_key=GROQ_API_KEY,
+        model=LLM_MODEL,
+        limiter=RateLimiter(LLM_RPM, LLM_TPM),
+        base_url=GROQ_BASE_URL,
+        cache=ResponseCache(LLM_CACHE_DB, LLM_CACHE_TTL_DAYS) if LLM_CACHE_DB else None,
+    )
+
+
+def generate_demo_record(post: dict, llm: LLMClient) -> dict:
+    """
+    Use Groq to generate a realistic DNounce record from a Reddit post. A
+    cut-off or malformed answer is repaired where possible, and any fields
+    still missing or invalid are asked for again on their own.
+    """
     persona = post["persona"]
     role = "professional defending themselves against a bad client" if persona == "professional" else "consumer filing a record against a professional"
 
@@ -257,77 +344,59 @@ Reddit post body: {post['body'][:1000]}
 User role: {role}
 
 Generate a JSON object with these exact fields:
-{{
-  "subject_name": "the professional's name or business (invent a realistic one if not mentioned)",
-  "subject_profession": "their profession/job title",
-  "subject_location": "city, state (invent realistic one based on context)",
-  "relationship": "the relationship between the two parties",
-  "category": "the profession category (e.g. Barber, Nail Tech, Freelancer)",
-  "description": "a detailed, factual 3-4 sentence description of what happened, written as the record filer",
-  "rating": a number from 1 to 4 (bad experience),
-  "contributor_display_name": "realistic first name + last initial for the person filing",
-  "debate_subject_opening": "2-3 sentences from the subject (other side) defending themselves professionally",
-  "debate_subject_response": "2-3 sentences responding to any counter-arguments",
-  "voter_1_alias": "a realistic voter alias",
-  "voter_1_choice": "side_with_contributor or side_with_subject",
-  "voter_1_explanation": "1-2 sentences explaining their vote",
-  "voter_2_alias": "a realistic voter alias",
-  "voter_2_choice": "side_with_contributor or side_with_subject",
-  "voter_2_explanation": "1-2 sentences explaining their vote",
-  "voter_3_alias": "a realistic voter alias",
-  "voter_3_choice": "side_with_contributor or side_with_subject",
-  "voter_3_explanation": "1-2 sentences explaining their vote",
-  "citizen_1_alias": "a realistic citizen alias",
-  "citizen_1_statement": "1-2 sentences of community commentary",
-  "citizen_2_alias": "a realistic citizen alias",
-  "citizen_2_statement": "1-2 sentences of community commentary"
-}}
+{fields_block(FIELDS)}
 
 Return ONLY valid JSON. No markdown, no explanation, no backticks."""
 
+    record = None
+    missing = list(FIELDS)
     for attempt in range(3):
-        try:
-            response = client.chat.completions.create(
-                model="llama-3.1-70b-versatile",
-                messages=[{"role": "user", "content": prompt}],
-                max_tokens=1500,
-                temperature=0.7,
-            )
-            content = response.choices[0].message.content.strip()
-            # Strip any accidental markdown
-            content = re.sub(r'^```json\s*', '', content)
-            content = re.sub(r'\s*```$', '', content)
-            return json.loads(content)
-        except json.JSONDecodeError as e:
-            log.warning(f"JSON parse error on attempt {attempt + 1}: {e}")
-            time.sleep(2)
-        except Exception as e:
-            log.warning(f"Groq error on attempt {attempt + 1}: {e}")
-            if "429" in str(e):
-                wait = 30 * (2 ** attempt)
-                log.info(f"Rate limited. Waiting {wait}s...")
-                time.sleep(wait)
-            else:
-                time.sleep(2)
+        # Rate limits and transient API errors are retried inside the client
+        content = llm.complete(prompt, max_tokens=1500, temperature=0.7)
+        if content is None:
+            return None
+        record, missing = parse_record(content)
+        if record:
+            break
+        log.warning(f"No usable record in completion on attempt {attempt + 1}")
+        # Don't let the retry (or a later run) be answered with the same bad completion
+        llm.forget(prompt, max_tokens=1500, temperature=0.7)
+    else:
+        return None
 
+    # Ask again for just the fields that are missing or invalid
+    followups = []
+    for attempt in range(2):
+        if not missing:
+            return record
+        log.info(f"Asking again for {len(missing)} fields: {', '.join(missing)}")
+        followup = (followup_prompt(post, record, missing), followup_max_tokens(missing))
+        followups.append(followup)
+        content = llm.complete(followup[0], max_tokens=followup[1], temperature=0.7)
+        if content is None:
+            break
+        patch, _ = parse_record(content)
+        added = {k: v for k, v in (patch or {}).items() if k in missing}
+        if not added:
+            # Same fields and context next time: a cached answer would add nothing again
+            llm.forget(followup[0], max_tokens=followup[1], temperature=0.7)
+        record.update(added)
+        missing = [name for name in FIELDS if name not in record]
+    if not missing:
+        return record
+
+    log.warning(f"Record still missing {', '.join(missing)}")
+    llm.forget(prompt, max_tokens=1500, temperature=0.7)
+    for followup_text, followup_tokens in followups:
+        llm.forget(followup_text, max_tokens=followup_tokens, temperature=0.7)
     return None
 
 
-def insert_demo_record(post: dict, generated: dict) -> str | None:
-    """Insert demo record into Supabase. Returns the record ID or None."""
-    import requests
-
+def build_demo_rows(post: dict, generated: dict) -> tuple[dict, dict]:
+    """The demo subject and record rows for one post (written in batches by DemoRecordWriter)."""
     record_id = str(uuid.uuid4())
     expires_at = (datetime.now(timezone.utc) + timedelta(days=7)).isoformat()
 
-    # Find or create a demo subject
-    headers = {
-        "apikey": SUPABASE_KEY,
-        "Authorization": f"Bearer {SUPABASE_KEY}",
-        "Content-Type": "application/json",
-        "Prefer": "return=representation"
-    }
-
     # Create demo subject
     subject_id = str(uuid.uuid4())
     subject_payload = {
@@ -338,21 +407,7 @@ def insert_demo_record(post: dict, generated: dict) -> str | None:
         "organization": None,
     }
 
-    try:
-        r = requests.post(
-            f"{SUPABASE_URL}/rest/v1/subjects",
-            headers=headers,
-            json=subject_payload,
-            timeout=10
-        )
-        if r.status_code not in (200, 201):
-            log.error(f"Subject insert failed: {r.status_code} {r.text}")
-            return None
-    except Exception as e:
-        log.error(f"Subject insert exception: {e}")
-        return None
-
-    # Insert the demo record
+    # The demo record
     record_payload = {
         "id": record_id,
         "subject_id": subject_id,
@@ -375,32 +430,20 @@ def insert_demo_record(post: dict, generated: dict) -> str | None:
         "first_name": generated.get("subject_name", "Demo").split()[0],
         "last_name": generated.get("subject_name", "Subject Demo").split()[-1],
     }
+    return subject_payload, record_payload
 
-    try:
-        r = requests.post(
-            f"{SUPABASE_URL}/rest/v1/records",
-            headers=headers,
-            json=record_payload,
-            timeout=10
-        )
-        if r.status_code not in (200, 201):
-            log.error(f"Record insert failed: {r.status_code} {r.text}")
-            return None
-    except Exception as e:
-        log.error(f"Record insert exception: {e}")
-        return None
 
-    log.info(f"Demo record created: {record_id}")
-    return record_id
+def make_writer() -> DemoRecordWriter:
+    return DemoRecordWriter(SUPABASE_URL, SUPABASE_KEY, batch_size=DEMO_WRITE_BATCH)
 
 
-def send_summary_email(matches: list[dict]) -> None:
-    """Send daily summary email via Resend."""
+def send_summary_email(matches: list[dict]) -> bool:
+    """Send daily summary email via Resend. True once there is nothing left to send."""
     import requests
 
     if not matches:
         log.info("No matches to email.")
-        return
+        return True
 
     # Build HTML summary card
     cards_html = ""
@@ -451,42 +494,38 @@ def send_summary_email(matches: list[dict]) -> None:
         )
         if r.status_code in (200, 201):
             log.info("Summary email sent successfully")
-        else:
-            log.error(f"Email send failed: {r.status_code} {r.text}")
+            return True
+        log.error(f"Email send failed: {r.status_code} {r.text}")
     except Exception as e:
         log.error(f"Email exception: {e}")
+    return False
 
 
-def main():
-    log.info("=== DNounce Reddit Monitor Starting ===")
-    log.info(f"Run time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-
-    # Step 1 — Fetch and score Reddit posts
-    posts = fetch_reddit_posts()
-    if not posts:
-        log.warning("No qualifying posts found today.")
-        return
-
-    # Step 2 — Generate demo records for each match
-    matches = []
-    for post in posts:
-        log.info(f"Processing: {post['title'][:60]}... (score: {post['score']}, persona: {post['persona']})")
-
-        # Generate AI content
-        generated = generate_demo_record(post)
-        if not generated:
-            log.warning(f"Skipping post — AI generation failed")
-            continue
-
-        # Insert into DB
-        record_id = insert_demo_record(post, generated)
-        if not record_id:
-            log.warning(f"Skipping post — DB insert failed")
-            continue
+def generate_and_insert(
+    posts: list[dict],
+    llm: LLMClient,
+    writer: DemoRecordWriter,
+    workers: int | None = None,
+    seen: SeenIndex | None = None,
+    checkpoint: RunCheckpoint | None = None,
+) -> list[dict]:
+    """
+    Stream posts through generate (a bounded pool of LLM_WORKERS threads) →
+    insert (`writer`, DEMO_WRITE_BATCH rows per request), so records are
+    written while the remaining generations run. Written posts are added to
+    `seen`. With a `checkpoint`, each generated and written record is saved
+    as it happens and posts a resumed run already finished are not redone.
+    Matches come back in the order of `posts`.
+    """
+    checkpoint = checkpoint or RunCheckpoint(None)
+    workers = max(1, workers or LLM_WORKERS)
+    generated_by_index = {}
+    matches = {}
 
+    def add_match(i, record_id):
+        post = posts[i]
         demo_url = f"{DNOUNCE_BASE_URL}/record/{record_id}"
-
-        matches.append({
+        matches[i] = {
             "title": post["title"],
             "body": post["body"],
             "author": post["author"],
@@ -495,15 +534,112 @@ def main():
             "persona": post["persona"],
             "reddit_url": post["url"],
             "demo_url": demo_url,
-            "generated": generated,
-        })
-
+            "generated": generated_by_index[i],
+        }
         log.info(f"✅ Match ready: {post['url']} → {demo_url}")
-        time.sleep(2)  # Be respectful to Groq rate limits
 
-    # Step 3 — Send summary email
+    todo = []
+    for i, post in enumerate(posts):
+        generated = checkpoint.get("generated", post["reddit_id"])
+        record_id = checkpoint.get("records", post["reddit_id"])
+        if generated is not None and record_id:
+            generated_by_index[i] = generated
+            add_match(i, record_id)
+            continue
+        log.info(f"Processing: {post['title'][:60]}... (score: {post['score']}, persona: {post['persona']})")
+        todo.append((i, generated))
+    if len(todo) < len(posts):
+        log.info(f"Resuming: {len(posts) - len(todo)} posts already have demo records")
+
+    def generate(job):
+        i, generated = job
+        post = posts[i]
+        if generated is None:
+            generated = generate_demo_record(post, llm)
+            if not generated:
+                log.warning(f"Skipping post — AI generation failed")
+                return
+            checkpoint.put("generated", post["reddit_id"], generated)
+        generated_by_index[i] = generated
+        yield i, generated
+
+    def insert(job):
+        i, generated = job
+        # Queue for the DB; a full batch is written here
+        subject, record = build_demo_rows(posts[i], generated)
+        return writer.add(i, subject, record)
+
+    pipeline = (
+        Pipeline("generate", buffer=PIPELINE_BUFFER)
+        .stage("generate", generate, workers=workers)
+        .stage("insert", insert, flush=writer.flush)
+    )
+    for i, record_id in pipeline.run(todo):
+        post = posts[i]
+        if not record_id:
+            log.warning(f"Skipping post — DB insert failed")
+            continue
+        checkpoint.put("records", post["reddit_id"], record_id)
+        if seen is not None:
+            seen.add(post, record_id)
+        add_match(i, record_id)
+    pipeline.log_stats()
+
+    return [matches[i] for i in sorted(matches)]
+
+
+def main():
+    log.info("=== DNounce Reddit Monitor Starting ===")
+    log.info(f"Run time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+
+    checkpoint = RunCheckpoint(RUN_CHECKPOINT, RUN_CHECKPOINT_MAX_AGE_H)
+    if checkpoint.resumed:
+        log.info(
+            f"Resuming the run started {datetime.fromtimestamp(checkpoint.state['started_at']):%Y-%m-%d %H:%M}: "
+            f"{len(checkpoint.state['generated'])} records generated, {len(checkpoint.state['records'])} written"
+        )
+
+    seen = SeenIndex(SEEN_DB, SEEN_TTL_DAYS) if SEEN_DB else None
+    if seen is not None:
+        log.info(f"Seen-post index: {len(seen)} posts ({seen.evicted} expired)")
+
+    try:
+        # Step 1 — Fetch and score Reddit posts (a resumed run keeps its selection)
+        posts = checkpoint.state["posts"]
+        if posts is None:
+            posts = fetch_reddit_posts(seen)
+            checkpoint.set("posts", posts)
+        if not posts:
+            log.warning("No qualifying posts found today.")
+            checkpoint.finish()
+            return
+
+        # Step 2 — Generate demo records for each match
+        llm = make_llm_client()
+        writer = make_writer()
+        try:
+            matches = generate_and_insert(posts, llm, writer, seen=seen, checkpoint=checkpoint)
+        finally:
+            writer.close()
+            if llm.cache is not None:
+                llm.cache.close()
+        log.info(
+            f"Supabase: {writer.stats['written']} records in {writer.stats['requests']} requests, "
+            f"{writer.stats['failed']} failed, {writer.stats['orphans_removed']} orphan subjects removed, "
+            f"{writer.stats['orphans_left']} possibly orphaned"
+        )
+    finally:
+        if seen is not None:
+            seen.close()
+    log.info(
+        f"Groq: {llm.calls} calls, {llm.cache_hits} answered from cache, {llm.tokens_used} tokens, {llm.failures} failed, "
+        f"{llm.limiter.throttled} rate-limit pauses, {llm.limiter.waited_s:.1f}s waiting on limits"
+    )
+
+    # Step 3 — Send summary email; until it is sent, a restart resumes the run
     log.info(f"Sending summary email with {len(matches)} matches...")
-    send_summary_email(matches)
+    if send_summary_email(matches):
+        checkpoint.finish()
 
     log.info(f"=== Done. {len(matches)}/{len(posts)} records created successfully ===")
 
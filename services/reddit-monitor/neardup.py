@@ -0,0 +1,88 @@
+"""
+Near-duplicate detection for post text.
+
+The same story is often posted to several subreddits with small edits (a
+line added, a typo fixed, a different sign-off), which an exact content
+hash misses. simhash() reduces a text to a 64-bit fingerprint of its word
+3-shingles; texts that differ only a little land within a few bits of each
+other. NearDuplicates finds a fingerprint within `max_distance` bits without
+comparing against every stored one: split into max_distance + 1 bands, two
+fingerprints that close must agree exactly on at least one band, so only
+fingerprints sharing a band are checked.
+"""
+import hashlib
+import re
+from typing import Dict, Hashable, List, Optional, Tuple
+
+WORD_RE = re.compile(r"[a-z0-9]+")
+
+BITS = 64
+# Small edits to a short post move its fingerprint 3-5 bits; unrelated posts
+# on the same topics (the fixtures) are 23+ bits apart.
+DEFAULT_MAX_DISTANCE = 6
+
+
+def _feature_hash(feature: str) -> int:
+    return int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def simhash(text: str) -> int:
+    """64-bit SimHash of the text's word 3-shingles (its words, for texts under three words)."""
+    words = WORD_RE.findall(text.lower())
+    if len(words) >= 3:
+        features = [" ".join(words[i:i + 3]) for i in range(len(words) - 2)]
+    else:
+        features = words
+    counts = [0] * BITS
+    for feature in features:
+        h = _feature_hash(feature)
+        for bit in range(BITS):
+            counts[bit] += 1 if h >> bit & 1 else -1
+    fingerprint = 0
+    for bit, count in enumerate(counts):
+        if count > 0:
+            fingerprint |= 1 << bit
+    return fingerprint
+
+
+def distance(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def bands(fingerprint: int, count: int) -> List[int]:
+    """The fingerprint cut into `count` bit ranges, low bits first (the last takes the remainder)."""
+    width = BITS // count
+    out = []
+    for i in range(count):
+        bits = width if i < count - 1 else BITS - width * (count - 1)
+        out.append(fingerprint >> (i * width) & ((1 << bits) - 1))
+    return out
+
+
+def to_signed(fingerprint: int) -> int:
+    """As a signed 64-bit integer, for SQLite."""
+    return fingerprint - (1 << BITS) if fingerprint >= 1 << (BITS - 1) else fingerprint
+
+
+def from_signed(value: int) -> int:
+    return value & ((1 << BITS) - 1)
+
+
+class NearDuplicates:
+    """In-memory fingerprints of one run, looked up by band."""
+
+    def __init__(self, max_distance: int = DEFAULT_MAX_DISTANCE):
+        self.max_distance = max_distance
+        self._bands: Dict[Tuple[int, int], List[Tuple[int, Hashable]]] = {}
+
+    def find(self, fingerprint: int) -> Optional[Hashable]:
+        """Key of a stored fingerprint within max_distance bits, or None."""
+        for band in enumerate(bands(fingerprint, self.max_distance + 1)):
+            for other, key in self._bands.get(band, ()):
+                if distance(fingerprint, other) <= self.max_distance:
+                    return key
+        return None
+
+    def add(self, fingerprint: int, key: Hashable) -> None:
+        for band in enumerate(bands(fingerprint, self.max_distance + 1)):
+            self._bands.setdefault(band, []).append((fingerprint, key))
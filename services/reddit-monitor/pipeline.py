@@ -0,0 +1,278 @@
+"""
+Streaming stages and a resumable checkpoint for the monitor's daily run.
+
+A Pipeline is a chain of stages joined by bounded queues. Each stage runs on
+its own thread(s) and hands every output downstream as soon as it has it,
+so one feed is deduplicated while the next is still downloading and a record is
+queued for the database while the next one is still generating. A full
+queue blocks the stage feeding it, which caps what is held in memory. A
+stage that fails on one item logs it and moves on to the next.
+
+Each stage counts items in and out and its busy time; log_stats() reports
+them per stage, so the slow stage of a run is obvious from the log.
+
+RunCheckpoint records the run's progress after every step (posts selected,
+each record generated, each record written, summary sent). A run that
+crashes is picked up by the next start within `max_age_h`, which skips
+what is already done and emails the full set.
+"""
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+log = logging.getLogger("dnounce-monitor")
+
+_DONE = object()
+_POLL_S = 0.1
+
+StageFn = Callable[[Any], Iterable[Any]]
+
+
+class StageStats:
+    def __init__(self, name: str, workers: int):
+        self.name = name
+        self.workers = workers
+        self.items_in = 0
+        self.items_out = 0
+        self.errors = 0
+        self.busy_s = 0.0
+        self.first_at: Optional[float] = None
+        self.last_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def record(self, outputs: int, busy_s: float, failed: bool, started: float) -> None:
+        with self._lock:
+            self.items_in += 1
+            self.items_out += outputs
+            self.errors += failed
+            self.busy_s += busy_s
+            if self.first_at is None:
+                self.first_at = started
+            self.last_at = started + busy_s
+
+    def flushed(self, outputs: int) -> None:
+        with self._lock:
+            self.items_out += outputs
+
+    def line(self) -> str:
+        wall = (self.last_at - self.first_at) if self.first_at is not None else 0.0
+        rate = self.items_in / wall if wall > 0 else 0.0
+        errors = f", {self.errors} failed" if self.errors else ""
+        return (
+            f"{self.name}: {self.items_in} in, {self.items_out} out{errors} over {wall:.2f}s "
+            f"({rate:.1f}/s, {self.busy_s:.2f}s busy on {self.workers} thread{'s' if self.workers > 1 else ''})"
+        )
+
+
+class _Stage:
+    def __init__(self, name: str, fn: StageFn, workers: int, flush: Optional[Callable[[], Iterable[Any]]]):
+        self.name = name
+        self.fn = fn
+        self.workers = max(1, workers)
+        self.flush = flush
+        self.stats = StageStats(name, self.workers)
+        self.running = self.workers
+        self.lock = threading.Lock()
+
+
+class Pipeline:
+    def __init__(self, name: str, buffer: int = 8):
+        self.name = name
+        self.buffer = max(1, buffer)
+        self.stages: List[_Stage] = []
+        self._stop = threading.Event()
+
+    def stage(
+        self,
+        name: str,
+        fn: StageFn,
+        workers: int = 1,
+        flush: Optional[Callable[[], Iterable[Any]]] = None,
+    ) -> "Pipeline":
+        """
+        Add a stage: fn(item) returns the item's outputs (none to drop it,
+        several to fan out). flush(), if given, is called once after the
+        stage's last input and its outputs are sent downstream too.
+        """
+        self.stages.append(_Stage(name, fn, workers, flush))
+        return self
+
+    def _put(self, q: queue.Queue, item: Any) -> bool:
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=_POLL_S)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, q: queue.Queue) -> Any:
+        while not self._stop.is_set():
+            try:
+                return q.get(timeout=_POLL_S)
+            except queue.Empty:
+                continue
+        return _DONE
+
+    def _feed(self, source: Iterable[Any], out: queue.Queue) -> None:
+        try:
+            for item in source:
+                if not self._put(out, item):
+                    return
+        except Exception as e:
+            log.error(f"{self.name}: source failed: {e}")
+        self._put(out, _DONE)
+
+    def _work(self, stage: _Stage, inq: queue.Queue, out: queue.Queue) -> None:
+        while True:
+            item = self._get(inq)
+            if item is _DONE:
+                # Let this stage's other workers see the end too
+                self._put(inq, _DONE)
+                break
+            started = time.perf_counter()
+            produced = 0
+            failed = False
+            try:
+                for result in stage.fn(item):
+                    produced += 1
+                    if not self._put(out, result):
+                        return
+            except Exception as e:
+                failed = True
+                log.warning(f"{self.name}/{stage.name}: skipping item — {e}")
+            stage.stats.record(produced, time.perf_counter() - started, failed, started)
+
+        with stage.lock:
+            stage.running -= 1
+            last = stage.running == 0
+        if not last or self._stop.is_set():
+            return
+        if stage.flush is not None:
+            produced = 0
+            try:
+                for result in stage.flush():
+                    produced += 1
+                    if not self._put(out, result):
+                        return
+            except Exception as e:
+                log.warning(f"{self.name}/{stage.name}: flush failed — {e}")
+            stage.stats.flushed(produced)
+        self._put(out, _DONE)
+
+    def run(self, source: Iterable[Any]) -> Iterator[Any]:
+        """Stream `source` through the stages; yields the last stage's outputs as they arrive."""
+        queues = [queue.Queue(maxsize=self.buffer) for _ in range(len(self.stages) + 1)]
+        threads = [threading.Thread(target=self._feed, args=(source, queues[0]), name=f"{self.name}-source", daemon=True)]
+        for i, stage in enumerate(self.stages):
+            for w in range(stage.workers):
+                threads.append(threading.Thread(
+                    target=self._work, args=(stage, queues[i], queues[i + 1]),
+                    name=f"{self.name}-{stage.name}-{w}", daemon=True,
+                ))
+        for t in threads:
+            t.start()
+        try:
+            while True:
+                item = self._get(queues[-1])
+                if item is _DONE:
+                    break
+                yield item
+        finally:
+            # Also reached when the caller stops early: unblock every thread
+            self._stop.set()
+            for t in threads:
+                t.join()
+
+    def log_stats(self) -> None:
+        for stage in self.stages:
+            log.info(f"[{self.name}] {stage.stats.line()}")
+
+
+def in_order(fn: StageFn) -> StageFn:
+    """
+    For a single-thread stage fed (index, value) pairs in any order: calls
+    fn(value) in index order, holding early arrivals until their turn.
+    Every index from 0 up must arrive (an empty value for an item that
+    failed upstream), or everything after the gap is held back.
+    """
+    pending: Dict[int, Any] = {}
+    next_index = 0
+
+    def stage(item):
+        nonlocal next_index
+        index, value = item
+        pending[index] = value
+        ready = []
+        while next_index in pending:
+            ready.append(pending.pop(next_index))
+            next_index += 1
+        for value in ready:
+            yield from fn(value)
+
+    return stage
+
+
+class RunCheckpoint:
+    """
+    Progress of the current run, written to `path` (atomically) after every
+    step; None keeps it in memory only. A checkpoint from an unfinished run
+    younger than `max_age_h` is resumed, anything else starts a new run.
+    """
+
+    def __init__(self, path: Optional[str], max_age_h: float = 12.0):
+        self.path = path
+        self._lock = threading.Lock()
+        self.state: Dict[str, Any] = {
+            "started_at": time.time(),
+            "posts": None,
+            "generated": {},
+            "records": {},
+            "reported": False,
+        }
+        self.resumed = False
+        previous = self._load()
+        if previous and not previous.get("reported") and time.time() - previous.get("started_at", 0) < max_age_h * 3600:
+            self.state.update(previous)
+            self.resumed = True
+
+    def _load(self) -> Dict[str, Any]:
+        if not self.path:
+            return {}
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            log.warning(f"Ignoring unreadable run checkpoint {self.path}: {e}")
+            return {}
+
+    def _save(self) -> None:
+        if not self.path:
+            return
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.state, f, indent=2)
+        os.replace(tmp, self.path)
+
+    def set(self, key: str, value: Any) -> None:
+        with self._lock:
+            self.state[key] = value
+            self._save()
+
+    def put(self, section: str, key: str, value: Any) -> None:
+        with self._lock:
+            self.state[section][key] = value
+            self._save()
+
+    def get(self, section: str, key: str) -> Any:
+        with self._lock:
+            return self.state[section].get(key)
+
+    def finish(self) -> None:
+        self.set("reported", True)
@@ -0,0 +1,212 @@
+"""
+The demo record the LLM is asked for, and how its answer is read.
+
+A completion that isn't clean JSON is usually still mostly right: wrapped in
+prose or a code fence, a trailing comma, cut off at max_tokens, a rating of
+"2" or 2.5. parse_record() takes the first balanced {...} in the text (for
+a cut-off answer, the members before the cut), removes trailing commas,
+then validates each of the 23 fields and coerces what it safely can. The
+fields that are still missing or invalid come back by name, so the caller
+can ask for just those (followup_prompt) instead of regenerating the whole
+record.
+"""
+import json
+import re
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Field -> what to put in it, in the order the prompt lists them
+FIELDS: Dict[str, str] = {
+    "subject_name": "the professional's name or business (invent a realistic one if not mentioned)",
+    "subject_profession": "their profession/job title",
+    "subject_location": "city, state (invent realistic one based on context)",
+    "relationship": "the relationship between the two parties",
+    "category": "the profession category (e.g. Barber, Nail Tech, Freelancer)",
+    "description": "a detailed, factual 3-4 sentence description of what happened, written as the record filer",
+    "rating": "a number from 1 to 4 (bad experience)",
+    "contributor_display_name": "realistic first name + last initial for the person filing",
+    "debate_subject_opening": "2-3 sentences from the subject (other side) defending themselves professionally",
+    "debate_subject_response": "2-3 sentences responding to any counter-arguments",
+    "voter_1_alias": "a realistic voter alias",
+    "voter_1_choice": "side_with_contributor or side_with_subject",
+    "voter_1_explanation": "1-2 sentences explaining their vote",
+    "voter_2_alias": "a realistic voter alias",
+    "voter_2_choice": "side_with_contributor or side_with_subject",
+    "voter_2_explanation": "1-2 sentences explaining their vote",
+    "voter_3_alias": "a realistic voter alias",
+    "voter_3_choice": "side_with_contributor or side_with_subject",
+    "voter_3_explanation": "1-2 sentences explaining their vote",
+    "citizen_1_alias": "a realistic citizen alias",
+    "citizen_1_statement": "1-2 sentences of community commentary",
+    "citizen_2_alias": "a realistic citizen alias",
+    "citizen_2_statement": "1-2 sentences of community commentary",
+}
+
+RATING_MIN, RATING_MAX = 1, 4
+VOTE_CHOICES = ("side_with_contributor", "side_with_subject")
+# Rough completion tokens per field asked for again (explanations run longest)
+FOLLOWUP_TOKENS_PER_FIELD = 80
+
+FENCE_RE = re.compile(r"```(?:json)?", re.IGNORECASE)
+TRAILING_COMMA_RE = re.compile(r",(\s*[}\]])")
+NUMBER_RE = re.compile(r"-?\d+(?:\.\d+)?")
+
+
+def fields_block(names: Iterable[str]) -> str:
+    """The JSON template of `names` as the prompts show it."""
+    lines = []
+    for name in names:
+        value = FIELDS[name] if name == "rating" else f'"{FIELDS[name]}"'
+        lines.append(f'  "{name}": {value}')
+    return "{\n" + ",\n".join(lines) + "\n}"
+
+
+def _scan(text: str, start: int) -> Tuple[Optional[int], Optional[int]]:
+    """
+    From the "{" at `start`: (end of the balanced object, None), or for
+    text that ends first, (None, end of the last complete top-level member).
+    """
+    depth = 0
+    in_string = False
+    escaped = False
+    last_member = None
+    for i in range(start, len(text)):
+        ch = text[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+            continue
+        if ch == '"':
+            in_string = True
+        elif ch in "{[":
+            depth += 1
+        elif ch in "}]":
+            depth -= 1
+            if depth == 0:
+                return i + 1, None
+        elif ch == "," and depth == 1:
+            last_member = i
+    return None, last_member
+
+
+def _strip_trailing_commas(text: str) -> str:
+    """Remove commas directly before a closing } or ], outside strings."""
+    out = []
+    in_string = False
+    escaped = False
+    for i, ch in enumerate(text):
+        if in_string:
+            out.append(ch)
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+            continue
+        if ch == '"':
+            in_string = True
+        elif ch == "," and TRAILING_COMMA_RE.match(text, i):
+            continue
+        out.append(ch)
+    return "".join(out)
+
+
+def extract_object(text: str) -> Optional[Dict[str, Any]]:
+    """The first JSON object in `text`, repaired if need be; None if there is none to be had."""
+    text = FENCE_RE.sub("", text)
+    start = text.find("{")
+    if start == -1:
+        return None
+    end, last_member = _scan(text, start)
+    if end is not None:
+        candidate = text[start:end]
+    elif last_member is not None:
+        # Cut off (e.g. at max_tokens): keep the members before the cut
+        candidate = text[start:last_member] + "}"
+    else:
+        return None
+    for attempt in (candidate, _strip_trailing_commas(candidate)):
+        try:
+            value = json.loads(attempt)
+        except json.JSONDecodeError:
+            continue
+        return value if isinstance(value, dict) else None
+    return None
+
+
+def coerce_rating(value: Any) -> Optional[int]:
+    """2, 2.4, "2", "2/4", "2 stars" -> 2, clamped to 1-4; None if there is no number."""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        number = float(value)
+    elif isinstance(value, str):
+        match = NUMBER_RE.search(value)
+        if not match:
+            return None
+        number = float(match.group())
+    else:
+        return None
+    return min(RATING_MAX, max(RATING_MIN, int(round(number))))
+
+
+def coerce_choice(value: Any) -> Optional[str]:
+    """"Side with contributor" / "side-with-subject" -> the canonical choice; None otherwise."""
+    if not isinstance(value, str):
+        return None
+    normalized = re.sub(r"[\s\-]+", "_", value.strip().lower())
+    return normalized if normalized in VOTE_CHOICES else None
+
+
+def validate(obj: Dict[str, Any]) -> Tuple[Dict[str, Any], List[str]]:
+    """(the valid fields, coerced; names of the fields missing or invalid), in FIELDS order."""
+    record: Dict[str, Any] = {}
+    problems: List[str] = []
+    for name in FIELDS:
+        value = obj.get(name)
+        if name == "rating":
+            value = coerce_rating(value)
+        elif name.endswith("_choice"):
+            value = coerce_choice(value)
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            value = str(value)
+        elif isinstance(value, str):
+            value = value.strip() or None
+        else:
+            value = None
+        if value is None:
+            problems.append(name)
+        else:
+            record[name] = value
+    return record, problems
+
+
+def parse_record(text: str) -> Tuple[Optional[Dict[str, Any]], List[str]]:
+    """(valid fields, names still needed) from a completion; (None, all fields) when there is no object at all."""
+    obj = extract_object(text)
+    if obj is None:
+        return None, list(FIELDS)
+    return validate(obj)
+
+
+def followup_prompt(post: Dict[str, Any], record: Dict[str, Any], missing: List[str]) -> str:
+    """A short request for just the `missing` fields, consistent with what the record already says."""
+    known = {k: record[k] for k in ("subject_name", "subject_profession", "category", "description") if k in record}
+    context = f"Record so far: {json.dumps(known)}\n" if known else ""
+    return f"""You are completing a DNounce record generated from this Reddit post.
+
+Reddit post title: {post['title']}
+Reddit post body: {post['body'][:500]}
+{context}
+Generate a JSON object with only these fields:
+{fields_block(missing)}
+
+Return ONLY valid JSON. No markdown, no explanation, no backticks."""
+
+
+def followup_max_tokens(missing: List[str]) -> int:
+    return 50 + FOLLOWUP_TOKENS_PER_FIELD * len(missing)
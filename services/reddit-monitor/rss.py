@@ -0,0 +1,98 @@
+"""
+Incremental RSS item extraction for the monitor.
+
+A feed is parsed with an XMLPullParser, iterparse's push-mode counterpart,
+fed chunk by chunk as the response downloads. Items are produced before
+the document has finished arriving. Each <item> is cleared once read and
+taken out of the tree after every chunk, so memory holds about one chunk
+rather than the whole feed. The link and length filters run before the
+HTML in a description is cleaned. A feed larger than `max_bytes` is cut
+off there with a warning, keeping the items before the cut. A feed that
+turns out malformed also keeps the items read before the error.
+
+`python bench.py rss` times this against whole-document ET.fromstring.
+"""
+import logging
+import re
+import xml.etree.ElementTree as ET
+from typing import Iterable, Iterator, Optional
+
+log = logging.getLogger("dnounce-monitor")
+
+TAG_RE = re.compile(r"<[^>]+>")
+
+DEFAULT_MAX_BYTES = 4 * 1024 * 1024
+
+
+def _item(elem: ET.Element, link_contains: str, min_body: int) -> Optional[dict]:
+    title_el = elem.find("title")
+    link_el = elem.find("link")
+    if title_el is None or link_el is None:
+        return None
+
+    link = link_el.text or ""
+    if link_contains not in link:
+        return None
+
+    title = title_el.text or ""
+    desc_el = elem.find("description")
+    desc = (desc_el.text or "") if desc_el is not None else ""
+    # Cleaning only shortens a description, so when neither it nor the
+    # title (the fallback body) is long enough, skip without cleaning.
+    if len(desc) < min_body and len(title) < min_body:
+        return None
+
+    # Clean description (strip HTML tags)
+    body = TAG_RE.sub("", desc).strip() or title
+    if len(body) < min_body:
+        return None
+    return {"title": title, "link": link, "body": body}
+
+
+def iter_items(
+    chunks: Iterable[bytes],
+    label: str = "feed",
+    link_contains: str = "reddit.com",
+    min_body: int = 50,
+    max_bytes: int = DEFAULT_MAX_BYTES,
+) -> Iterator[dict]:
+    """{title, link, body} for each item whose link contains `link_contains` and whose body is long enough."""
+    parser = ET.XMLPullParser(events=("start", "end"))
+    channel: Optional[ET.Element] = None
+
+    def drain() -> Iterator[dict]:
+        nonlocal channel
+        for event, elem in parser.read_events():
+            if event == "start":
+                if elem.tag == "channel" and channel is None:
+                    channel = elem
+                continue
+            if elem.tag != "item":
+                continue
+            item = _item(elem, link_contains, min_body)
+            elem.clear()
+            if item is not None:
+                yield item
+        # Drop the (cleared) items read so far from the channel. An item
+        # still open at the chunk boundary keeps filling in regardless: the
+        # parser holds it until its end event.
+        if channel is not None:
+            del channel[:]
+
+    read = 0
+    try:
+        for chunk in chunks:
+            read += len(chunk)
+            if read > max_bytes:
+                log.warning(f"Feed over {max_bytes} bytes, keeping the items before the cut: {label}")
+                return
+            parser.feed(chunk)
+            yield from drain()
+        parser.close()
+        yield from drain()
+    except ET.ParseError as e:
+        log.warning(f"Search error: {e} ({label})")
+    finally:
+        close = getattr(chunks, "close", None)
+        if close is not None:
+            close()
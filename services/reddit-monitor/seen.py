@@ -0,0 +1,123 @@
+"""
+Posts the monitor has already turned into demo records, kept across runs.
+
+Without it every daily run re-scores and can regenerate records for the same
+posts, spending LLM tokens and creating duplicate subjects. A post counts as
+known when its reddit id, its URL or the hash of its normalized title + body
+matches an entry, so the same text syndicated under another URL is caught
+too, and so is a lightly edited copy: a post whose SimHash of title + body is
+within a few bits of an entry's (see neardup.py). Entries not seen for
+`ttl_days` are evicted on open; seeing a known post again refreshes it. One
+index can be shared by the run's pipeline threads.
+"""
+import hashlib
+import logging
+import re
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+from neardup import DEFAULT_MAX_DISTANCE, bands, distance, from_signed, to_signed
+
+log = logging.getLogger("dnounce-monitor")
+
+BAND_COLUMNS = [f"band{i}" for i in range(DEFAULT_MAX_DISTANCE + 1)]
+
+NORMALIZE_RE = re.compile(r"[^a-z0-9]+")
+
+
+def content_hash(title: str, body: str) -> str:
+    """Hash of the post text with case, punctuation and whitespace folded away."""
+    text = NORMALIZE_RE.sub(" ", f"{title} {body}".lower()).strip()
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class SeenIndex:
+    def __init__(self, path: str, ttl_days: float = 30.0):
+        self.path = path
+        self.ttl_s = ttl_days * 86400.0
+        self._db = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS seen_posts ("
+            "reddit_id TEXT PRIMARY KEY, "
+            "url TEXT NOT NULL, "
+            "content_hash TEXT NOT NULL, "
+            "record_id TEXT, "
+            "first_seen REAL NOT NULL, "
+            "last_seen REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS seen_posts_url ON seen_posts (url)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS seen_posts_hash ON seen_posts (content_hash)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS seen_posts_last_seen ON seen_posts (last_seen)")
+        # Near-duplicate fingerprints; indexes written before they existed gain the columns here
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(seen_posts)")}
+        for column in ["simhash"] + BAND_COLUMNS:
+            if column not in columns:
+                self._db.execute(f"ALTER TABLE seen_posts ADD COLUMN {column} INTEGER")
+        for column in BAND_COLUMNS:
+            self._db.execute(f"CREATE INDEX IF NOT EXISTS seen_posts_{column} ON seen_posts ({column})")
+
+        self.hits = 0
+        self.added = 0
+        self.evicted = self.evict()
+
+    def evict(self) -> int:
+        cur = self._db.execute("DELETE FROM seen_posts WHERE last_seen < ?", (time.time() - self.ttl_s,))
+        return cur.rowcount
+
+    def _near(self, fingerprint: int) -> Optional[str]:
+        where = " OR ".join(f"{column} = ?" for column in BAND_COLUMNS)
+        rows = self._db.execute(
+            f"SELECT reddit_id, simhash FROM seen_posts WHERE {where}",
+            bands(fingerprint, len(BAND_COLUMNS)),
+        )
+        for other_id, other in rows:
+            if distance(fingerprint, from_signed(other)) <= DEFAULT_MAX_DISTANCE:
+                return other_id
+        return None
+
+    def known(self, reddit_id: str, url: str, digest: str, fingerprint: Optional[int] = None) -> bool:
+        """True (and the entry is refreshed) if this post, or a near copy of it, was handled in an earlier run."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT reddit_id FROM seen_posts WHERE reddit_id = ? OR url = ? OR content_hash = ? LIMIT 1",
+                (reddit_id, url, digest),
+            ).fetchone()
+            known_id = row[0] if row is not None else None
+            if known_id is None and fingerprint is not None:
+                known_id = self._near(fingerprint)
+            if known_id is None:
+                return False
+            self._db.execute("UPDATE seen_posts SET last_seen = ? WHERE reddit_id = ?", (time.time(), known_id))
+        self.hits += 1
+        return True
+
+    def add(self, post: dict, record_id: Optional[str] = None) -> None:
+        now = time.time()
+        fingerprint = post.get("simhash")
+        if fingerprint is None:
+            near = [None] * (1 + len(BAND_COLUMNS))
+        else:
+            near = [to_signed(fingerprint), *bands(fingerprint, len(BAND_COLUMNS))]
+        columns = ", ".join(["simhash"] + BAND_COLUMNS)
+        updates = ", ".join(f"{c} = COALESCE(excluded.{c}, seen_posts.{c})" for c in ["simhash"] + BAND_COLUMNS)
+        with self._lock:
+            self._db.execute(
+                f"INSERT INTO seen_posts (reddit_id, url, content_hash, record_id, first_seen, last_seen, {columns}) "
+                f"VALUES (?, ?, ?, ?, ?, ?{', ?' * len(near)}) "
+                "ON CONFLICT (reddit_id) DO UPDATE SET url = excluded.url, content_hash = excluded.content_hash, "
+                "record_id = COALESCE(excluded.record_id, seen_posts.record_id), last_seen = excluded.last_seen, "
+                f"{updates}",
+                (post["reddit_id"], post["url"], post["content_hash"], record_id, now, now, *near),
+            )
+        self.added += 1
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM seen_posts").fetchone()[0]
+
+    def close(self) -> None:
+        self._db.close()
@@ -0,0 +1,69 @@
+"""
+Picking the run's posts as candidates stream in.
+
+Each persona keeps a bounded min-heap of its best `limit` candidates, so
+adding one is O(log limit) and nothing else is held, however many posts
+the search feeds return. selected() then takes up to each persona's quota
+and fills any places left over with the best of the rest, whatever their
+persona. Ties on score go to the candidate seen first, as a stable sort of
+the whole list would do.
+"""
+import heapq
+from typing import Dict, List, Mapping, Tuple
+
+Entry = Tuple[int, int, dict]  # (score, -arrival, candidate)
+
+
+def parse_quotas(spec: str) -> Dict[str, int]:
+    """ "professional=5,consumer=5" -> {"professional": 5, "consumer": 5} """
+    quotas = {}
+    for part in spec.split(","):
+        if not part.strip():
+            continue
+        persona, _, count = part.partition("=")
+        quotas[persona.strip()] = int(count)
+    return quotas
+
+
+class PersonaSelector:
+    def __init__(self, quotas: Mapping[str, int], limit: int):
+        self.quotas = dict(quotas)
+        self.limit = max(0, limit)
+        self._heaps: Dict[str, List[Entry]] = {}
+        self.seen = 0
+
+    def add(self, candidate: dict) -> None:
+        self.seen += 1
+        if not self.limit:
+            return
+        # A persona contributes at most `limit` posts (quota plus extras), so
+        # no more than that needs to be kept per persona.
+        heap = self._heaps.get(candidate["persona"])
+        if heap is None:
+            heap = self._heaps[candidate["persona"]] = []
+        score = candidate["score"]
+        if len(heap) < self.limit:
+            heapq.heappush(heap, (score, -self.seen, candidate))
+        elif score > heap[0][0]:
+            # An equal score never displaces: the kept one arrived first
+            heapq.heapreplace(heap, (score, -self.seen, candidate))
+
+    def selected(self) -> List[dict]:
+        """Each persona's quota (best first, personas in quota order), then the best of the rest."""
+        ranked = {
+            persona: sorted(heap, key=lambda e: e[:2], reverse=True)
+            for persona, heap in self._heaps.items()
+        }
+        result: List[dict] = []
+        rest: List[Entry] = []
+        for persona, entries in ranked.items():
+            take = min(self.quotas.get(persona, 0), self.limit)
+            rest.extend(entries[take:])
+        for persona in self.quotas:
+            take = min(self.quotas[persona], self.limit)
+            result.extend(c for _, _, c in ranked.get(persona, [])[:take])
+        result = result[:self.limit]
+        if len(result) < self.limit:
+            rest.sort(key=lambda e: e[:2], reverse=True)
+            result.extend(c for _, _, c in rest[:self.limit - len(result)])
+        return result
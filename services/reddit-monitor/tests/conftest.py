@@ -0,0 +1,10 @@
+import os
+import sys
+
+# The modules live next to this directory and are imported as top-level modules,
+# as monitor.py and bench.py do.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# monitor.py reads these at import; the tests never reach a real service.
+for name in ("GROQ_API_KEY", "SUPABASE_URL", "SUPABASE_SERVICE_ROLE_KEY", "RESEND_API_KEY"):
+    os.environ.setdefault(name, "test")
@@ -0,0 +1,59 @@
+import json
+import os
+
+import pytest
+
+from keywords import KeywordScanner, has_money
+from monitor import score_post
+
+FIXTURES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "fixtures", "score_post.jsonl")
+
+
+def load_fixtures():
+    with open(FIXTURES, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+@pytest.mark.parametrize("case", load_fixtures(), ids=lambda case: case["name"])
+def test_score_post_fixtures(case):
+    assert score_post(case["title"], case["body"]) == (case["score"], case["persona"])
+
+
+@pytest.fixture
+def scanner():
+    return KeywordScanner({"evidence": ["proof", "contract", "email"], "urgency": ["won't pay"], "persona": ["client won't pay", "client"]})
+
+
+def test_whole_words_only(scanner):
+    found = scanner.scan("the contractor proofread my emailed notes")
+    assert found == {"evidence": set(), "urgency": set(), "persona": set()}
+
+
+def test_plurals(scanner):
+    assert scanner.scan("i have contracts and emails")["evidence"] == {"contract", "email"}
+
+
+def test_overlapping_keywords_all_count(scanner):
+    found = scanner.scan("my client won't pay")
+    assert found["persona"] == {"client won't pay", "client"}
+    assert found["urgency"] == {"won't pay"}
+
+
+def test_whitespace_and_curly_apostrophe(scanner):
+    assert scanner.scan("my client  won’t\npay")["persona"] == {"client won't pay", "client"}
+
+
+def test_keyword_in_two_categories_is_rejected():
+    with pytest.raises(ValueError):
+        KeywordScanner({"a": ["refund"], "b": ["Refund"]})
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("paid $1,200 up front", True),
+    ("it was 300 dollars", True),
+    ("owes me 5k", True),
+    ("a 5kg bag", False),
+    ("no money mentioned", False),
+])
+def test_has_money(text, expected):
+    assert has_money(text) is expected
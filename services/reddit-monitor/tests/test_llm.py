@@ -0,0 +1,66 @@
+import pytest
+
+from llm import TokenBucket, parse_duration
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("30", 30.0),
+    ("7.66s", 7.66),
+    ("120ms", 0.12),
+    ("2m59.56s", 179.56),
+    ("1h", 3600.0),
+    ("", None),
+    (None, None),
+    ("soon", None),
+])
+def test_parse_duration(value, expected):
+    if expected is None:
+        assert parse_duration(value) is None
+    else:
+        assert parse_duration(value) == pytest.approx(expected)
+
+
+def bucket(capacity=10.0, per_second=2.0, now=100.0):
+    b = TokenBucket(capacity, per_second)
+    b.updated = now
+    return b
+
+
+def test_wait_for():
+    b = bucket()
+    assert b.wait_for(5) == 0.0
+    b.level = 4.0
+    assert b.wait_for(8) == pytest.approx(2.0)
+    # More than the bucket holds only waits for a full bucket
+    assert b.wait_for(50) == pytest.approx(3.0)
+
+
+def test_refill_caps_at_capacity():
+    b = bucket()
+    b.level = 0.0
+    b.refill(102.0)
+    assert b.level == pytest.approx(4.0)
+    b.refill(200.0)
+    assert b.level == 10.0
+
+
+def test_sync_adopts_server_view():
+    b = bucket()
+    b.sync(limit=6000, remaining=1000, reset_s=50, reserved=200, now=100.0)
+    assert b.capacity == 6000
+    assert b.level == pytest.approx(800)
+    assert b.per_second == pytest.approx(100)
+
+
+def test_sync_cap_only_lowers_the_level():
+    b = bucket()
+    b.sync(limit=100, remaining=3, reset_s=60, reserved=0, now=100.0, cap_only=True)
+    assert (b.capacity, b.level, b.per_second) == (10.0, 3.0, 2.0)
+    b.sync(limit=100, remaining=50, reset_s=60, reserved=0, now=100.0, cap_only=True)
+    assert b.level == 3.0
+
+
+def test_sync_without_remaining_is_ignored():
+    b = bucket()
+    b.sync(limit=100, remaining=None, reset_s=1, reserved=0, now=100.0)
+    assert (b.capacity, b.level) == (10.0, 10.0)
@@ -0,0 +1,63 @@
+import random
+
+from neardup import BITS, DEFAULT_MAX_DISTANCE, NearDuplicates, bands, distance, from_signed, simhash, to_signed
+
+POST = (
+    "My landlord kept the whole security deposit after I moved out. The apartment was spotless, "
+    "I have photos from move-out day, and he still claims there was damage to the carpet."
+)
+
+
+def test_punctuation_and_case_are_ignored():
+    assert simhash(POST) == simhash(POST.upper().replace("carpet.", "carpet!!"))
+
+
+def test_added_sign_off_stays_close():
+    assert distance(simhash(POST), simhash(POST + " Any advice?")) <= DEFAULT_MAX_DISTANCE
+
+
+def test_unrelated_posts_are_far_apart():
+    other = "Client ghosted me after I delivered the logo files and now refuses to pay the final invoice for the work."
+    assert distance(simhash(POST), simhash(other)) > DEFAULT_MAX_DISTANCE
+
+
+def test_bands_cover_every_bit():
+    rng = random.Random(0)
+    for count in (1, 3, DEFAULT_MAX_DISTANCE + 1):
+        fingerprint = rng.getrandbits(BITS)
+        width = BITS // count
+        rebuilt = sum(band << (i * width) for i, band in enumerate(bands(fingerprint, count)))
+        assert rebuilt == fingerprint
+
+
+def test_signed_round_trip():
+    for fingerprint in (0, 1, (1 << 63) - 1, 1 << 63, (1 << 64) - 1):
+        signed = to_signed(fingerprint)
+        assert -(1 << 63) <= signed < (1 << 63)
+        assert from_signed(signed) == fingerprint
+
+
+def test_index_finds_within_max_distance_only():
+    rng = random.Random(1)
+    index = NearDuplicates(max_distance=3)
+    base = rng.getrandbits(BITS)
+    index.add(base, "base")
+    near = base ^ (1 << 5) ^ (1 << 40) ^ (1 << 63)
+    far = base ^ (1 << 1) ^ (1 << 20) ^ (1 << 33) ^ (1 << 50)
+    assert index.find(base) == "base"
+    assert index.find(near) == "base"
+    assert index.find(far) is None
+
+
+def test_index_matches_brute_force():
+    rng = random.Random(2)
+    index = NearDuplicates()
+    stored = [rng.getrandbits(BITS) for _ in range(200)]
+    for i, fp in enumerate(stored):
+        index.add(fp, i)
+    for _ in range(200):
+        probe = rng.choice(stored)
+        for bit in rng.sample(range(BITS), rng.randint(0, 10)):
+            probe ^= 1 << bit
+        expected = any(distance(probe, fp) <= DEFAULT_MAX_DISTANCE for fp in stored)
+        assert (index.find(probe) is not None) == expected
@@ -0,0 +1,89 @@
+import json
+
+import pytest
+
+from record_schema import FIELDS, coerce_choice, coerce_rating, extract_object, parse_record, validate
+
+
+def full_record():
+    return {
+        name: 2 if name == "rating" else "side_with_subject" if name.endswith("_choice") else f"{name} text"
+        for name in FIELDS
+    }
+
+
+def test_extract_object_clean_json():
+    assert extract_object('{"a": 1, "b": "x"}') == {"a": 1, "b": "x"}
+
+
+def test_extract_object_wrapped_in_prose_and_fence():
+    text = 'Here is the record:\n```json\n{"a": 1, "b": "}"}\n```\nHope that helps!'
+    assert extract_object(text) == {"a": 1, "b": "}"}
+
+
+def test_extract_object_trailing_commas():
+    assert extract_object('{"a": [1, 2,], "b": 3,}') == {"a": [1, 2], "b": 3}
+
+
+def test_extract_object_cut_off_keeps_complete_members():
+    assert extract_object('{"a": "one", "b": "two", "c": "thr') == {"a": "one", "b": "two"}
+
+
+@pytest.mark.parametrize("text", ["no json here", "[1, 2, 3]", '{"a": "never closed'])
+def test_extract_object_none(text):
+    assert extract_object(text) is None
+
+
+@pytest.mark.parametrize("value, expected", [
+    (2, 2), (2.4, 2), ("3", 3), ("2/4", 2), ("4 stars", 4), (0, 1), (9, 4), ("none", None), (True, None), (None, None),
+])
+def test_coerce_rating(value, expected):
+    assert coerce_rating(value) == expected
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("side_with_subject", "side_with_subject"),
+    ("Side with contributor", "side_with_contributor"),
+    ("side-with-subject", "side_with_subject"),
+    ("neither", None),
+    (1, None),
+])
+def test_coerce_choice(value, expected):
+    assert coerce_choice(value) == expected
+
+
+def test_validate_full_record():
+    record, problems = validate(full_record())
+    assert problems == []
+    assert list(record) == list(FIELDS)
+
+
+def test_validate_reports_missing_and_invalid_in_field_order():
+    obj = full_record()
+    del obj["description"]
+    obj["rating"] = "terrible"
+    obj["voter_2_choice"] = "abstain"
+    obj["citizen_1_alias"] = "   "
+    record, problems = validate(obj)
+    assert problems == ["description", "rating", "voter_2_choice", "citizen_1_alias"]
+    assert "description" not in record
+
+
+def test_validate_coerces_numbers_to_text():
+    obj = full_record()
+    obj["subject_name"] = 42
+    record, _ = validate(obj)
+    assert record["subject_name"] == "42"
+
+
+def test_parse_record_cut_off_completion_reports_the_rest():
+    names = list(FIELDS)
+    text = json.dumps(full_record())
+    cut = text[:text.index(f'"{names[5]}"')] + f'"{names[5]}": "half a sen'
+    record, missing = parse_record(cut)
+    assert list(record) == names[:5]
+    assert missing == names[5:]
+
+
+def test_parse_record_without_object():
+    assert parse_record("I can't help with that.") == (None, list(FIELDS))
@@ -0,0 +1,65 @@
+import random
+
+import pytest
+
+from selection import PersonaSelector, parse_quotas
+
+
+def candidate(persona, score, n):
+    return {"persona": persona, "score": score, "n": n}
+
+
+def reference(candidates, quotas, limit):
+    """The selection as a stable sort of the whole list would make it."""
+    ranked = sorted(candidates, key=lambda c: c["score"], reverse=True)
+    result = []
+    for persona, quota in quotas.items():
+        result.extend([c for c in ranked if c["persona"] == persona][:quota])
+    result = result[:limit]
+    chosen = {id(c) for c in result}
+    result.extend([c for c in ranked if id(c) not in chosen][:limit - len(result)])
+    return result
+
+
+def select(candidates, quotas, limit):
+    selector = PersonaSelector(quotas, limit)
+    for c in candidates:
+        selector.add(c)
+    return selector.selected()
+
+
+def test_parse_quotas():
+    assert parse_quotas("professional=5, consumer=5,") == {"professional": 5, "consumer": 5}
+
+
+def test_quotas_first_then_best_of_the_rest():
+    candidates = [candidate("consumer", s, i) for i, s in enumerate([9, 8, 7, 6])]
+    candidates += [candidate("professional", s, 10 + i) for i, s in enumerate([5, 4])]
+    picked = select(candidates, {"professional": 1, "consumer": 1}, 3)
+    assert [c["n"] for c in picked] == [10, 0, 1]
+
+
+def test_short_persona_leaves_places_to_the_rest():
+    candidates = [candidate("consumer", s, i) for i, s in enumerate([9, 8, 7])]
+    picked = select(candidates, {"professional": 2, "consumer": 1}, 3)
+    assert [c["n"] for c in picked] == [0, 1, 2]
+
+
+def test_ties_go_to_the_first_seen():
+    candidates = [candidate("consumer", 5, i) for i in range(6)]
+    picked = select(candidates, {"consumer": 2}, 3)
+    assert [c["n"] for c in picked] == [0, 1, 2]
+
+
+def test_zero_limit():
+    assert select([candidate("consumer", 5, 0)], {"consumer": 1}, 0) == []
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_matches_full_sort(seed):
+    rng = random.Random(seed)
+    personas = ["professional", "consumer", "other"]
+    candidates = [candidate(rng.choice(personas), rng.randint(0, 10), i) for i in range(rng.randint(0, 200))]
+    quotas = {"professional": rng.randint(0, 6), "consumer": rng.randint(0, 6)}
+    limit = rng.randint(0, 12)
+    assert select(candidates, quotas, limit) == reference(candidates, quotas, limit)
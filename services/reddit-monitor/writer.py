@@ -0,0 +1,165 @@
+"""
+Batched inserts of demo subjects and their records into Supabase.
+
+Rows are buffered and written batch_size at a time as two PostgREST array
+inserts over one keep-alive session: every subject of the batch, then every
+record. An array insert is a single statement, so each POST lands entirely
+or not at all. When the records POST fails, or its outcome is unknown (a
+timeout), the batch is reconciled: records that did land are kept, and the
+subjects left without a record are deleted, so a failed run leaves no
+orphans behind. A rejected batch is then retried row by row, so one bad row
+doesn't cost the others their records. If even the lookup fails, nothing is
+deleted or retried: the batch's subjects are logged as possibly orphaned.
+"""
+import logging
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+log = logging.getLogger("dnounce-monitor")
+
+Row = Dict[str, Any]
+Pending = Tuple[Hashable, Row, Row]  # (caller's key, subject row, record row)
+
+
+class DemoRecordWriter:
+    def __init__(self, supabase_url: str, service_key: str, batch_size: int = 10, timeout_s: float = 15.0):
+        self.base = f"{supabase_url.rstrip('/')}/rest/v1"
+        self.batch_size = max(1, batch_size)
+        self.timeout_s = timeout_s
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=2)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({
+            "apikey": service_key,
+            "Authorization": f"Bearer {service_key}",
+            "Content-Type": "application/json",
+        })
+        self._pending: List[Pending] = []
+        self.stats = {"requests": 0, "written": 0, "failed": 0, "orphans_removed": 0, "orphans_left": 0}
+
+    def add(self, key: Hashable, subject: Row, record: Row) -> List[Tuple[Hashable, Optional[str]]]:
+        """Buffer one subject + record; flushes when the batch is full (see flush for the return value)."""
+        self._pending.append((key, subject, record))
+        if len(self._pending) >= self.batch_size:
+            return self.flush()
+        return []
+
+    def flush(self) -> List[Tuple[Hashable, Optional[str]]]:
+        """Write everything buffered. Returns (key, record id or None if it could not be written) per row."""
+        batch, self._pending = self._pending, []
+        if not batch:
+            return []
+        written = self._write(batch)
+        if written:
+            return [(key, record["id"]) for key, _, record in batch]
+        if written is None:
+            # Some rows may have landed: retrying would collide with them
+            self.stats["failed"] += len(batch)
+            return [(key, None) for key, _, _ in batch]
+        if len(batch) == 1:
+            key = batch[0][0]
+            self.stats["failed"] += 1
+            return [(key, None)]
+        log.info(f"Retrying {len(batch)} demo records one at a time")
+        results = []
+        for row in batch:
+            ok = bool(self._write([row]))
+            if not ok:
+                self.stats["failed"] += 1
+            results.append((row[0], row[2]["id"] if ok else None))
+        return results
+
+    def _post(self, table: str, rows: List[Row]) -> Optional[requests.Response]:
+        self.stats["requests"] += 1
+        try:
+            return self.session.post(
+                f"{self.base}/{table}",
+                headers={"Prefer": "return=minimal"},
+                json=rows,
+                timeout=self.timeout_s,
+            )
+        except requests.RequestException as e:
+            log.error(f"{table} insert exception: {e}")
+            return None
+
+    def _write(self, batch: List[Pending]) -> Optional[bool]:
+        """True if the batch landed, False if it didn't (and was cleaned up), None if that can't be told."""
+        subjects = [subject for _, subject, _ in batch]
+        records = [record for _, _, record in batch]
+        subject_ids = [s["subject_uuid"] for s in subjects]
+
+        r = self._post("subjects", subjects)
+        if r is None:
+            # Unknown outcome: the ids are new, so removing any that landed is safe.
+            self._delete_subjects(subject_ids)
+            return False
+        if r.status_code not in (200, 201, 204):
+            log.error(f"Subject insert failed: {r.status_code} {r.text}")
+            return False
+
+        r = self._post("records", records)
+        if r is not None and r.status_code in (200, 201, 204):
+            self.stats["written"] += len(batch)
+            return True
+        if r is not None:
+            log.error(f"Record insert failed: {r.status_code} {r.text}")
+        return self._reconcile(records, subject_ids)
+
+    def _reconcile(self, records: List[Row], subject_ids: List[str]) -> Optional[bool]:
+        """After a failed or unanswered records POST: True if they all landed, else remove the batch's subjects."""
+        landed = self._existing_record_ids([rec["id"] for rec in records])
+        if landed is None:
+            # Their records may have landed: deleting the subjects could take
+            # those with them, or fail and block a retry. Leave them be.
+            self.stats["orphans_left"] += len(subject_ids)
+            log.error(f"Could not check which records landed; possibly orphaned subjects: {', '.join(subject_ids)}")
+            return None
+        if len(landed) == len(records):
+            self.stats["written"] += len(records)
+            return True
+        if landed:
+            # Not expected from a single-statement insert, but keep what landed.
+            keep = {rec["subject_id"] for rec in records if rec["id"] in landed}
+            subject_ids = [sid for sid in subject_ids if sid not in keep]
+        self._delete_subjects(subject_ids)
+        return False
+
+    def _existing_record_ids(self, ids: List[str]) -> Optional[set]:
+        try:
+            r = self.session.get(
+                f"{self.base}/records",
+                params={"select": "id", "id": f"in.({','.join(ids)})"},
+                timeout=self.timeout_s,
+            )
+            self.stats["requests"] += 1
+            if r.status_code == 200:
+                return {row["id"] for row in r.json()}
+            log.error(f"Record lookup failed: {r.status_code} {r.text}")
+        except (requests.RequestException, ValueError) as e:
+            log.error(f"Record lookup exception: {e}")
+        return None
+
+    def _delete_subjects(self, subject_ids: List[str]) -> None:
+        if not subject_ids:
+            return
+        try:
+            r = self.session.delete(
+                f"{self.base}/subjects",
+                params={"subject_uuid": f"in.({','.join(subject_ids)})"},
+                timeout=self.timeout_s,
+            )
+            self.stats["requests"] += 1
+            if r.status_code in (200, 204):
+                self.stats["orphans_removed"] += len(subject_ids)
+                return
+            error = f"{r.status_code} {r.text}"
+        except requests.RequestException as e:
+            error = str(e)
+        self.stats["orphans_left"] += len(subject_ids)
+        log.error(f"Could not remove subjects without records ({error}); orphaned: {', '.join(subject_ids)}")
+
+    def close(self) -> None:
+        self.session.close()
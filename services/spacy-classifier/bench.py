@@ -0,0 +1,613 @@
+"""
+Benchmarks and parity checks for the classifier.
+
+    python bench.py throughput [--corpus bench_corpus.jsonl] [--repeat 20] [--processes 2]
+        docs/sec, p50/p95/p99 latency per stage and peak RSS for
+        compute_features one doc at a time (/classify), classify_many in
+        batches (/classify/batch), and, for reference, raw nlp.pipe with one
+        and with several processes.
+
+    python bench.py eval [--save labels.jsonl] [--previous labels-old.jsonl]
+        label every corpus document with the current CLASSIFIER_VERSION;
+        --save writes the outputs, --previous prints a confusion matrix and
+        score drift against outputs saved by an earlier version.
+
+    python bench.py pipeline [--corpus bench_corpus.jsonl] [--repeat 20]
+        docs/sec and peak RSS for the full vs lean spaCy pipeline, plus a
+        parity check of the labels (and features) of each, and of the full
+        pipeline's short-text fast path, against the full pipeline without it.
+
+    python bench.py matcher [--corpus bench_corpus.jsonl] [--repeat 200]
+        microbenchmark of LexicalScanner and the single-pass token loop
+        against the separate scans they replaced.
+
+    python bench.py parity [--corpus bench_corpus.jsonl]
+        golden-output check: features_from_doc against the straightforward
+        multi-pass reference below, over the corpus plus lexical edge cases.
+
+    python bench.py chunking [--corpus bench_corpus.jsonl] [--copies 1,5,20]
+        one nlp() call over a wall of text vs compute_features' chunked
+        parse: latency and which features differ.
+
+    python bench.py scorer [--rows 1000000] [--seed 0]
+        vector_score.score_columns against score_and_explain on random
+        feature rows: bit-for-bit parity of every score, and rows/sec.
+
+Each pipeline is measured in its own subprocess so peak RSS isn't shared.
+Needs the same environment as the service (spaCy + en_core_web_sm), but no
+Supabase credentials. Exits non-zero when a parity check fails.
+"""
+import argparse
+import json
+import os
+import random
+import re
+import resource
+import subprocess
+import sys
+import time
+from typing import Any, Callable, Dict, List
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CORPUS = os.path.join(HERE, "bench_corpus.jsonl")
+
+
+def load_corpus_rows(path: str) -> List[Dict[str, str]]:
+    """[{"id", "text"}]; rows without an id are numbered by line."""
+    rows = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            row = json.loads(line)
+            text = (row.get("text") or row.get("description") or "").strip()
+            rows.append({"id": str(row.get("id", len(rows))), "text": text})
+    return rows
+
+
+def load_corpus(path: str) -> List[str]:
+    return [row["text"] for row in load_corpus_rows(path)]
+
+
+def peak_rss_mb(who: int = resource.RUSAGE_SELF) -> float:
+    rss = resource.getrusage(who).ru_maxrss
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile, q in [0, 100]."""
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * q // 100))
+    return ordered[int(rank) - 1]
+
+
+def run_bench_subprocess(args: List[str], env: Dict[str, str] = None) -> Dict[str, Any]:
+    """Run `bench.py <args>` in a fresh interpreter and parse its last stdout line as JSON."""
+    proc = subprocess.run(
+        [sys.executable, os.path.abspath(__file__)] + args,
+        env=dict(os.environ, **(env or {})),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+# -------------------------
+# pipeline: full vs lean
+# -------------------------
+def run_pipeline_mode(args: argparse.Namespace) -> None:
+    """Runs inside a subprocess with SPACY_PIPELINE already set."""
+    started = time.perf_counter()
+    import classifier
+    classifier.ensure_loaded()
+    load_s = time.perf_counter() - started
+    rss_after_load = peak_rss_mb()
+
+    corpus = load_corpus(args.corpus)
+    texts = corpus * args.repeat
+
+    # classify_many, as /classify/batch serves it: chunking and the short-text path included
+    started = time.perf_counter()
+    outputs = classifier.classify_many([(text, []) for text in texts], batch_size=args.batch_size, n_process=1)
+    elapsed = time.perf_counter() - started
+
+    print(json.dumps({
+        "mode": classifier.SPACY_PIPELINE + ("+short" if classifier.SHORT_TEXT_PATH else ""),
+        "pipe_names": classifier.nlp.pipe_names,
+        "load_s": load_s,
+        "docs": len(texts),
+        "elapsed_s": elapsed,
+        "docs_per_s": len(texts) / elapsed if elapsed else 0.0,
+        "rss_after_load_mb": rss_after_load,
+        "peak_rss_mb": peak_rss_mb(),
+        "labels": [o["classification"] for o in outputs[:len(corpus)]],
+        "features": [o["explanation"]["features"] for o in outputs[:len(corpus)]],
+    }))
+
+
+def cmd_pipeline(args: argparse.Namespace) -> int:
+    # The reference is the full pipeline on every text; the others must match its labels
+    runs = {"full": ("full", "0"), "full+short": ("full", "1"), "lean": ("lean", "0")}
+    results: Dict[str, Dict[str, Any]] = {}
+    for name, (mode, short_path) in runs.items():
+        results[name] = run_bench_subprocess(
+            ["pipeline-mode", "--corpus", args.corpus, "--repeat", str(args.repeat), "--batch-size", str(args.batch_size)],
+            env={"SPACY_PIPELINE": mode, "SPACY_SHORT_TEXT_PATH": short_path},
+        )
+
+    print(f"{'pipeline':<10} {'docs/s':>10} {'load s':>8} {'RSS load MB':>12} {'peak RSS MB':>12}  components")
+    for name, r in results.items():
+        print(
+            f"{name:<10} {r['docs_per_s']:>10.1f} {r['load_s']:>8.2f} {r['rss_after_load_mb']:>12.1f} "
+            f"{r['peak_rss_mb']:>12.1f}  {','.join(r['pipe_names'])}"
+        )
+    full, lean = results["full"], results["lean"]
+    print(f"lean speedup: {lean['docs_per_s'] / full['docs_per_s']:.2f}x, "
+          f"peak RSS: {lean['peak_rss_mb'] - full['peak_rss_mb']:+.1f} MB")
+
+    failed = False
+    for name in ("full+short", "lean"):
+        other = results[name]
+        label_mismatches = [i for i, (a, b) in enumerate(zip(full["labels"], other["labels"])) if a != b]
+        feature_diffs: Dict[str, int] = {}
+        for a, b in zip(full["features"], other["features"]):
+            for key in a:
+                if a[key] != b.get(key):
+                    feature_diffs[key] = feature_diffs.get(key, 0) + 1
+
+        print(f"{name} label parity: {len(full['labels']) - len(label_mismatches)}/{len(full['labels'])} identical")
+        for i in label_mismatches:
+            print(f"  doc {i}: full={full['labels'][i]!r} {name}={other['labels'][i]!r}")
+        if feature_diffs:
+            print(f"{name} feature differences (docs affected): "
+                  + ", ".join(f"{k}={v}" for k, v in sorted(feature_diffs.items())))
+        # The short-text path is meant to change nothing; lean may move sentence_count
+        failed = failed or bool(label_mismatches) or (name == "full+short" and bool(feature_diffs))
+    return 1 if failed else 0
+
+
+# -------------------------
+# throughput: single / pipe / multiprocess
+# -------------------------
+STAGES = ("nlp_parse", "feature_extraction", "score", "total")
+
+
+def run_throughput_mode(args: argparse.Namespace) -> None:
+    """
+    Runs inside a subprocess. "single" goes through compute_features_timed
+    like /classify. "batch" goes through classify_many_timed like
+    /classify/batch (chunking and the short-text path included), one call
+    per --batch-size texts; its latencies are each call's per-stage time
+    divided by the texts in it. The raw pipe modes time bare nlp.pipe +
+    features_from_doc + score_and_explain per doc, with no chunking or
+    short-text path. Their nlp_parse is the wait for the next doc from the
+    pipe, so it is bursty (most docs arrive with their batch).
+    """
+    import classifier
+    classifier.warm_up()
+    rss_after_load = peak_rss_mb()
+
+    texts = load_corpus(args.corpus) * args.repeat
+    per_stage: Dict[str, List[float]] = {stage: [] for stage in STAGES}
+
+    started = time.perf_counter()
+    if args.mode == "single":
+        for text in texts:
+            t0 = time.perf_counter()
+            feats, stages = classifier.compute_features_timed(text, [])
+            t1 = time.perf_counter()
+            classifier.score_and_explain(feats)
+            t2 = time.perf_counter()
+            per_stage["nlp_parse"].append(stages["nlp_parse"])
+            per_stage["feature_extraction"].append(stages["feature_extraction"])
+            per_stage["score"].append(t2 - t1)
+            per_stage["total"].append(t2 - t0)
+    elif args.mode == "batch":
+        for i in range(0, len(texts), args.batch_size):
+            items = [(text, []) for text in texts[i:i + args.batch_size]]
+            t0 = time.perf_counter()
+            _, stages = classifier.classify_many_timed(items, args.batch_size, 1)
+            total = time.perf_counter() - t0
+            for stage in ("nlp_parse", "feature_extraction", "score"):
+                per_stage[stage].append(stages[stage] / len(items))
+            per_stage["total"].append(total / len(items))
+    else:
+        n_process = args.processes if args.mode == "multiprocess" else 1
+        docs = iter(classifier.nlp.pipe(texts, batch_size=args.batch_size, n_process=n_process))
+        for text in texts:
+            t0 = time.perf_counter()
+            doc = next(docs)
+            t1 = time.perf_counter()
+            feats = classifier.features_from_doc(doc, text, [])
+            t2 = time.perf_counter()
+            classifier.score_and_explain(feats)
+            t3 = time.perf_counter()
+            per_stage["nlp_parse"].append(t1 - t0)
+            per_stage["feature_extraction"].append(t2 - t1)
+            per_stage["score"].append(t3 - t2)
+            per_stage["total"].append(t3 - t0)
+        # Run the pipe to completion so it joins its workers and
+        # RUSAGE_CHILDREN covers their peak RSS.
+        for _ in docs:
+            pass
+    elapsed = time.perf_counter() - started
+
+    print(json.dumps({
+        "mode": args.mode if args.mode in ("single", "batch") else f"raw {args.mode}",
+        "docs": len(texts),
+        "elapsed_s": elapsed,
+        "docs_per_s": len(texts) / elapsed if elapsed else 0.0,
+        "rss_after_load_mb": rss_after_load,
+        "peak_rss_mb": peak_rss_mb(),
+        "peak_child_rss_mb": peak_rss_mb(resource.RUSAGE_CHILDREN),
+        "latency_ms": {
+            stage: {f"p{q}": percentile(values, q) * 1000 for q in (50, 95, 99)}
+            for stage, values in per_stage.items()
+        },
+    }))
+
+
+def cmd_throughput(args: argparse.Namespace) -> int:
+    results = []
+    for mode in ("single", "batch", "pipe", "multiprocess"):
+        results.append(run_bench_subprocess([
+            "throughput-mode", "--mode", mode, "--corpus", args.corpus, "--repeat", str(args.repeat),
+            "--batch-size", str(args.batch_size), "--processes", str(args.processes),
+        ]))
+
+    print(f"{'mode':<16} {'docs':>6} {'docs/s':>9} {'RSS load MB':>12} {'peak RSS MB':>12} {'peak child MB':>14}")
+    for r in results:
+        print(
+            f"{r['mode']:<16} {r['docs']:>6} {r['docs_per_s']:>9.1f} {r['rss_after_load_mb']:>12.1f} "
+            f"{r['peak_rss_mb']:>12.1f} {r['peak_child_rss_mb']:>14.1f}"
+        )
+    print()
+    print(f"{'mode':<16} {'stage':<19} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for r in results:
+        for stage in STAGES:
+            lat = r["latency_ms"][stage]
+            print(f"{r['mode']:<16} {stage:<19} {lat['p50']:>9.3f} {lat['p95']:>9.3f} {lat['p99']:>9.3f}")
+    return 0
+
+
+# -------------------------
+# eval: labels vs a previous version
+# -------------------------
+def cmd_eval(args: argparse.Namespace) -> int:
+    import classifier
+
+    rows = load_corpus_rows(args.corpus)
+    outputs = []
+    for row in rows:
+        out = classifier.score_and_explain(classifier.compute_features(row["text"], []))
+        outputs.append({
+            "id": row["id"],
+            "classifier_version": classifier.CLASSIFIER_VERSION,
+            "label": out["label"],
+            "score": out["score"],
+        })
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            for out in outputs:
+                f.write(json.dumps(out) + "\n")
+        print(f"wrote {len(outputs)} {classifier.CLASSIFIER_VERSION} outputs to {args.save}")
+
+    counts: Dict[str, int] = {}
+    for out in outputs:
+        counts[out["label"]] = counts.get(out["label"], 0) + 1
+    print("labels: " + ", ".join(f"{k}={v}" for k, v in sorted(counts.items())))
+
+    if not args.previous:
+        return 0
+
+    with open(args.previous, encoding="utf-8") as f:
+        previous = {row["id"]: row for row in (json.loads(line) for line in f if line.strip())}
+    paired = [(previous[out["id"]], out) for out in outputs if out["id"] in previous]
+    if not paired:
+        print(f"no corpus ids found in {args.previous}")
+        return 1
+    old_version = paired[0][0].get("classifier_version", "previous")
+
+    labels = sorted({p["label"] for p, _ in paired} | {o["label"] for _, o in paired})
+    matrix = {(a, b): 0 for a in labels for b in labels}
+    for p, o in paired:
+        matrix[(p["label"], o["label"])] += 1
+
+    width = max(len(label) for label in labels) + 2
+    print(f"\nconfusion matrix: rows = {old_version}, columns = {classifier.CLASSIFIER_VERSION}")
+    print(" " * width + "".join(f"{label:>{width}}" for label in labels))
+    for a in labels:
+        print(f"{a:<{width}}" + "".join(f"{matrix[(a, b)]:>{width}}" for b in labels))
+
+    changed = [(p, o) for p, o in paired if p["label"] != o["label"]]
+    drift = [abs(o["score"] - p["score"]) for p, o in paired]
+    print(f"\n{len(paired) - len(changed)}/{len(paired)} labels unchanged; "
+          f"|score change| p50={percentile(drift, 50):.3f} p95={percentile(drift, 95):.3f} max={max(drift):.3f}")
+    for p, o in changed[: args.show]:
+        print(f"  {o['id']}: {p['label']} ({p['score']:.2f}) -> {o['label']} ({o['score']:.2f})")
+    if len(paired) < len(outputs):
+        print(f"{len(outputs) - len(paired)} corpus ids missing from {args.previous}")
+    return 0
+
+
+# -------------------------
+# matcher / parity: single-pass extraction
+# -------------------------
+# Texts where regex signals overlap or sit inside each other's spans, plus
+# non-ASCII text that bypasses the literal gates.
+LEXICAL_EDGE_CASES = [
+    "see https://example.com/case/AB-12345 and www.foo.com/03/15/2024",
+    "case #AB-12345 was opened on March 3, 2024",
+    "ref ABC-1234 ref XYZ-9876 i was told",
+    "he made me feel small and it made me feel worse, i was done",
+    "https://x.com/i was here, i felt fine",
+    "I WAS there. I Felt it. INVOICE #ZZ-0001",
+    "file 12/1/23 report-2023-77 www.example.org/i-had",
+    "Café invoice №44 — I was charged twice, ref ÅB-2231, see HTTPS://Example.com",
+    "",
+]
+
+
+def legacy_lexical(text: str):
+    """The per-pattern scans compute_features used to run on every call."""
+    has_url = bool(classifier.URL_RE.search(text))
+    id_hits = sum(1 for pat in classifier.ID_PATTERNS if pat.search(text))
+    first_person_patterns = re.compile(
+        r"\b(i was|i felt|i feel|i am|i've been|i had|he made me|she made me|they made me|"
+        r"it made me|made me feel|left me feeling|i experienced|i went through)\b",
+        re.I
+    )
+    fpe = len(first_person_patterns.findall(text))
+    return has_url, id_hits, fpe
+
+
+def build_combined_alternation():
+    """One named-group alternation over every pattern, for comparison only."""
+    patterns = [classifier.URL_RE] + classifier.ID_PATTERNS + [classifier.FIRST_PERSON_RE]
+    parts = []
+    for i, pat in enumerate(patterns):
+        flags = "i" if pat.flags & re.I else ""
+        parts.append(f"(?P<g{i}>(?{flags}:{pat.pattern}))" if flags else f"(?P<g{i}>{pat.pattern})")
+    combined = re.compile("|".join(parts))
+    return lambda text: {m.lastgroup for m in combined.finditer(text)}
+
+
+def reference_features(doc, text: str, attachments: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Straightforward multi-pass feature extraction; the golden output for parity."""
+    evidence_hits = opinion_hits = vague_hits = 0
+    for match_id, start, end in classifier.matcher(doc):
+        label = classifier.nlp.vocab.strings[match_id]
+        if label == "EVIDENCE":
+            evidence_hits += 1
+        elif label == "OPINION":
+            opinion_hits += 1
+        elif label == "VAGUE":
+            vague_hits += 1
+
+    ents = list(doc.ents)
+    has_url, id_hits, fpe = legacy_lexical(text)
+    return {
+        "word_count": len([t for t in doc if t.is_alpha]),
+        "sentence_count": len(list(doc.sents)),
+        "evidence_hits": evidence_hits,
+        "opinion_hits": opinion_hits,
+        "vague_hits": vague_hits,
+        "has_dates": any(e.label_ in ("DATE", "TIME") for e in ents),
+        "has_money": any(e.label_ == "MONEY" for e in ents),
+        "has_org": any(e.label_ == "ORG" for e in ents),
+        "has_person": any(e.label_ == "PERSON" for e in ents),
+        "has_url": has_url or any(t.like_url for t in doc),
+        "has_named_entities": len(ents) >= 2,
+        "entity_count": len(ents),
+        "id_hits": id_hits,
+        "accusation_count": sum(1 for t in doc if t.lower_ in classifier.ACCUSATION_FORMS),
+        "attachment_count": len(attachments or []),
+        "first_person_experience": fpe,
+    }
+
+
+def time_per_doc(fn: Callable[[Any], Any], items: List[Any]) -> float:
+    started = time.perf_counter()
+    for item in items:
+        fn(item)
+    return (time.perf_counter() - started) / len(items)
+
+
+def cmd_matcher(args: argparse.Namespace) -> int:
+    texts = (load_corpus(args.corpus) + LEXICAL_EDGE_CASES) * args.repeat
+    docs = list(classifier.nlp.pipe(texts[: len(texts) // args.repeat]))
+    docs = docs * args.repeat
+
+    rows = [
+        ("regex: separate scans", time_per_doc(legacy_lexical, texts)),
+        ("regex: LexicalScanner", time_per_doc(classifier.lexical_scanner.scan, texts)),
+        ("regex: one alternation", time_per_doc(build_combined_alternation(), texts)),
+        ("doc: reference_features", time_per_doc(lambda d: reference_features(d, d.text, []), docs)),
+        ("doc: features_from_doc", time_per_doc(lambda d: classifier.features_from_doc(d, d.text, []), docs)),
+    ]
+    print(f"{'extractor':<26} {'us/doc':>10}")
+    for name, per_doc in rows:
+        print(f"{name:<26} {per_doc * 1e6:>10.1f}")
+    print(f"regex speedup: {rows[0][1] / rows[1][1]:.2f}x, doc features speedup: {rows[3][1] / rows[4][1]:.2f}x")
+    return 0
+
+
+def cmd_parity(args: argparse.Namespace) -> int:
+    texts = load_corpus(args.corpus) + LEXICAL_EDGE_CASES
+    failures = 0
+    for i, (doc, text) in enumerate(zip(classifier.nlp.pipe(texts), texts)):
+        expected = reference_features(doc, text, [])
+        actual = classifier.features_from_doc(doc, text, [])
+        if actual != expected:
+            failures += 1
+            diff = {k: (expected[k], actual.get(k)) for k in expected if expected[k] != actual.get(k)}
+            print(f"doc {i}: {diff}  text={text[:60]!r}")
+    print(f"feature parity: {len(texts) - failures}/{len(texts)} identical")
+    return 1 if failures else 0
+
+
+def cmd_chunking(args: argparse.Namespace) -> int:
+    corpus = load_corpus(args.corpus)
+    print(f"chunk size {classifier.CHUNK_CHARS} chars, budget {classifier.MAX_TEXT_CHARS} chars")
+    print(f"{'chars':>9} {'chunks':>7} {'whole ms':>10} {'chunked ms':>11}  label  differing features")
+    for copies in (int(c) for c in args.copies.split(",")):
+        text = "\n\n".join(corpus * copies)
+        # Both sides see the same budgeted text, so only chunking differs.
+        text = classifier.budget_text(text)[0]
+        if len(text) > classifier.nlp.max_length:
+            whole, whole_ms = None, float("nan")
+        else:
+            started = time.perf_counter()
+            whole = classifier.features_from_doc(classifier.nlp(text), text, [])
+            whole_ms = (time.perf_counter() - started) * 1000
+        started = time.perf_counter()
+        chunked = classifier.compute_features(text, [])
+        chunked_ms = (time.perf_counter() - started) * 1000
+
+        chunks = len(classifier.split_chunks(text))
+        if whole is None:
+            label, diff = "n/a", "whole text exceeds nlp.max_length"
+        else:
+            same = classifier.score_and_explain(whole)["label"] == classifier.score_and_explain(chunked)["label"]
+            label = "same" if same else "DIFF"
+            diff = ", ".join(f"{k}={whole[k]}->{chunked.get(k)}" for k in whole if whole[k] != chunked.get(k)) or "-"
+        print(f"{len(text):>9} {chunks:>7} {whole_ms:>10.1f} {chunked_ms:>11.1f}  {label:<5}  {diff}")
+    return 0
+
+
+def random_features(rng: random.Random) -> Dict[str, Any]:
+    return {
+        "word_count": rng.choice((rng.randint(0, 45), rng.randint(0, 400))),
+        "sentence_count": rng.randint(0, 30),
+        "evidence_hits": rng.randint(0, 8),
+        "opinion_hits": rng.randint(0, 6),
+        "vague_hits": rng.randint(0, 5),
+        "has_dates": rng.random() < 0.5,
+        "has_money": rng.random() < 0.3,
+        "has_org": rng.random() < 0.3,
+        "has_person": rng.random() < 0.3,
+        "has_url": rng.random() < 0.2,
+        "has_named_entities": rng.random() < 0.5,
+        "entity_count": rng.randint(0, 10),
+        "id_hits": rng.randint(0, 4),
+        "accusation_count": rng.randint(0, 6),
+        "attachment_count": rng.randint(0, 3),
+        "first_person_experience": rng.randint(0, 6),
+    }
+
+
+def cmd_scorer(args: argparse.Namespace) -> int:
+    import numpy as np
+    from classifier import score_and_explain
+    from vector_score import explain_rows, feature_columns, score_columns
+
+    rng = random.Random(args.seed)
+    rows = [random_features(rng) for _ in range(args.rows)]
+
+    started = time.perf_counter()
+    cols = feature_columns(rows)
+    to_columns_s = time.perf_counter() - started
+    started = time.perf_counter()
+    scored = score_columns(cols)
+    vector_s = time.perf_counter() - started
+
+    started = time.perf_counter()
+    expected = [score_and_explain(r) for r in rows]
+    scalar_s = time.perf_counter() - started
+
+    failures = 0
+    for name in ("anchors", "evidence_score", "opinion_score", "unable_score", "final_score"):
+        want = np.fromiter((e["explanation"][name] for e in expected), dtype=np.float64, count=len(rows))
+        # compare the raw bits, so -0.0 vs 0.0 or a last-ulp difference counts
+        bad = np.flatnonzero(want.view(np.uint64) != scored[name].view(np.uint64))
+        failures += len(bad)
+        print(f"{name:<15} {len(rows) - len(bad)}/{len(rows)} bit-identical")
+    labels = np.array([e["label"] for e in expected])
+    bad_labels = int(np.count_nonzero(labels != scored["label"]))
+    failures += bad_labels
+    print(f"{'label':<15} {len(rows) - bad_labels}/{len(rows)} identical")
+
+    sample = rows[: min(len(rows), 10000)]
+    explained = explain_rows(sample, {k: v[: len(sample)] for k, v in scored.items()})
+    bad_explanations = sum(1 for a, b in zip(explained, expected) if a != b)
+    failures += bad_explanations
+    print(f"{'explain_rows':<15} {len(sample) - bad_explanations}/{len(sample)} identical to score_and_explain")
+
+    print(f"scalar:  {len(rows) / scalar_s:>12,.0f} rows/s ({scalar_s:.2f}s)")
+    print(f"vector:  {len(rows) / vector_s:>12,.0f} rows/s ({vector_s:.3f}s, plus {to_columns_s:.2f}s dicts -> columns)")
+    return 1 if failures else 0
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("throughput", help="docs/sec, per-stage latency percentiles and RSS: single, batch, raw pipe, raw multiprocess")
+    p.add_argument("--corpus", default=DEFAULT_CORPUS)
+    p.add_argument("--repeat", type=int, default=20, help="times to repeat the corpus for timing")
+    p.add_argument("--batch-size", type=int, default=64)
+    p.add_argument("--processes", type=int, default=2, help="n_process for the multiprocess mode")
+    p.set_defaults(func=cmd_throughput)
+
+    p = sub.add_parser("eval", help="label the corpus; confusion matrix against a previous version's outputs")
+    p.add_argument("--corpus", default=DEFAULT_CORPUS)
+    p.add_argument("--save", help="write this version's outputs (JSONL) here")
+    p.add_argument("--previous", help="outputs saved by an earlier version")
+    p.add_argument("--show", type=int, default=20, help="changed labels to list")
+    p.set_defaults(func=cmd_eval)
+
+    p = sub.add_parser("pipeline", help="full vs lean spaCy pipeline and the short-text path: throughput, RSS and label parity")
+    p.add_argument("--corpus", default=DEFAULT_CORPUS)
+    p.add_argument("--repeat", type=int, default=20, help="times to repeat the corpus for timing")
+    p.add_argument("--batch-size", type=int, default=64)
+    p.set_defaults(func=cmd_pipeline)
+
+    p = sub.add_parser("matcher", help="single-pass lexical scanner vs separate regex scans")
+    p.add_argument("--corpus", default=DEFAULT_CORPUS)
+    p.add_argument("--repeat", type=int, default=200)
+    p.set_defaults(func=cmd_matcher)
+
+    p = sub.add_parser("parity", help="features_from_doc against the multi-pass reference")
+    p.add_argument("--corpus", default=DEFAULT_CORPUS)
+    p.set_defaults(func=cmd_parity)
+
+    p = sub.add_parser("chunking", help="whole-text parse vs chunked compute_features on long texts")
+    p.add_argument("--corpus", default=DEFAULT_CORPUS)
+    p.add_argument("--copies", default="1,5,20", help="comma-separated corpus repetitions per text")
+    p.set_defaults(func=cmd_chunking)
+
+    p = sub.add_parser("scorer", help="vectorized scorer parity and throughput vs score_and_explain")
+    p.add_argument("--rows", type=int, default=1000000)
+    p.add_argument("--seed", type=int, default=0)
+    p.set_defaults(func=cmd_scorer)
+
+    p = sub.add_parser("throughput-mode", help=argparse.SUPPRESS)
+    p.add_argument("--mode", choices=("single", "batch", "pipe", "multiprocess"), required=True)
+    p.add_argument("--corpus", default=DEFAULT_CORPUS)
+    p.add_argument("--repeat", type=int, default=20)
+    p.add_argument("--batch-size", type=int, default=64)
+    p.add_argument("--processes", type=int, default=2)
+    p.set_defaults(func=run_throughput_mode)
+
+    p = sub.add_parser("pipeline-mode", help=argparse.SUPPRESS)
+    p.add_argument("--corpus", default=DEFAULT_CORPUS)
+    p.add_argument("--repeat", type=int, default=20)
+    p.add_argument("--batch-size", type=int, default=64)
+    p.set_defaults(func=run_pipeline_mode)
+
+    args = parser.parse_args(argv)
+    if args.command in ("matcher", "parity", "chunking"):
+        global classifier
+        import classifier
+        classifier.ensure_loaded()
+    return args.func(args) or 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,148 @@
+"""
+Content-addressed cache for computed features.
+
+Records are re-sent to the webhook for reasons that don't touch the text
+(edits to other columns, duplicate deliveries), so features are cached under
+(sha256 of the normalized description, attachment count, features version).
+A hit skips the spaCy parse entirely; scoring is cheap and always re-run.
+
+Two tiers: an in-process LRU with size and TTL eviction, and an optional
+SQLite file shared by every worker on the host.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+
+def normalize_text(text: str) -> str:
+    return unicodedata.normalize("NFC", text.replace("\r\n", "\n")).strip()
+
+
+def feature_key(text: str, attachment_count: int, version: str) -> str:
+    digest = hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+    return f"{version}:{attachment_count}:{digest}"
+
+
+class FeatureCache:
+    def __init__(self, max_entries: int = 10000, ttl_s: float = 86400.0, sqlite_path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self.sqlite_path = sqlite_path
+
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._db: Optional[sqlite3.Connection] = None
+        self._pid = os.getpid()
+        self._inherited = []
+        self._puts = 0
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+        if sqlite_path:
+            self._db = self._open()
+            self._purge_disk()
+
+    def _open(self) -> sqlite3.Connection:
+        db = sqlite3.connect(self.sqlite_path, timeout=30, check_same_thread=False, isolation_level=None)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS feature_cache ("
+            "key TEXT PRIMARY KEY, features TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        return db
+
+    def _after_fork(self) -> None:
+        # An SQLite connection must not be used across fork(). Pre-fork workers
+        # open their own; the inherited one is kept referenced but unused.
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            if self._db is not None:
+                self._inherited.append(self._db)
+                self._db = self._open()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 or self._db is not None
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            self._after_fork()
+            entry = self._entries.get(key)
+            if entry is not None:
+                created_at, features = entry
+                if now - created_at <= self.ttl_s:
+                    self._entries.move_to_end(key)
+                    self.memory_hits += 1
+                    return dict(features)
+                del self._entries[key]
+                self.expirations += 1
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT features, created_at FROM feature_cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None and now - row[1] <= self.ttl_s:
+                    features = json.loads(row[0])
+                    self._remember(key, row[1], features)
+                    self.disk_hits += 1
+                    return dict(features)
+
+            self.misses += 1
+            return None
+
+    def put(self, key: str, features: Dict[str, Any]) -> None:
+        now = time.time()
+        with self._lock:
+            self._after_fork()
+            self._remember(key, now, dict(features))
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO feature_cache (key, features, created_at) VALUES (?, ?, ?)",
+                    (key, json.dumps(features), now),
+                )
+                self._puts += 1
+                if self._puts % 1000 == 0:
+                    self._purge_disk()
+
+    def _remember(self, key: str, created_at: float, features: Dict[str, Any]) -> None:
+        if self.max_entries <= 0:
+            return
+        self._entries[key] = (created_at, features)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _purge_disk(self) -> None:
+        self._db.execute("DELETE FROM feature_cache WHERE created_at < ?", (time.time() - self.ttl_s,))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._after_fork()
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            out: Dict[str, Any] = {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+                "memory_entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_s": self.ttl_s,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "sqlite_path": self.sqlite_path,
+            }
+            if self._db is not None:
+                out["disk_entries"] = self._db.execute("SELECT COUNT(*) FROM feature_cache").fetchone()[0]
+            return out
@@ -0,0 +1,752 @@
+"""
+spaCy feature extraction and scoring for DNounce records.
+
+Kept free of Supabase/FastAPI so it can be imported by inference worker
+processes and offline tooling without any service credentials.
+
+Importing this module is cheap: the model and the PhraseMatcher are loaded
+by ensure_loaded() (or warm_up()) on first use, so a server can bind its
+port before the model is in memory.
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import spacy
+from spacy.matcher import PhraseMatcher
+from spacy.strings import get_string_id
+from spacy.tokens import DocBin
+
+# -------------------------
+# Config
+# -------------------------
+CLASSIFIER_VERSION = "dnounce_spacy_v5_text_only"
+
+# What the feature dict means. Bump when features_from_docs changes; a change
+# to score_and_explain alone only bumps CLASSIFIER_VERSION, so stored and
+# cached features stay reusable (see `rescore.py --from-features`).
+FEATURES_VERSION = "dnounce_spacy_features_v1"
+
+# "full": stock en_core_web_sm (minus the lemmatizer).
+# "lean": only what compute_features reads -- NER (which has its own tok2vec
+# in the sm model) plus a rule-based sentencizer ahead of it, so NER still
+# sees sentence boundaries. sentence_count can differ slightly because
+# sentences come from punctuation rules instead of the dependency parse, so
+# its features get their own version (below). `python bench.py pipeline`
+# measures its speed, memory and label parity against "full".
+SPACY_PIPELINE = os.getenv("SPACY_PIPELINE", "full")
+
+# Batch classification (nlp.pipe)
+BATCH_SIZE = int(os.getenv("SPACY_BATCH_SIZE", "64"))
+N_PROCESS = int(os.getenv("SPACY_N_PROCESS", "1"))
+
+# Long texts: parsed in chunks of at most SPACY_CHUNK_CHARS characters, cut
+# at paragraph, then sentence, then word boundaries. Anything past
+# SPACY_MAX_TEXT_CHARS is not analysed at all (features get "truncated": True).
+CHUNK_CHARS = int(os.getenv("SPACY_CHUNK_CHARS", "5000"))
+MAX_TEXT_CHARS = int(os.getenv("SPACY_MAX_TEXT_CHARS", "100000"))
+
+# Texts under this many words get the maximum length penalty in
+# score_and_explain. With SPACY_SHORT_TEXT_PATH=1 the "full" pipeline skips
+# everything but NER + sentencizer for them (as "lean" does). Off by default:
+# NER then sees sentencizer boundaries instead of the parse, which can change
+# the entity and sentence features, so enable it only once
+# `python bench.py pipeline` shows parity for "full+short".
+SHORT_TEXT_WORDS = 20
+SHORT_TEXT_PATH = os.getenv("SPACY_SHORT_TEXT_PATH", "0") == "1"
+
+# Features from "lean" or the short-text path are cached and stored apart
+# from the full parse's, so they are never mixed under one version.
+if SPACY_PIPELINE != "full":
+    FEATURES_VERSION += f"+{SPACY_PIPELINE}"
+elif SHORT_TEXT_PATH:
+    FEATURES_VERSION += "+short"
+
+# Tokenized matcher phrases are cached here between runs; empty disables it
+MATCHER_CACHE_DIR = os.getenv(
+    "MATCHER_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".matcher-cache")
+)
+
+# -------------------------
+# spaCy setup
+# -------------------------
+PIPELINE_EXCLUDES = {
+    "full": ["lemmatizer"],
+    "lean": ["tok2vec", "tagger", "parser", "attribute_ruler", "lemmatizer"],
+}
+
+def load_pipeline(mode: str):
+    if mode not in PIPELINE_EXCLUDES:
+        raise ValueError(f"Unknown SPACY_PIPELINE {mode!r}; expected one of {sorted(PIPELINE_EXCLUDES)}")
+    nlp = spacy.load("en_core_web_sm", exclude=PIPELINE_EXCLUDES[mode])
+    if "sentencizer" not in nlp.pipe_names:
+        # Before NER, which won't run an entity across a sentence boundary.
+        # After a parser it only fills in (the parse's boundaries win).
+        nlp.add_pipe("sentencizer", before="ner" if "ner" in nlp.pipe_names else None)
+    return nlp
+
+# Set by ensure_loaded()
+nlp = None
+matcher: Optional[PhraseMatcher] = None
+
+# Components skipped for short texts; empty in "lean" mode or without SHORT_TEXT_PATH
+short_text_disable: List[str] = []
+
+# Seconds spent in each load step of this process, for /ready and logs
+LOAD_TIMINGS: Dict[str, float] = {}
+_load_lock = threading.Lock()
+
+# ── Evidence phrases ────────────────────────────────────────────────────────
+# Must imply a verifiable artifact, not just a word like "email"
+EVIDENCE_PHRASES = [
+    # Documents & paper trails
+    "receipt", "receipts", "invoice", "invoices", "contract", "signed contract",
+    "written agreement", "agreement", "lease", "lease agreement",
+    "bank statement", "bank statements", "credit card statement",
+    "pay stub", "pay stubs", "paycheck", "w2", "tax return",
+    "police report", "incident report", "filed a report",
+    "court document", "court order", "restraining order", "legal document",
+    "official document", "notarized", "affidavit",
+
+    # Communications with specificity
+    "email thread", "email chain", "forwarded the email",
+    "i have the emails", "i saved the texts", "text message thread",
+    "i have screenshots", "i have a screenshot", "i took a screenshot",
+    "recorded the call", "i have a recording", "i recorded",
+    "voicemail", "i have the voicemail",
+
+    # Transactions
+    "wire transfer", "zelle payment", "venmo", "cash app payment",
+    "paypal transaction", "bank transfer", "check number",
+    "payment confirmation", "transaction id", "transaction number",
+
+    # Reference numbers
+    "case number", "report number", "ticket number", "order number",
+    "tracking number", "reference number", "confirmation number",
+    "claim number", "file number",
+
+    # Witnesses
+    "witness", "witnesses", "there were witnesses",
+    "my coworker saw", "my colleague saw", "others witnessed",
+    "multiple people saw", "people were present",
+
+    # Medical / HR / Official
+    "medical record", "doctor's note", "hospital report",
+    "hr complaint", "filed a complaint", "hr was notified",
+    "i reported it to", "i filed", "submitted a complaint",
+
+    # Physical evidence
+    "photo", "photos", "photograph", "photographs",
+    "video", "videos", "footage", "security footage", "surveillance",
+    "i have proof", "i have evidence", "attached is", "see attached",
+    "i am attaching", "i uploaded", "documentation", "documented",
+]
+
+# ── Opinion / feeling phrases ────────────────────────────────────────────────
+# Captures subjective, emotional, and unverifiable experience language
+OPINION_PHRASES = [
+    # Hedging
+    "i think", "i feel", "i believe", "in my opinion", "i thought",
+    "i felt", "it felt", "it seemed", "it seems", "seems like",
+    "probably", "maybe", "i guess", "i assume", "i assumed",
+    "i suspect", "i suspect", "i imagine", "i suppose",
+    "kind of", "sort of", "i could be wrong",
+
+    # Emotional experience
+    "made me feel", "made me cry", "made me uncomfortable",
+    "i was hurt", "i was upset", "i was devastated",
+    "i was shocked", "i was disgusted", "i was embarrassed",
+    "i was humiliated", "i felt disrespected", "i felt violated",
+    "i felt unsafe", "i felt threatened", "i felt ignored",
+    "emotionally", "mentally", "psychologically",
+
+    # Interpersonal judgment
+    "he was rude", "she was rude", "they were rude",
+    "he was mean", "she was mean", "he is a bad person",
+    "she is manipulative", "he is controlling", "she is toxic",
+    "he always", "she always", "they always", "he never", "she never",
+    "he would always", "she would always",
+    "his attitude", "her attitude", "their attitude",
+    "his behavior", "her behavior", "their behavior",
+    "the way he treated me", "the way she treated me",
+    "treated me like", "treated me as",
+
+    # Vague claims
+    "everyone knows", "everybody knows", "it is well known",
+    "people say", "i heard", "i was told", "someone told me",
+    "rumor", "rumors", "word got around",
+
+    # Personal moral judgment
+    "a terrible person", "a horrible person", "a bad person",
+    "unprofessional", "disrespectful", "disgusting behavior",
+    "morally wrong", "ethically wrong", "wrong of him", "wrong of her",
+]
+
+# ── Accusation terms ─────────────────────────────────────────────────────────
+ACCUSATION_TERMS = {
+    "scam", "scammed", "steal", "stole", "stolen", "fraud", "fraudulent",
+    "abuse", "abused", "cheat", "cheated", "lie", "lied", "gaslight", "gaslit",
+    "harass", "harassed", "threaten", "threatened", "manipulate", "manipulated",
+    "exploit", "exploited", "deceive", "deceived", "defraud", "defrauded",
+}
+
+# There is no lemmatizer in the pipeline, so inflected forms are matched
+# against this precomputed set instead of t.lemma_ (which is always empty).
+ACCUSATION_INFLECTIONS = {
+    "scam": ["scams", "scamming"],
+    "steal": ["steals", "stealing"],
+    "fraud": ["frauds"],
+    "abuse": ["abuses", "abusing"],
+    "cheat": ["cheats", "cheating"],
+    "lie": ["lies", "lying"],
+    "gaslight": ["gaslights", "gaslighting", "gaslighted"],
+    "harass": ["harasses", "harassing"],
+    "threaten": ["threatens", "threatening"],
+    "manipulate": ["manipulates", "manipulating"],
+    "exploit": ["exploits", "exploiting"],
+    "deceive": ["deceives", "deceiving"],
+    "defraud": ["defrauds", "defrauding"],
+}
+ACCUSATION_FORMS = frozenset(ACCUSATION_TERMS).union(*ACCUSATION_INFLECTIONS.values())
+
+# ── Vagueness signals ────────────────────────────────────────────────────────
+# These push toward Anonymity Granted
+VAGUE_PHRASES = [
+    "i don't know", "not sure", "i'm not sure", "i cannot say",
+    "i can't explain", "hard to explain", "it's complicated",
+    "something happened", "things happened", "stuff happened",
+    "bad things", "bad stuff", "many things", "a lot happened",
+    "at some point", "eventually", "over time", "for a long time",
+    "multiple times", "several times", "many times",  # without specifics
+]
+
+# ── Verifiable ID patterns ───────────────────────────────────────────────────
+ID_PATTERNS = [
+    re.compile(r"\b(case|report|ticket|order|invoice|ref|reference|claim|file)\s*#?\s*[A-Z0-9\-]{4,}\b", re.I),
+    re.compile(r"\b[A-Z]{2,5}\-[0-9]{3,}\b", re.I),
+    re.compile(r"\b\d{1,2}/\d{1,2}/\d{2,4}\b"),  # dates like 03/15/2024
+    re.compile(r"\b(january|february|march|april|may|june|july|august|september|october|november|december)\s+\d{1,2},?\s+\d{4}\b", re.I),
+]
+
+URL_RE = re.compile(r"https?://\S+|www\.\S+", re.IGNORECASE)
+
+# First-person experience sentences — strong opinion signal.
+# Same phrases as a flat "i was|i felt|..." alternation (no two can match at
+# the same position, so order is irrelevant), factored by prefix; the leading
+# lookahead lets the engine skip positions that can't start any phrase.
+FIRST_PERSON_RE = re.compile(
+    r"(?=[ihstml])\b(?:i (?:was|felt|feel|am|had|experienced|went through)|i've been|"
+    r"(?:he|she|they|it) made me|made me feel|left me feeling)\b",
+    re.I
+)
+
+
+class LexicalScanner:
+    """
+    All regex signals (URL, ID patterns, first-person phrases), compiled once.
+
+    Every pattern needs some literal to be present before it can match, so
+    one lowercased copy of the text is checked for those literals (fast C
+    substring searches) and only the patterns that could match are run.
+    Most descriptions have no URL, ID or date at all and skip those regexes
+    entirely. The gates are only applied to ASCII text; under re.I a few
+    non-ASCII characters (e.g. the Kelvin sign) fold to ASCII letters, so
+    non-ASCII text runs every pattern to stay exact.
+
+    A single combined alternation over all patterns is slower than the
+    separate searches in CPython's backtracking engine, so patterns stay
+    separate (see `python bench.py matcher`).
+    """
+
+    def __init__(self, url_re: "re.Pattern[str]", id_patterns: List["re.Pattern[str]"], first_person_re: "re.Pattern[str]"):
+        self.url_re = url_re
+        self.id_patterns = id_patterns
+        self.first_person_re = first_person_re
+
+    def scan(self, text: str) -> Tuple[bool, int, int]:
+        """Returns (has_url, id_hits, first_person_experience)."""
+        if not text.isascii():
+            return (
+                bool(self.url_re.search(text)),
+                sum(1 for pat in self.id_patterns if pat.search(text)),
+                len(self.first_person_re.findall(text)),
+            )
+
+        low = text.lower()
+        gated = [any(lit in low for lit in lits) for lits in ID_PATTERN_LITERALS]
+        has_url = any(lit in low for lit in URL_LITERALS) and bool(self.url_re.search(text))
+        id_hits = sum(1 for pat, gate in zip(self.id_patterns, gated) if gate and pat.search(text))
+        fpe = len(self.first_person_re.findall(text)) if any(lit in low for lit in FIRST_PERSON_LITERALS) else 0
+        return has_url, id_hits, fpe
+
+
+# Literals (lowercase) at least one of which must appear for each pattern to match.
+URL_LITERALS = ("http", "www.")
+ID_PATTERN_LITERALS = [
+    ("case", "report", "ticket", "order", "invoice", "ref", "claim", "file"),
+    ("-",),
+    ("/",),
+    ("january", "february", "march", "april", "may", "june", "july", "august",
+     "september", "october", "november", "december"),
+]
+FIRST_PERSON_LITERALS = ("i ", "i'", "made me", "left me")
+
+lexical_scanner = LexicalScanner(URL_RE, ID_PATTERNS, FIRST_PERSON_RE)
+
+MATCHER_PHRASES = {"EVIDENCE": EVIDENCE_PHRASES, "OPINION": OPINION_PHRASES, "VAGUE": VAGUE_PHRASES}
+
+EVIDENCE_ID = get_string_id("EVIDENCE")
+OPINION_ID = get_string_id("OPINION")
+VAGUE_ID = get_string_id("VAGUE")
+
+# -------------------------
+# Loading
+# -------------------------
+def matcher_cache_path(nlp) -> Optional[str]:
+    """One file per (phrases, spaCy version, model version); stale files are simply never read."""
+    if not MATCHER_CACHE_DIR:
+        return None
+    fingerprint = json.dumps(
+        [spacy.__version__, nlp.meta.get("name"), nlp.meta.get("version"), MATCHER_PHRASES], sort_keys=True
+    )
+    digest = hashlib.sha256(fingerprint.encode("utf-8")).hexdigest()[:16]
+    return os.path.join(MATCHER_CACHE_DIR, f"phrases-{digest}.spacy")
+
+def load_phrase_docs(nlp) -> Dict[str, list]:
+    """
+    Tokenized phrase Docs per label, read from the DocBin cache when present
+    and written to it otherwise. Any cache problem falls back to make_doc.
+    """
+    path = matcher_cache_path(nlp)
+    total = sum(len(phrases) for phrases in MATCHER_PHRASES.values())
+    if path and os.path.exists(path):
+        try:
+            with open(path, "rb") as f:
+                docs = list(DocBin().from_bytes(f.read()).get_docs(nlp.vocab))
+            if len(docs) == total:
+                out, start = {}, 0
+                for label, phrases in MATCHER_PHRASES.items():
+                    out[label] = docs[start:start + len(phrases)]
+                    start += len(phrases)
+                return out
+        except Exception:
+            pass
+
+    out = {label: [nlp.make_doc(p) for p in phrases] for label, phrases in MATCHER_PHRASES.items()}
+    if path:
+        try:
+            docbin = DocBin(attrs=["ORTH"])
+            for docs in out.values():
+                for doc in docs:
+                    docbin.add(doc)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(docbin.to_bytes())
+            os.replace(tmp, path)
+        except OSError:
+            pass
+    return out
+
+def ensure_loaded() -> None:
+    """Load the spaCy pipeline and build the PhraseMatcher once per process (thread-safe)."""
+    global nlp, matcher, short_text_disable
+    if matcher is not None:
+        return
+    with _load_lock:
+        if matcher is not None:
+            return
+        started = time.perf_counter()
+        loaded = load_pipeline(SPACY_PIPELINE)
+        LOAD_TIMINGS["model_load_s"] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        built = PhraseMatcher(loaded.vocab, attr="LOWER")
+        for label, docs in load_phrase_docs(loaded).items():
+            built.add(label, docs)
+        LOAD_TIMINGS["matcher_build_s"] = time.perf_counter() - started
+
+        if SHORT_TEXT_PATH:
+            short_text_disable = [name for name in PIPELINE_EXCLUDES["lean"] if name in loaded.pipe_names]
+        nlp = loaded
+        matcher = built
+
+# -------------------------
+# Helpers
+# -------------------------
+def clamp01(x: float) -> float:
+    return max(0.0, min(1.0, x))
+
+
+# -------------------------
+# Parsing
+# -------------------------
+PARAGRAPH_BREAK_RE = re.compile(r"\n\s*\n")
+SENTENCE_END_RE = re.compile(r"[.!?][\"')\]]*\s+")
+WHITESPACE_RE = re.compile(r"\s+")
+
+def budget_text(text: str) -> Tuple[str, bool]:
+    """Cut text to MAX_TEXT_CHARS (at a word boundary when there is one)."""
+    if len(text) <= MAX_TEXT_CHARS:
+        return text, False
+    cut = text.rfind(" ", 0, MAX_TEXT_CHARS + 1)
+    return text[:cut if cut > 0 else MAX_TEXT_CHARS], True
+
+def split_chunks(text: str, limit: int = CHUNK_CHARS) -> List[str]:
+    """
+    Split text into pieces of at most `limit` characters whose concatenation
+    is exactly `text`. Each cut is at the last paragraph break in the window,
+    else the last sentence end, else the last whitespace; a hard cut only
+    happens inside a `limit`-long run without whitespace.
+    """
+    chunks: List[str] = []
+    start = 0
+    while len(text) - start > limit:
+        window = text[start:start + limit]
+        cut = 0
+        for boundary in (PARAGRAPH_BREAK_RE, SENTENCE_END_RE, WHITESPACE_RE):
+            for m in boundary.finditer(window):
+                cut = m.end()
+            if cut:
+                break
+        cut = cut or limit
+        chunks.append(window[:cut])
+        start += cut
+    chunks.append(text[start:])
+    return chunks
+
+def prepare_docs(text: str) -> Tuple[list, bool, bool]:
+    """
+    Tokenize `text` (within the budget) into one Doc per chunk.
+    Returns (docs, short, truncated); short docs skip short_text_disable.
+    """
+    text, truncated = budget_text(text)
+    docs = [nlp.make_doc(chunk) for chunk in split_chunks(text)]
+    short = len(docs) == 1 and sum(1 for t in docs[0] if t.is_alpha) < SHORT_TEXT_WORDS
+    return docs, short, truncated
+
+def parse(text: str) -> Tuple[list, bool]:
+    """Run the pipeline over `text`; returns (one Doc per chunk, truncated)."""
+    docs, short, truncated = prepare_docs(text)
+    disable = short_text_disable if short else []
+    return [nlp(doc, disable=disable) for doc in docs], truncated
+
+def compute_features(text: str, attachments: List[Dict[str, Any]]) -> Dict[str, Any]:
+    ensure_loaded()
+    docs, truncated = parse(text)
+    return features_from_docs(docs, text, attachments, truncated)
+
+def compute_features_timed(text: str, attachments: List[Dict[str, Any]]) -> Tuple[Dict[str, Any], Dict[str, float]]:
+    """compute_features, plus seconds spent in the spaCy parse and in feature extraction."""
+    ensure_loaded()
+    started = time.perf_counter()
+    docs, truncated = parse(text)
+    parsed = time.perf_counter()
+    feats = features_from_docs(docs, text, attachments, truncated)
+    return feats, {"nlp_parse": parsed - started, "feature_extraction": time.perf_counter() - parsed}
+
+def features_from_doc(doc, text: str, attachments: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return features_from_docs((doc,), text, attachments)
+
+def features_from_docs(docs, text: str, attachments: List[Dict[str, Any]], truncated: bool = False) -> Dict[str, Any]:
+    """
+    Features for a text parsed as one or more chunk Docs. Per-doc counts are
+    summed and flags OR-ed, so a single Doc gives exactly the unchunked result;
+    the regex scans run once over the (budgeted) text itself. Across chunks
+    the tokens are the same, but a chunk boundary always ends a sentence and
+    NER only sees context within its chunk.
+    """
+    evidence_hits = 0
+    opinion_hits = 0
+    vague_hits = 0
+    has_dates = has_money = has_org = has_person = False
+    entity_count = 0
+    word_count = 0
+    accusation_count = 0
+    token_url = False
+    sentence_count = 0
+
+    for doc in docs:
+        for match_id, start, end in matcher(doc):
+            if match_id == EVIDENCE_ID:
+                evidence_hits += 1
+            elif match_id == OPINION_ID:
+                opinion_hits += 1
+            elif match_id == VAGUE_ID:
+                vague_hits += 1
+
+        for e in doc.ents:
+            entity_count += 1
+            label = e.label_
+            if label == "DATE" or label == "TIME":
+                has_dates = True
+            elif label == "MONEY":
+                has_money = True
+            elif label == "ORG":
+                has_org = True
+            elif label == "PERSON":
+                has_person = True
+
+        for t in doc:
+            if t.is_alpha:
+                word_count += 1
+                if t.lower_ in ACCUSATION_FORMS:
+                    accusation_count += 1
+            elif not token_url and t.like_url:
+                token_url = True
+
+        sentence_count += sum(1 for _ in doc.sents)
+
+    has_named_entities = entity_count >= 2
+
+    if truncated:
+        text = budget_text(text)[0]
+    url_in_text, id_hits, first_person_experience = lexical_scanner.scan(text)
+    has_url = url_in_text or token_url
+    attachment_count = len(attachments or [])
+
+    feats = {
+        "word_count": word_count,
+        "sentence_count": sentence_count,
+        "evidence_hits": evidence_hits,
+        "opinion_hits": opinion_hits,
+        "vague_hits": vague_hits,
+        "has_dates": has_dates,
+        "has_money": has_money,
+        "has_org": has_org,
+        "has_person": has_person,
+        "has_url": has_url,
+        "has_named_entities": has_named_entities,
+        "entity_count": entity_count,
+        "id_hits": id_hits,
+        "accusation_count": accusation_count,
+        "attachment_count": attachment_count,
+        "first_person_experience": first_person_experience,
+    }
+    if truncated:
+        feats["truncated"] = True
+    return feats
+
+
+# -------------------------
+# Scoring model
+# -------------------------
+def score_and_explain(f: Dict[str, Any]) -> Dict[str, Any]:
+    wc = f["word_count"]
+    ev = f["evidence_hits"]
+    op = f["opinion_hits"]
+    vague = f["vague_hits"]
+    dates = 1.0 if f["has_dates"] else 0.0
+    money = 1.0 if f["has_money"] else 0.0
+    url = 1.0 if f["has_url"] else 0.0
+    ents = 1.0 if f["has_named_entities"] else 0.0
+    ids = clamp01(f["id_hits"] / 2.0)
+    acc = clamp01(f["accusation_count"] / 3.0)
+    attach = clamp01(f["attachment_count"] / 2.0)
+    fpe = clamp01(f["first_person_experience"] / 3.0)
+
+    # ── Factual anchors (verifiable signals) ──────────────────────────────
+    anchors = (
+        0.26 * clamp01(ev / 4.0) +   # evidence phrases
+        0.20 * dates +                 # dates/times detected
+        0.18 * money +                 # money amounts
+        0.10 * ents +                  # named entities
+        0.10 * ids +                   # reference numbers
+        0.08 * url +                   # links/URLs
+        0.08 * attach                  # actual file attachments
+    )
+    anchors = clamp01(anchors)
+
+    # ── Opinion signals ───────────────────────────────────────────────────
+    # First-person experience is a strong opinion signal
+    # Hedging phrases add to it
+    # Both are downweighted if factual anchors are strong
+    raw_opinion = clamp01(
+        0.45 * fpe +
+        0.35 * clamp01(op / 3.0) +
+        0.20 * clamp01(acc * (1.0 - 0.6 * anchors))
+    )
+    effective_opinion = clamp01(raw_opinion * (1.0 - 0.70 * anchors))
+
+    # ── Vagueness penalty ─────────────────────────────────────────────────
+    vague_penalty = clamp01(vague / 3.0)
+
+    # ── Length signal ─────────────────────────────────────────────────────
+    # Very short text = Anonymity Granted, regardless of content
+    if wc < 20:
+        length_penalty = 0.8  # strong push to Anonymity Granted
+    elif wc < 40:
+        length_penalty = 0.4
+    else:
+        length_penalty = 0.0
+
+    # ── Final scores ──────────────────────────────────────────────────────
+    evidence_score = clamp01(anchors - (0.2 * vague_penalty) - (0.1 * length_penalty))
+    opinion_score = clamp01(effective_opinion - (0.15 * vague_penalty))
+    unable_score = clamp01(
+        0.40 * vague_penalty +
+        0.35 * length_penalty +
+        0.25 * (1.0 - max(anchors, effective_opinion))
+    )
+
+    # ── Decision ──────────────────────────────────────────────────────────
+    # Anonymity Granted: anchors must be strong — raised threshold
+    # Anonymity Not Granted: opinion must dominate AND anchors must be weak
+    # Anonymity Granted: everything else — too vague, too short, mixed signals
+
+    if evidence_score >= 0.55 and evidence_score > opinion_score:
+        label = "Anonymity Granted"
+        final = evidence_score
+
+    elif opinion_score >= 0.40 and anchors <= 0.30 and opinion_score > unable_score:
+        label = "Anonymity Not Granted"
+        final = opinion_score
+
+    else:
+        label = "Anonymity Granted"
+        final = clamp01(unable_score + 0.1)  # slight boost so score reflects confidence
+
+    summary = (
+        f"{CLASSIFIER_VERSION}: label={label} score={final:.2f} "
+        f"(anchors={anchors:.2f} evidence_score={evidence_score:.2f} "
+        f"opinion_score={opinion_score:.2f} unable_score={unable_score:.2f}) "
+        f"| ev={ev} op={op} vague={vague} fpe={f['first_person_experience']} "
+        f"dates={int(dates)} money={int(money)} ents={int(ents)} "
+        f"ids={f['id_hits']} attach={f['attachment_count']} wc={wc}"
+    )
+
+    return {
+        "label": label,
+        "score": final,
+        "explanation": {
+            "classifier_version": CLASSIFIER_VERSION,
+            "label": label,
+            "final_score": final,
+            "anchors": anchors,
+            "evidence_score": evidence_score,
+            "opinion_score": opinion_score,
+            "unable_score": unable_score,
+            "summary": summary,
+            "features": f,
+        }
+    }
+
+
+# -------------------------
+# Classification
+# -------------------------
+def warm_up() -> Dict[str, float]:
+    """
+    Load everything and run one document through the pipeline so the first
+    real request doesn't pay for lazy init. Returns this process's LOAD_TIMINGS.
+    """
+    ensure_loaded()
+    if "warm_up_s" not in LOAD_TIMINGS:
+        started = time.perf_counter()
+        nlp("warm up")
+        LOAD_TIMINGS["warm_up_s"] = time.perf_counter() - started
+    return dict(LOAD_TIMINGS)
+
+def classify_docs(
+    docs: list,
+    text: str,
+    attachments: List[Dict[str, Any]],
+    truncated: bool = False,
+    timings: Optional[Dict[str, float]] = None,
+) -> Dict[str, Any]:
+    started = time.perf_counter()
+    feats = features_from_docs(docs, text, attachments, truncated)
+    extracted = time.perf_counter()
+    out = score_and_explain(feats)
+    if timings is not None:
+        timings["feature_extraction"] += extracted - started
+        timings["score"] += time.perf_counter() - extracted
+    return {
+        "ok": True,
+        "classification": out["label"],
+        "score": out["score"],
+        "explanation": out["explanation"],
+    }
+
+def classify_many(
+    items: List[Tuple[str, List[Dict[str, Any]]]],
+    batch_size: int = BATCH_SIZE,
+    n_process: int = N_PROCESS,
+) -> List[Dict[str, Any]]:
+    """
+    Classify (text, attachments) pairs by streaming the texts through nlp.pipe.
+    Results come back in input order; a failing item gets {"ok": False, "error": ...}
+    instead of failing the whole batch.
+    """
+    return classify_many_timed(items, batch_size, n_process)[0]
+
+def classify_many_timed(
+    items: List[Tuple[str, List[Dict[str, Any]]]],
+    batch_size: int = BATCH_SIZE,
+    n_process: int = N_PROCESS,
+) -> Tuple[List[Dict[str, Any]], Dict[str, float]]:
+    """classify_many, plus total seconds spent per stage across the batch."""
+    ensure_loaded()
+    timings = {"nlp_parse": 0.0, "feature_extraction": 0.0, "score": 0.0}
+    results: List[Optional[Dict[str, Any]]] = [None] * len(items)
+
+    started = time.perf_counter()
+    prepared: Dict[int, Tuple[list, bool, bool]] = {}
+    for i, (text, attachments) in enumerate(items):
+        if not isinstance(text, str):
+            results[i] = {"ok": False, "error": "text must be a string"}
+        elif not isinstance(attachments, list):
+            results[i] = {"ok": False, "error": "attachments must be a list"}
+        else:
+            try:
+                prepared[i] = prepare_docs(text)
+            except Exception as e:
+                results[i] = {"ok": False, "error": str(e)}
+    timings["nlp_parse"] += time.perf_counter() - started
+
+    # Short texts and chunked long ones go through separate pipes (the short
+    # one skips short_text_disable); each yields in input order, so items are
+    # reassembled by pulling from the right stream. With n_process > 1
+    # everything shares one pipe to avoid a second worker pool.
+    pending = list(prepared)
+    if n_process > 1:
+        prepared = {i: (docs, False, truncated) for i, (docs, _, truncated) in prepared.items()}
+
+    def stream(short: bool):
+        docs = (doc for i in pending if prepared[i][1] is short for doc in prepared[i][0])
+        disable = short_text_disable if short else []
+        return iter(nlp.pipe(docs, batch_size=batch_size, n_process=n_process, disable=disable))
+
+    streams = {False: stream(False), True: stream(True)}
+
+    done = 0
+    try:
+        for i in pending:
+            unparsed, short, truncated = prepared[i]
+            started = time.perf_counter()
+            docs = [next(streams[short]) for _ in unparsed]
+            timings["nlp_parse"] += time.perf_counter() - started
+            text, attachments = items[i]
+            try:
+                results[i] = classify_docs(docs, text, attachments, truncated, timings)
+            except Exception as e:
+                results[i] = {"ok": False, "error": str(e)}
+            done += 1
+    except Exception:
+        # A pipe itself broke; finish the remaining items one by one so a
+        # single bad document only fails itself.
+        for i in pending[done:]:
+            text, attachments = items[i]
+            try:
+                started = time.perf_counter()
+                docs, truncated = parse(text)
+                timings["nlp_parse"] += time.perf_counter() - started
+                results[i] = classify_docs(docs, text, attachments, truncated, timings)
+            except Exception as e:
+                results[i] = {"ok": False, "error": str(e)}
+
+    return results, timings  # type: ignore[return-value]
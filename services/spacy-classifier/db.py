@@ -0,0 +1,310 @@
+"""
+Supabase access for the classifier: reading records/attachments and writing
+classification results back. Shared by the API (main.py) and the CLI tools.
+
+The sync supabase-py helpers serve the batch endpoints and CLIs;
+RecordStore is the async path used by the per-record webhook.
+
+Alongside each result, the raw feature dict is kept in
+record_classifier_features (one typed column per feature, keyed by record
+and FEATURES_VERSION; defined in src/db/schema.ts), so scoring changes can
+be re-applied without re-parsing any text.
+"""
+import asyncio
+import logging
+import os
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+from postgrest.exceptions import APIError
+from postgrest.types import ReturnMethod
+
+from classifier import CLASSIFIER_VERSION, FEATURES_VERSION
+
+SUPABASE_URL = os.getenv("SUPABASE_URL")
+SUPABASE_SERVICE_ROLE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
+
+if not SUPABASE_URL or not SUPABASE_SERVICE_ROLE_KEY:
+    raise RuntimeError("Missing SUPABASE_URL or SUPABASE_SERVICE_ROLE_KEY.")
+
+log = logging.getLogger(__name__)
+
+_sb = None
+
+
+def get_client():
+    """The sync supabase-py client, created on first use (importing supabase takes most of a second)."""
+    global _sb
+    if _sb is None:
+        from supabase import create_client
+
+        _sb = create_client(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY)
+    return _sb
+
+
+def now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+# -------------------------
+# Supabase
+# -------------------------
+def fetch_records(record_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    res = (
+        get_client().table("records")
+        .select("id,description")
+        .in_("id", record_ids)
+        .execute()
+    )
+    return {r["id"]: r for r in (res.data or [])}
+
+def fetch_attachments_for(record_ids: List[str]) -> Dict[str, List[Dict[str, Any]]]:
+    grouped: Dict[str, List[Dict[str, Any]]] = {}
+    try:
+        res = (
+            get_client().table("record_attachments")
+            .select("id,record_id,path,mime_type,label,size_bytes,created_at")
+            .in_("record_id", record_ids)
+            .execute()
+        )
+    except Exception:
+        return grouped
+    for row in res.data or []:
+        grouped.setdefault(row["record_id"], []).append(row)
+    return grouped
+
+def ai_result_payload(label: str, score: float, explanation: Dict[str, Any]) -> Dict[str, Any]:
+    record_type = (
+        "evidence" if label == "Anonymity Granted"
+        else "opinion" if label == "Anonymity Not Granted"
+        else "unclear"
+    )
+    return {
+        "record_type": record_type,
+        "anonymity_status": label,
+        "ai_vendor_1_result": f"{label} ({CLASSIFIER_VERSION})",
+        "ai_vendor_1_score": score,
+        "ai_vendor_2_result": explanation.get("summary", ""),
+        "ai_completed_at": now_iso(),
+    }
+
+def update_record_ai(record_id: str, label: str, score: float, explanation: Dict[str, Any]) -> bool:
+    payload = ai_result_payload(label, score, explanation)
+    try:
+        get_client().table("records").update(payload).eq("id", record_id).execute()
+        return True
+    except Exception:
+        return False
+
+
+# -------------------------
+# Feature store
+# -------------------------
+FEATURE_TABLE = "record_classifier_features"
+
+# Columns of FEATURE_TABLE, in the order compute_features returns them
+FEATURE_COLUMNS = (
+    "word_count",
+    "sentence_count",
+    "evidence_hits",
+    "opinion_hits",
+    "vague_hits",
+    "has_dates",
+    "has_money",
+    "has_org",
+    "has_person",
+    "has_url",
+    "has_named_entities",
+    "entity_count",
+    "id_hits",
+    "accusation_count",
+    "attachment_count",
+    "first_person_experience",
+)
+
+def feature_row(record_id: str, features: Dict[str, Any]) -> Dict[str, Any]:
+    row = {"record_id": record_id, "features_version": FEATURES_VERSION}
+    row.update((c, features[c]) for c in FEATURE_COLUMNS)
+    row["truncated"] = bool(features.get("truncated"))
+    row["computed_at"] = now_iso()
+    return row
+
+def features_from_row(row: Dict[str, Any]) -> Dict[str, Any]:
+    """Inverse of feature_row: the dict compute_features produced."""
+    features = {c: row[c] for c in FEATURE_COLUMNS}
+    if row.get("truncated"):
+        features["truncated"] = True
+    return features
+
+def store_features(rows: List[Dict[str, Any]]) -> int:
+    """Upsert feature_row()s in one request. Best effort: returns 0 on failure."""
+    if not rows:
+        return 0
+    try:
+        get_client().table(FEATURE_TABLE).upsert(
+            rows, on_conflict="record_id,features_version", returning=ReturnMethod.minimal
+        ).execute()
+        return len(rows)
+    except Exception:
+        return 0
+
+def fetch_features_page(after_id: Optional[str], limit: int, version: str = FEATURES_VERSION) -> List[Dict[str, Any]]:
+    """One keyset page of stored feature rows for `version`, ordered by record_id."""
+    q = (
+        get_client().table(FEATURE_TABLE)
+        .select("record_id,truncated," + ",".join(FEATURE_COLUMNS))
+        .eq("features_version", version)
+        .order("record_id")
+        .limit(limit)
+    )
+    if after_id:
+        q = q.gt("record_id", after_id)
+    return q.execute().data or []
+
+
+# -------------------------
+# Bulk (re-score CLI)
+# -------------------------
+def fetch_records_page(after_id: Optional[str], limit: int, stale_only: bool = False) -> List[Dict[str, Any]]:
+    """One keyset page of records ordered by id, starting after `after_id`."""
+    q = get_client().table("records").select("id,description").order("id").limit(limit)
+    if after_id:
+        q = q.gt("id", after_id)
+    if stale_only:
+        q = q.or_(f"ai_vendor_1_result.is.null,ai_vendor_1_result.not.like.*{CLASSIFIER_VERSION}*")
+    return q.execute().data or []
+
+# Set to False the first time the RPC is missing, so later pages go straight
+# to per-row updates.
+_bulk_rpc_available = True
+
+def apply_results(rows: List[Dict[str, Any]]) -> int:
+    """
+    Write many classification results in one round trip via the
+    apply_classifier_results RPC (see README.md, "Database setup"). Each row
+    is {"id": ..., **ai_result_payload(...)}. Falls back to one update per
+    row when the function isn't installed. Returns the number of rows written.
+    """
+    global _bulk_rpc_available
+    if not rows:
+        return 0
+    if _bulk_rpc_available:
+        try:
+            res = get_client().rpc("apply_classifier_results", {"results": rows}).execute()
+            return int(res.data or 0)
+        except APIError as e:
+            if e.code != "PGRST202":  # function not found
+                raise
+            log.warning("apply_classifier_results is not installed; writing results one row at a time (see README.md)")
+            _bulk_rpc_available = False
+
+    written = 0
+    for row in rows:
+        payload = {k: v for k, v in row.items() if k != "id"}
+        try:
+            get_client().table("records").update(payload).eq("id", row["id"]).execute()
+            written += 1
+        except Exception:
+            pass
+    return written
+
+
+# -------------------------
+# Async (webhook)
+# -------------------------
+RECORD_SELECT = "id,description,anonymity_status,ai_vendor_1_result,ai_vendor_1_score"
+
+class RecordStore:
+    """
+    PostgREST over one pooled, keep-alive httpx.AsyncClient.
+
+    The webhook needs the record, its attachments and a write: one GET that
+    embeds record_attachments, then a PATCH only when the result differs
+    from what is already stored (sent together with the feature upsert).
+    """
+
+    def __init__(self, url: str, key: str, timeout_s: float = 10.0, max_connections: int = 20):
+        self._client = httpx.AsyncClient(
+            base_url=f"{url.rstrip('/')}/rest/v1",
+            headers={"apikey": key, "Authorization": f"Bearer {key}"},
+            timeout=timeout_s,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        )
+        self._embed_attachments = True
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+    async def fetch_record_with_attachments(self, record_id: str) -> Optional[Dict[str, Any]]:
+        """The record plus an "attachments" list, or None if it doesn't exist."""
+        if self._embed_attachments:
+            res = await self._client.get(
+                "/records",
+                params={"id": f"eq.{record_id}", "select": f"{RECORD_SELECT},record_attachments(id,mime_type)"},
+            )
+            if res.status_code == 400 and res.json().get("code") == "PGRST200":
+                # No FK relationship PostgREST can embed through; use two reads.
+                self._embed_attachments = False
+            else:
+                res.raise_for_status()
+                rows = res.json()
+                if not rows:
+                    return None
+                record = rows[0]
+                record["attachments"] = record.pop("record_attachments", None) or []
+                return record
+
+        record_res, attachments_res = await asyncio.gather(
+            self._client.get("/records", params={"id": f"eq.{record_id}", "select": RECORD_SELECT}),
+            self._client.get("/record_attachments", params={"record_id": f"eq.{record_id}", "select": "id,mime_type"}),
+        )
+        record_res.raise_for_status()
+        rows = record_res.json()
+        if not rows:
+            return None
+        record = rows[0]
+        record["attachments"] = attachments_res.json() if attachments_res.status_code == 200 else []
+        return record
+
+    async def write_result_if_changed(
+        self, record: Dict[str, Any], label: str, score: float, explanation: Dict[str, Any]
+    ) -> Tuple[bool, bool]:
+        """
+        Returns (up_to_date, written). Skips the PATCH when the stored label,
+        version tag and score already match, so duplicate deliveries cost no
+        write. The PATCH itself is idempotent. When explanation carries
+        features they are upserted into the feature store either way
+        (concurrently with the PATCH), so already-classified records fill it too.
+        """
+        payload = ai_result_payload(label, score, explanation)
+        stored_score = record.get("ai_vendor_1_score")
+        unchanged = (
+            record.get("anonymity_status") == payload["anonymity_status"]
+            and record.get("ai_vendor_1_result") == payload["ai_vendor_1_result"]
+            and stored_score is not None
+            and abs(float(stored_score) - score) < 1e-6
+        )
+        writes = []
+        if not unchanged:
+            writes.append(self._client.patch(
+                "/records",
+                params={"id": f"eq.{record['id']}"},
+                json=payload,
+                headers={"Prefer": "return=minimal"},
+            ))
+        if "features" in explanation:
+            writes.append(self._client.post(
+                f"/{FEATURE_TABLE}",
+                params={"on_conflict": "record_id,features_version"},
+                json=feature_row(record["id"], explanation["features"]),
+                headers={"Prefer": "resolution=merge-duplicates,return=minimal"},
+            ))
+        # The feature row is best effort; only the record PATCH decides the result.
+        results = await asyncio.gather(*writes, return_exceptions=True)
+        if unchanged:
+            return True, False
+        res = results[0]
+        if isinstance(res, BaseException) or res.is_error:
+            return False, False
+        return True, True
@@ -0,0 +1,59 @@
+"""
+Pre-fork deployment: gunicorn imports main.py and warms the spaCy model once
+in the master, then forks WEB_CONCURRENCY uvicorn workers that share the
+model's pages copy-on-write instead of each loading their own.
+
+    gunicorn -c gunicorn.conf.py main:app
+    python procmem.py                 # RSS / PSS / USS of the master and each worker
+
+Readiness is delayed under this mode: the master binds the port and then
+loads the model before forking, so nothing answers /health or /ready until
+the load is done (connections wait in the listen backlog). The
+"healthy while loading" behaviour of main.py only applies under plain
+uvicorn. A worker that crashes or is restarted leaves the job it claimed
+"running"; it is claimed again once its lease (JOB_LEASE_S) runs out.
+
+Keep INFERENCE_EXECUTOR=thread here: a process executor would spawn fresh
+interpreters per worker that load the model again. SQLite-backed state
+(FEATURE_CACHE_DB, JOB_QUEUE_DB) is shared by all workers on the host.
+"""
+import gc
+import os
+import time
+
+bind = f"0.0.0.0:{os.getenv('PORT', '10000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", str(os.cpu_count() or 1)))
+worker_class = "uvicorn_worker.UvicornWorker"
+preload_app = True
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = 30
+pidfile = os.getenv("GUNICORN_PIDFILE", "/tmp/dnounce-classifier.pid")
+
+
+def when_ready(server):
+    """Runs in the master after the app is imported and before any worker is forked."""
+    import classifier
+    from procmem import memory_usage
+
+    started = time.perf_counter()
+    timings = classifier.warm_up()
+    # Move everything loaded so far out of the collector's generations, so
+    # GC passes in the workers don't write to (and so copy) the shared pages.
+    gc.collect()
+    gc.freeze()
+    rss_mb = memory_usage().get("rss", 0) / 2 ** 20
+    server.log.info(
+        f"Model warmed in master in {time.perf_counter() - started:.2f}s "
+        f"({', '.join(f'{k}={v:.2f}' for k, v in timings.items())}); master RSS {rss_mb:.0f} MB; "
+        f"forking {workers} workers"
+    )
+
+
+def post_worker_init(worker):
+    from procmem import memory_usage
+
+    mem = memory_usage()
+    worker.log.info(
+        f"Worker {worker.pid} up: RSS {mem.get('rss', 0) / 2 ** 20:.0f} MB, "
+        f"shared {mem.get('shared', 0) / 2 ** 20:.0f} MB, private {mem.get('uss', 0) / 2 ** 20:.0f} MB"
+    )
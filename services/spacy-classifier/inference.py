@@ -0,0 +1,124 @@
+"""
+Bounded executor for CPU-bound inference.
+
+spaCy parses are pure CPU work; running them directly inside `async def`
+handlers blocks the event loop (and /health) for the whole parse. Work is
+handed to a thread or process pool instead, with a hard cap on queued work
+so bursts get a 429 + Retry-After rather than unbounded latency.
+"""
+import asyncio
+import math
+import multiprocessing
+import threading
+import time
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+
+class QueueFull(Exception):
+    def __init__(self, retry_after: int):
+        super().__init__(f"Inference queue is full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class InferenceExecutor:
+    """
+    kind="thread": a thread pool sharing the already-loaded model.
+    kind="process": a process pool; each worker imports the model and runs
+    `initializer` once at start, so requests never pay the load cost.
+
+    At most `workers + queue_size` tasks are admitted at a time. A task keeps
+    its slot until it actually finishes, even if the caller timed out, so the
+    bound reflects real pool load.
+    """
+
+    def __init__(
+        self,
+        kind: str = "thread",
+        workers: int = 1,
+        queue_size: int = 64,
+        timeout_s: float = 30.0,
+        initializer: Optional[Callable[[], None]] = None,
+    ):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Unknown inference executor kind: {kind!r}")
+        self.kind = kind
+        self.workers = max(1, workers)
+        self.queue_size = max(0, queue_size)
+        self.timeout_s = timeout_s
+        self.initializer = initializer
+
+        self._pool: Optional[Executor] = None
+        self._lock = threading.Lock()
+        self._inflight = 0
+        self._avg_task_s = 0.0  # EWMA of submit-to-done time, used for Retry-After
+
+    @property
+    def capacity(self) -> int:
+        return self.workers + self.queue_size
+
+    @property
+    def inflight(self) -> int:
+        return self._inflight
+
+    def start(self) -> None:
+        if self._pool is not None:
+            return
+        if self.kind == "process":
+            # spawn, not fork: the parent already runs an event loop and threads.
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=self.initializer,
+            )
+        else:
+            self._pool = ThreadPoolExecutor(
+                max_workers=self.workers,
+                thread_name_prefix="inference",
+                initializer=self.initializer,
+            )
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def retry_after(self) -> int:
+        backlog = max(1, self._inflight - self.workers + 1)
+        return max(1, math.ceil(self._avg_task_s * backlog / self.workers))
+
+    def _admit(self) -> None:
+        with self._lock:
+            if self._inflight >= self.capacity:
+                raise QueueFull(self.retry_after())
+            self._inflight += 1
+
+    def _release(self, started: float) -> None:
+        elapsed = time.monotonic() - started
+        with self._lock:
+            self._inflight -= 1
+            self._avg_task_s = elapsed if self._avg_task_s == 0.0 else 0.8 * self._avg_task_s + 0.2 * elapsed
+
+    async def run(self, fn: Callable[..., Any], *args: Any, timeout: Optional[float] = None) -> Any:
+        """
+        Run fn(*args) on the pool. Raises QueueFull when the pool is saturated
+        and TimeoutError when the result isn't ready within the timeout.
+        """
+        if self._pool is None:
+            self.start()
+        self._admit()
+        started = time.monotonic()
+        try:
+            fut: Future = self._pool.submit(fn, *args)
+        except BaseException:
+            self._release(started)
+            raise
+        fut.add_done_callback(lambda _: self._release(started))
+
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(fut), timeout or self.timeout_s)
+        except asyncio.TimeoutError:
+            # A queued task is dropped; one that is already running finishes in
+            # the background and frees its slot when done.
+            fut.cancel()
+            raise TimeoutError(f"Inference did not finish within {timeout or self.timeout_s}s")
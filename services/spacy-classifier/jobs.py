@@ -0,0 +1,214 @@
+"""
+Durable queue of record ids waiting to be classified.
+
+The webhook can hand a record id to this queue and answer 202 straight away;
+background workers in main.py drain it. State lives in one SQLite file, so
+queued work survives a restart of the process (not a redeploy onto a fresh
+disk).
+
+- One row per record id: enqueueing an id that is already queued is a no-op,
+  and an id that is being worked on is marked to run once more afterwards
+  (the record may have changed since the worker read it).
+- A failed attempt is retried with exponential backoff until max_attempts,
+  then the row is kept as "failed" for inspection.
+- Rows left "running" by a crashed process are requeued on open. A claim
+  also holds a lease of `lease_s`: a running job whose worker died (a
+  gunicorn worker restart, say, while the others keep going) is claimed
+  again once its lease runs out. Writes are idempotent, so a job that
+  simply outlives its lease at worst runs twice.
+"""
+import os
+import random
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+
+class JobQueue:
+    def __init__(
+        self,
+        path: str,
+        max_attempts: int = 8,
+        backoff_base_s: float = 2.0,
+        backoff_max_s: float = 600.0,
+        lease_s: float = 300.0,
+    ):
+        self.path = path
+        self.max_attempts = max_attempts
+        self.lease_s = lease_s
+        self.backoff_base_s = backoff_base_s
+        self.backoff_max_s = backoff_max_s
+
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self._inherited = []
+        self._db = self._open()
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "record_id TEXT PRIMARY KEY, "
+            "state TEXT NOT NULL, "  # queued | running | failed
+            "enqueued_at REAL NOT NULL, "
+            "available_at REAL NOT NULL, "
+            "attempts INTEGER NOT NULL DEFAULT 0, "
+            "rerun INTEGER NOT NULL DEFAULT 0, "
+            "last_error TEXT)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS jobs_state_available ON jobs (state, available_at)")
+        self._db.execute("UPDATE jobs SET state = 'queued', available_at = ? WHERE state = 'running'", (time.time(),))
+
+        self.enqueued = 0
+        self.deduplicated = 0
+        self.succeeded = 0
+        self.retried = 0
+        self.failed = 0
+
+    def _open(self) -> sqlite3.Connection:
+        db = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+    def _after_fork(self) -> None:
+        # An SQLite connection must not be used across fork(). Pre-fork workers
+        # open their own (claims stay atomic across processes); the inherited
+        # one is kept referenced but unused.
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._inherited.append(self._db)
+            self._db = self._open()
+
+    @contextmanager
+    def _write_transaction(self):
+        """Read-then-write under SQLite's write lock, so other processes sharing the file can't interleave."""
+        self._after_fork()
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self._db.execute("ROLLBACK")
+            raise
+        self._db.execute("COMMIT")
+
+    def enqueue(self, record_id: str) -> bool:
+        """Returns False when the id was already waiting (deduplicated)."""
+        now = time.time()
+        with self._lock, self._write_transaction():
+            row = self._db.execute("SELECT state FROM jobs WHERE record_id = ?", (record_id,)).fetchone()
+            if row is None:
+                self._db.execute(
+                    "INSERT INTO jobs (record_id, state, enqueued_at, available_at) VALUES (?, 'queued', ?, ?)",
+                    (record_id, now, now),
+                )
+                self.enqueued += 1
+                return True
+            if row[0] == "running":
+                self._db.execute("UPDATE jobs SET rerun = 1 WHERE record_id = ?", (record_id,))
+            elif row[0] == "failed":
+                # A new delivery for a dead job starts it over.
+                self._db.execute(
+                    "UPDATE jobs SET state = 'queued', enqueued_at = ?, available_at = ?, attempts = 0, "
+                    "last_error = NULL WHERE record_id = ?",
+                    (now, now, record_id),
+                )
+                self.enqueued += 1
+                return True
+            self.deduplicated += 1
+            return False
+
+    def claim(self) -> Optional[Dict[str, Any]]:
+        """Take the oldest job that is due (or running past its lease), or None."""
+        now = time.time()
+        with self._lock:
+            self._after_fork()
+            # While running, available_at is when the lease runs out
+            row = self._db.execute(
+                "UPDATE jobs SET state = 'running', attempts = attempts + 1, available_at = ? "
+                "WHERE record_id = ("
+                "  SELECT record_id FROM jobs WHERE state IN ('queued', 'running') AND available_at <= ? "
+                "  ORDER BY available_at LIMIT 1"
+                ") RETURNING record_id, enqueued_at, attempts",
+                (now + self.lease_s, now),
+            ).fetchone()
+        if row is None:
+            return None
+        return {"record_id": row[0], "enqueued_at": row[1], "attempts": row[2]}
+
+    def complete(self, record_id: str) -> None:
+        with self._lock, self._write_transaction():
+            self.succeeded += 1
+            row = self._db.execute("SELECT rerun FROM jobs WHERE record_id = ?", (record_id,)).fetchone()
+            if row and row[0]:
+                now = time.time()
+                self._db.execute(
+                    "UPDATE jobs SET state = 'queued', rerun = 0, attempts = 0, last_error = NULL, "
+                    "enqueued_at = ?, available_at = ? WHERE record_id = ?",
+                    (now, now, record_id),
+                )
+            else:
+                self._db.execute("DELETE FROM jobs WHERE record_id = ?", (record_id,))
+
+    def fail(self, record_id: str, attempts: int, error: str) -> float:
+        """Schedule a retry (returns the delay) or, past max_attempts, park the job as failed (returns -1)."""
+        with self._lock:
+            self._after_fork()
+            if attempts >= self.max_attempts:
+                self.failed += 1
+                self._db.execute(
+                    "UPDATE jobs SET state = 'failed', rerun = 0, last_error = ? WHERE record_id = ?",
+                    (error, record_id),
+                )
+                return -1.0
+            self.retried += 1
+            # Full jitter, so a Supabase blip doesn't make every job retry in lockstep.
+            delay = random.uniform(0, min(self.backoff_max_s, self.backoff_base_s * 2 ** (attempts - 1)))
+            self._db.execute(
+                "UPDATE jobs SET state = 'queued', available_at = ?, last_error = ? WHERE record_id = ?",
+                (time.time() + delay, error, record_id),
+            )
+            return delay
+
+    def next_due_in(self) -> Optional[float]:
+        """Seconds until the next queued job is due (0 if one is due now), None if nothing is queued."""
+        with self._lock:
+            self._after_fork()
+            row = self._db.execute("SELECT MIN(available_at) FROM jobs WHERE state = 'queued'").fetchone()
+        if row[0] is None:
+            return None
+        return max(0.0, row[0] - time.time())
+
+    def failed_jobs(self, limit: int = 50) -> List[Dict[str, Any]]:
+        with self._lock:
+            self._after_fork()
+            rows = self._db.execute(
+                "SELECT record_id, attempts, last_error, enqueued_at FROM jobs WHERE state = 'failed' "
+                "ORDER BY enqueued_at LIMIT ?",
+                (limit,),
+            ).fetchall()
+        return [{"record_id": r[0], "attempts": r[1], "last_error": r[2], "enqueued_at": r[3]} for r in rows]
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.time()
+        with self._lock:
+            self._after_fork()
+            depth = dict(self._db.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall())
+            oldest = self._db.execute("SELECT MIN(enqueued_at) FROM jobs WHERE state != 'failed'").fetchone()[0]
+            return {
+                "queued": depth.get("queued", 0),
+                "running": depth.get("running", 0),
+                "failed": depth.get("failed", 0),
+                "lag_s": now - oldest if oldest is not None else 0.0,
+                "enqueued": self.enqueued,
+                "deduplicated": self.deduplicated,
+                "succeeded": self.succeeded,
+                "retried": self.retried,
+                "failed_total": self.failed,
+                "max_attempts": self.max_attempts,
+                "path": self.path,
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            self._after_fork()
+            self._db.close()
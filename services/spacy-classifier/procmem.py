@@ -0,0 +1,87 @@
+"""
+Per-process memory from /proc, for checking how much of the model the
+pre-fork workers actually share (see gunicorn.conf.py).
+
+RSS counts shared pages in full for every process, so summing worker RSS
+overstates the total. PSS splits each shared page between the processes
+mapping it (the sum across processes is real usage), and USS is what a
+process alone holds and would free on exit.
+
+    python procmem.py [MASTER_PID ...]    # default: the pid in GUNICORN_PIDFILE
+"""
+import os
+import sys
+from typing import Dict, List, Optional
+
+PIDFILE = os.getenv("GUNICORN_PIDFILE", "/tmp/dnounce-classifier.pid")
+
+FIELDS = {
+    "Rss": "rss",
+    "Pss": "pss",
+    "Shared_Clean": "shared_clean",
+    "Shared_Dirty": "shared_dirty",
+    "Private_Clean": "private_clean",
+    "Private_Dirty": "private_dirty",
+}
+
+
+def memory_usage(pid: Optional[int] = None) -> Dict[str, int]:
+    """Bytes of rss, pss, uss, shared and private memory for `pid` (default: this process); {} if unavailable."""
+    pid = pid or os.getpid()
+    out: Dict[str, int] = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup", encoding="ascii") as f:
+            for line in f:
+                key, _, rest = line.partition(":")
+                if key in FIELDS:
+                    out[FIELDS[key]] = int(rest.split()[0]) * 1024
+    except (OSError, ValueError, IndexError):
+        return out
+    if out:
+        out["uss"] = out.get("private_clean", 0) + out.get("private_dirty", 0)
+        out["shared"] = out.get("shared_clean", 0) + out.get("shared_dirty", 0)
+    return out
+
+
+def child_pids(pid: int) -> List[int]:
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children", encoding="ascii") as f:
+            return [int(p) for p in f.read().split()]
+    except (OSError, ValueError):
+        return []
+
+
+def worker_report(master_pid: int) -> Dict[str, object]:
+    """Memory of a pre-fork master and each of its workers, plus totals."""
+    master = {"pid": master_pid, **memory_usage(master_pid)}
+    workers = [{"pid": pid, **memory_usage(pid)} for pid in child_pids(master_pid)]
+    everyone = [master] + workers
+    return {
+        "master": master,
+        "workers": workers,
+        "total_rss": sum(p.get("rss", 0) for p in everyone),
+        "total_pss": sum(p.get("pss", 0) for p in everyone),
+    }
+
+
+def main(argv: List[str]) -> int:
+    pids = [int(a) for a in argv]
+    if not pids:
+        try:
+            with open(PIDFILE, encoding="ascii") as f:
+                pids = [int(f.read().strip())]
+        except (OSError, ValueError):
+            print(f"No master pid given and none readable from {PIDFILE}", file=sys.stderr)
+            return 2
+    for master_pid in pids:
+        report = worker_report(master_pid)
+        print(f"{'pid':>8} {'role':<7} {'RSS MB':>9} {'PSS MB':>9} {'USS MB':>9} {'shared MB':>10}")
+        for role, proc in [("master", report["master"])] + [("worker", w) for w in report["workers"]]:
+            mb = {k: proc.get(k, 0) / 2 ** 20 for k in ("rss", "pss", "uss", "shared")}
+            print(f"{proc['pid']:>8} {role:<7} {mb['rss']:>9.1f} {mb['pss']:>9.1f} {mb['uss']:>9.1f} {mb['shared']:>10.1f}")
+        print(f"total: RSS {report['total_rss'] / 2 ** 20:.1f} MB, PSS {report['total_pss'] / 2 ** 20:.1f} MB")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,197 @@
+"""
+Re-score the records backlog, e.g. after a CLASSIFIER_VERSION bump.
+
+    python rescore.py --stale-only
+    python rescore.py --stale-only --resume          # continue after a crash
+    python rescore.py --page-size 1000 --n-process 4 --dry-run
+
+Pages through `records` by keyset (id > last id), loads attachments for the
+whole page with one in_() query, classifies the page through nlp.pipe and
+writes the page back with one apply_classifier_results RPC call. After every
+page the last id is written to the checkpoint file, so --resume picks up
+where a previous run stopped.
+
+--stale-only skips records whose ai_vendor_1_result already carries the
+current CLASSIFIER_VERSION.
+
+Every page's features are also saved to record_classifier_features. After a
+change that only touches score_and_explain, re-apply the new scoring to
+those stored features without parsing any text:
+
+    python rescore.py --from-features --dry-run      # label counts only
+    python rescore.py --from-features
+
+This pages through the feature rows for FEATURES_VERSION and scores each
+page with the vectorized scorer (vector_score.py).
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from typing import Any, Dict, List, Tuple
+
+from classifier import BATCH_SIZE, CLASSIFIER_VERSION, FEATURES_VERSION, N_PROCESS, classify_many
+from db import (
+    ai_result_payload,
+    apply_results,
+    feature_row,
+    features_from_row,
+    fetch_attachments_for,
+    fetch_features_page,
+    fetch_records_page,
+    store_features,
+)
+from vector_score import explain_rows, feature_columns, score_columns
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+log = logging.getLogger("rescore")
+
+DEFAULT_CHECKPOINT = "rescore.checkpoint.json"
+
+
+def load_checkpoint(path: str) -> Dict[str, Any]:
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def save_checkpoint(path: str, state: Dict[str, Any]) -> None:
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp, path)
+
+
+def classify_page(
+    rows: List[Dict[str, Any]], batch_size: int, n_process: int
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    Returns one {"id", **payload} row per successfully classified record,
+    and the feature rows for the feature store.
+    """
+    ids = [r["id"] for r in rows]
+    attachments = fetch_attachments_for(ids)
+
+    texts = {r["id"]: (r.get("description") or "").strip() for r in rows}
+    to_classify = [rid for rid in ids if texts[rid]]
+    results = classify_many(
+        [(texts[rid], attachments.get(rid, [])) for rid in to_classify],
+        batch_size=batch_size,
+        n_process=n_process,
+    )
+    by_id = dict(zip(to_classify, results))
+
+    out, features = [], []
+    for rid in ids:
+        result = by_id.get(rid)
+        if result is None:
+            payload = ai_result_payload("Anonymity Granted", 0.3, {"summary": f"{CLASSIFIER_VERSION}: missing description"})
+        elif result["ok"]:
+            payload = ai_result_payload(result["classification"], result["score"], result["explanation"])
+            features.append(feature_row(rid, result["explanation"]["features"]))
+        else:
+            log.warning(f"{rid}: {result['error']}")
+            continue
+        out.append({"id": rid, **payload})
+    return out, features
+
+
+def score_feature_page(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Stored feature rows -> one {"id", **payload} row each, scoring only."""
+    features = [features_from_row(r) for r in rows]
+    explained = explain_rows(features, score_columns(feature_columns(features)))
+    return [
+        {"id": r["record_id"], **ai_result_payload(e["label"], e["score"], e["explanation"])}
+        for r, e in zip(rows, explained)
+    ]
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--page-size", type=int, default=500)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="nlp.pipe batch size")
+    parser.add_argument("--n-process", type=int, default=N_PROCESS, help="nlp.pipe worker processes")
+    parser.add_argument("--stale-only", action="store_true", help="only records not yet scored by CLASSIFIER_VERSION")
+    parser.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT)
+    parser.add_argument("--resume", action="store_true", help="continue after the last id in --checkpoint")
+    parser.add_argument("--limit", type=int, default=0, help="stop after this many records (0 = no limit)")
+    parser.add_argument("--dry-run", action="store_true", help="classify but don't write results")
+    parser.add_argument(
+        "--from-features", action="store_true",
+        help=f"re-score stored {FEATURES_VERSION} features instead of re-parsing descriptions",
+    )
+    args = parser.parse_args(argv)
+    if args.from_features and args.stale_only:
+        parser.error("--stale-only can't be combined with --from-features")
+
+    state: Dict[str, Any] = {"last_id": None, "processed": 0, "written": 0, "failed": 0}
+    if args.resume:
+        previous = load_checkpoint(args.checkpoint)
+        if previous.get("classifier_version") not in (None, CLASSIFIER_VERSION):
+            log.warning(f"Checkpoint was written by {previous['classifier_version']}, now running {CLASSIFIER_VERSION}")
+        if previous.get("from_features", False) != args.from_features:
+            parser.error("--resume checkpoint was written by a different mode (--from-features)")
+        state.update({k: previous[k] for k in state if k in previous})
+        log.info(f"Resuming after id {state['last_id']} ({state['processed']} records already processed)")
+    state["classifier_version"] = CLASSIFIER_VERSION
+    state["stale_only"] = args.stale_only
+    state["from_features"] = args.from_features
+    labels: Dict[str, int] = {}
+
+    started = time.monotonic()
+    processed_this_run = 0
+    while True:
+        page_size = args.page_size
+        if args.limit:
+            page_size = min(page_size, args.limit - processed_this_run)
+            if page_size <= 0:
+                break
+
+        if args.from_features:
+            rows = fetch_features_page(state["last_id"], page_size)
+            if not rows:
+                break
+            results, features = score_feature_page(rows), []
+            last_id = rows[-1]["record_id"]
+        else:
+            rows = fetch_records_page(state["last_id"], page_size, stale_only=args.stale_only)
+            if not rows:
+                break
+            results, features = classify_page(rows, args.batch_size, args.n_process)
+            last_id = rows[-1]["id"]
+
+        for r in results:
+            labels[r["anonymity_status"]] = labels.get(r["anonymity_status"], 0) + 1
+        if args.dry_run:
+            written = len(results)
+        else:
+            written = apply_results(results)
+            store_features(features)
+
+        processed_this_run += len(rows)
+        state["last_id"] = last_id
+        state["processed"] += len(rows)
+        state["written"] += written
+        state["failed"] += len(rows) - written
+        if not args.dry_run:
+            save_checkpoint(args.checkpoint, state)
+
+        elapsed = time.monotonic() - started
+        log.info(
+            f"{state['processed']} processed ({processed_this_run / elapsed:.1f} records/s), "
+            f"{state['written']} written, {state['failed']} failed, last id {state['last_id']}"
+        )
+        if len(rows) < page_size:
+            break
+
+    log.info(f"Done: {processed_this_run} records this run in {time.monotonic() - started:.1f}s")
+    log.info("Labels this run: " + (", ".join(f"{k}={v}" for k, v in sorted(labels.items())) or "none"))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
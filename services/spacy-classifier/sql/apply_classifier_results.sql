@@ -0,0 +1,40 @@
+-- Bulk write-back for the spaCy classifier's re-score CLI and batch webhook
+-- (services/spacy-classifier: db.apply_results).
+--
+-- drizzle-kit push (src/db/schema.ts) does not manage functions, so this is
+-- applied by hand, once per database and again after any change here:
+--   psql "$SUPABASE_DB_URL" -f services/spacy-classifier/sql/apply_classifier_results.sql
+-- See services/spacy-classifier/README.md.
+--
+-- PostgREST can only bulk-update rows with different values through an
+-- upsert, and an upsert of partial rows trips NOT NULL checks on records
+-- before ON CONFLICT is considered. This applies a whole page of results in
+-- one statement instead.
+--
+-- results: [{"id": uuid, "record_type": ..., "anonymity_status": ...,
+--            "ai_vendor_1_result": ..., "ai_vendor_1_score": ...,
+--            "ai_vendor_2_result": ..., "ai_completed_at": ...}, ...]
+-- Columns are cast through jsonb_populate_record so their types come from
+-- the records table itself.
+
+create or replace function public.apply_classifier_results(results jsonb)
+returns integer
+language sql
+security definer
+set search_path = public
+as $$
+  with updated as (
+    update public.records r
+    set (record_type, anonymity_status, ai_vendor_1_result, ai_vendor_1_score, ai_vendor_2_result, ai_completed_at) = (
+      select p.record_type, p.anonymity_status, p.ai_vendor_1_result, p.ai_vendor_1_score, p.ai_vendor_2_result, p.ai_completed_at
+      from jsonb_populate_record(r, x.value) p
+    )
+    from jsonb_array_elements(results) x
+    where r.id = (x.value ->> 'id')::uuid
+    returning 1
+  )
+  select count(*)::integer from updated;
+$$;
+
+revoke all on function public.apply_classifier_results(jsonb) from public, anon, authenticated;
+grant execute on function public.apply_classifier_results(jsonb) to service_role;
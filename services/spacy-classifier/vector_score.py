@@ -0,0 +1,157 @@
+"""
+Columnar version of classifier.score_and_explain for scoring many stored
+feature rows at once (backlog re-scores, threshold tuning).
+
+Every intermediate is computed with the same float64 operations in the same
+order as the scalar function, so results match it bit for bit; keep the two
+in step (`python bench.py scorer` checks parity). Labels come back as a
+boolean `not_granted` array plus the label strings.
+"""
+from typing import Any, Dict, Iterable, List, Mapping
+
+import numpy as np
+
+from classifier import CLASSIFIER_VERSION
+
+LABEL_GRANTED = "Anonymity Granted"
+LABEL_NOT_GRANTED = "Anonymity Not Granted"
+
+# The features score_and_explain reads
+SCORED_FEATURES = (
+    "word_count",
+    "evidence_hits",
+    "opinion_hits",
+    "vague_hits",
+    "has_dates",
+    "has_money",
+    "has_url",
+    "has_named_entities",
+    "id_hits",
+    "accusation_count",
+    "attachment_count",
+    "first_person_experience",
+)
+
+Columns = Dict[str, np.ndarray]
+
+
+def feature_columns(rows: Iterable[Mapping[str, Any]]) -> Columns:
+    """Feature dicts -> one float64 array per scored feature."""
+    rows = list(rows)
+    return {
+        name: np.fromiter((float(r[name]) for r in rows), dtype=np.float64, count=len(rows))
+        for name in SCORED_FEATURES
+    }
+
+
+def clamp01(x: np.ndarray) -> np.ndarray:
+    return np.maximum(0.0, np.minimum(1.0, x))
+
+
+def score_columns(cols: Mapping[str, np.ndarray]) -> Columns:
+    """
+    Score N records given as a dict of arrays (or a structured array) keyed
+    by SCORED_FEATURES. Returns every intermediate score plus the label.
+    """
+    wc = np.asarray(cols["word_count"], dtype=np.float64)
+    ev = np.asarray(cols["evidence_hits"], dtype=np.float64)
+    op = np.asarray(cols["opinion_hits"], dtype=np.float64)
+    vague = np.asarray(cols["vague_hits"], dtype=np.float64)
+    dates = np.where(np.asarray(cols["has_dates"], dtype=bool), 1.0, 0.0)
+    money = np.where(np.asarray(cols["has_money"], dtype=bool), 1.0, 0.0)
+    url = np.where(np.asarray(cols["has_url"], dtype=bool), 1.0, 0.0)
+    ents = np.where(np.asarray(cols["has_named_entities"], dtype=bool), 1.0, 0.0)
+    ids = clamp01(np.asarray(cols["id_hits"], dtype=np.float64) / 2.0)
+    acc = clamp01(np.asarray(cols["accusation_count"], dtype=np.float64) / 3.0)
+    attach = clamp01(np.asarray(cols["attachment_count"], dtype=np.float64) / 2.0)
+    fpe = clamp01(np.asarray(cols["first_person_experience"], dtype=np.float64) / 3.0)
+
+    anchors = clamp01(
+        0.26 * clamp01(ev / 4.0) +
+        0.20 * dates +
+        0.18 * money +
+        0.10 * ents +
+        0.10 * ids +
+        0.08 * url +
+        0.08 * attach
+    )
+
+    raw_opinion = clamp01(
+        0.45 * fpe +
+        0.35 * clamp01(op / 3.0) +
+        0.20 * clamp01(acc * (1.0 - 0.6 * anchors))
+    )
+    effective_opinion = clamp01(raw_opinion * (1.0 - 0.70 * anchors))
+
+    vague_penalty = clamp01(vague / 3.0)
+    length_penalty = np.where(wc < 20, 0.8, np.where(wc < 40, 0.4, 0.0))
+
+    evidence_score = clamp01(anchors - (0.2 * vague_penalty) - (0.1 * length_penalty))
+    opinion_score = clamp01(effective_opinion - (0.15 * vague_penalty))
+    unable_score = clamp01(
+        0.40 * vague_penalty +
+        0.35 * length_penalty +
+        0.25 * (1.0 - np.maximum(anchors, effective_opinion))
+    )
+
+    evidence_wins = (evidence_score >= 0.55) & (evidence_score > opinion_score)
+    not_granted = ~evidence_wins & (opinion_score >= 0.40) & (anchors <= 0.30) & (opinion_score > unable_score)
+    final = np.where(
+        evidence_wins, evidence_score, np.where(not_granted, opinion_score, clamp01(unable_score + 0.1))
+    )
+
+    return {
+        "anchors": anchors,
+        "raw_opinion": raw_opinion,
+        "effective_opinion": effective_opinion,
+        "vague_penalty": vague_penalty,
+        "length_penalty": length_penalty,
+        "evidence_score": evidence_score,
+        "opinion_score": opinion_score,
+        "unable_score": unable_score,
+        "final_score": final,
+        "not_granted": not_granted,
+        "label": np.where(not_granted, LABEL_NOT_GRANTED, LABEL_GRANTED),
+    }
+
+
+def explain_rows(rows: List[Mapping[str, Any]], scored: Columns) -> List[Dict[str, Any]]:
+    """
+    score_and_explain-shaped results for each row, built from score_columns
+    output. Formatting the summaries is per-row Python, so only call this
+    for rows that are actually written back.
+    """
+    out = []
+    for i, f in enumerate(rows):
+        label = str(scored["label"][i])
+        final = float(scored["final_score"][i])
+        anchors = float(scored["anchors"][i])
+        evidence_score = float(scored["evidence_score"][i])
+        opinion_score = float(scored["opinion_score"][i])
+        unable_score = float(scored["unable_score"][i])
+        summary = (
+            f"{CLASSIFIER_VERSION}: label={label} score={final:.2f} "
+            f"(anchors={anchors:.2f} evidence_score={evidence_score:.2f} "
+            f"opinion_score={opinion_score:.2f} unable_score={unable_score:.2f}) "
+            f"| ev={f['evidence_hits']} op={f['opinion_hits']} vague={f['vague_hits']} "
+            f"fpe={f['first_person_experience']} "
+            f"dates={int(bool(f['has_dates']))} money={int(bool(f['has_money']))} "
+            f"ents={int(bool(f['has_named_entities']))} "
+            f"ids={f['id_hits']} attach={f['attachment_count']} wc={f['word_count']}"
+        )
+        out.append({
+            "label": label,
+            "score": final,
+            "explanation": {
+                "classifier_version": CLASSIFIER_VERSION,
+                "label": label,
+                "final_score": final,
+                "anchors": anchors,
+                "evidence_score": evidence_score,
+                "opinion_score": opinion_score,
+                "unable_score": unable_score,
+                "summary": summary,
+                "features": dict(f),
+            },
+        })
+    return out
@@ -1,5 +1,5 @@
 import {
-  pgTable, text, timestamp, uuid, boolean, jsonb, primaryKey, bigint, bigserial,
+  pgTable, text, timestamp, uuid, boolean, jsonb, primaryKey, bigint, bigserial, integer, index,
 } from 'drizzle-orm/pg-core';
 
 /** PROFILES */
@@ -90,6 +90,38 @@ export const records = pgTable('records', {
   updatedAt: timestamp('updated_at', { withTimezone: true }).defaultNow().notNull(),
 });
 
+/** RECORD CLASSIFIER FEATURES (raw spaCy features behind each result; services/spacy-classifier) */
+export const recordClassifierFeatures = pgTable(
+  'record_classifier_features',
+  {
+    recordId: uuid('record_id').notNull().references(() => records.id, { onDelete: 'cascade' }),
+    featuresVersion: text('features_version').notNull(),
+    wordCount: integer('word_count').notNull(),
+    sentenceCount: integer('sentence_count').notNull(),
+    evidenceHits: integer('evidence_hits').notNull(),
+    opinionHits: integer('opinion_hits').notNull(),
+    vagueHits: integer('vague_hits').notNull(),
+    hasDates: boolean('has_dates').notNull(),
+    hasMoney: boolean('has_money').notNull(),
+    hasOrg: boolean('has_org').notNull(),
+    hasPerson: boolean('has_person').notNull(),
+    hasUrl: boolean('has_url').notNull(),
+    hasNamedEntities: boolean('has_named_entities').notNull(),
+    entityCount: integer('entity_count').notNull(),
+    idHits: integer('id_hits').notNull(),
+    accusationCount: integer('accusation_count').notNull(),
+    attachmentCount: integer('attachment_count').notNull(),
+    firstPersonExperience: integer('first_person_experience').notNull(),
+    truncated: boolean('truncated').notNull().default(false),
+    computedAt: timestamp('computed_at', { withTimezone: true }).defaultNow().notNull(),
+  },
+  (t) => ({
+    pk: primaryKey({ columns: [t.recordId, t.featuresVersion] }),
+    // rescore.py --from-features pages by record_id within one version
+    versionRecordIdx: index('record_classifier_features_version_record_idx').on(t.featuresVersion, t.recordId),
+  }),
+).enableRLS(); // no policies: only the classifier (service_role) reads or writes it
+
 /** RECORD EVIDENCE */
 export const record_evidence = pgTable('record_evidence', {
   id: uuid('id').primaryKey().defaultRandom(),